@@ -5,8 +5,16 @@ import sys
 
 from flask import Flask, render_template
 
-from app import commands, public, user, dashboard
+from app import commands, dashboard, json_provider, public, user
 from app.common.views import register_common
+from app.dashboard.camera import cameras
+from app.dashboard.fleet import fleet
+from app.dashboard.history import generations
+from app.dashboard.laps import laps
+from app.dashboard.persistence import telemetry_writer
+from app.dashboard.reachability import probes
+from app.dashboard.recording import replay_engine
+from app.dashboard.simulator import simulators
 from app.extensions import (
     bcrypt,
     cache,
@@ -16,6 +24,7 @@ from app.extensions import (
     flask_static_digest,
     login_manager,
     migrate,
+    sock,
 )
 
 
@@ -39,6 +48,7 @@ def create_app(config_object="app.settings"):
 
 def register_extensions(app):
     """Register Flask extensions."""
+    json_provider.init_app(app)
     bcrypt.init_app(app)
     cache.init_app(app)
     db.init_app(app)
@@ -47,6 +57,15 @@ def register_extensions(app):
     debug_toolbar.init_app(app)
     migrate.init_app(app, db)
     flask_static_digest.init_app(app)
+    sock.init_app(app)
+    fleet.init_app(app)
+    generations.init_app(app)
+    telemetry_writer.init_app(app)
+    laps.init_app(app)
+    simulators.init_app(app)
+    cameras.init_app(app)
+    probes.init_app(app)
+    replay_engine.init_app(app)
     return None
 
 
@@ -88,6 +107,8 @@ def register_commands(app):
     """Register Click commands."""
     app.cli.add_command(commands.test)
     app.cli.add_command(commands.lint)
+    app.cli.add_command(commands.telemetry_cli)
+    app.cli.add_command(commands.export_history)
 
 
 def configure_logger(app):
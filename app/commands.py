@@ -5,6 +5,7 @@ from glob import glob
 from subprocess import call
 
 import click
+from flask.cli import AppGroup
 
 HERE = os.path.abspath(os.path.dirname(__file__))
 PROJECT_ROOT = os.path.join(HERE, os.pardir)
@@ -81,3 +82,89 @@ def lint(fix_imports, check):
         execute_tool("Fixing import order", "isort", *isort_args)
     execute_tool("Formatting style", "black", *black_args)
     execute_tool("Checking code style", "flake8")
+
+
+telemetry_cli = AppGroup("telemetry", help="Record and replay vehicle telemetry.")
+
+
+@telemetry_cli.command("record")
+@click.argument("output", type=click.Path(dir_okay=False))
+@click.option("-d", "--duration", type=float, default=None, help="Stop after this many seconds")
+@click.option("-i", "--interval", type=float, default=0.2, help="Polling interval in seconds")
+def record_telemetry(output, duration, interval):
+    """Record the live telemetry stream to OUTPUT until interrupted."""
+    import time
+
+    import numpy as np
+
+    from app.dashboard.recording import TelemetryRecorder
+    from app.dashboard.telemetry import NUMERIC_FIELDS, telemetry
+
+    recorder = TelemetryRecorder(output)
+    _oldest, since = telemetry.history.bounds()
+    cursor = telemetry.track.count
+    deadline = time.monotonic() + duration if duration else None
+    click.echo(f"Recording to {output} (Ctrl+C to stop)")
+    try:
+        while deadline is None or time.monotonic() < deadline:
+            _timestamps, columns, _count = telemetry.history.read(NUMERIC_FIELDS, since=since)
+            if len(columns["timestamp"]):
+                # Points du tracé reçus depuis le bloc précédent
+                points, cursor, _reset, _tail = telemetry.track.read(cursor)
+                recorder.write(np.vstack([columns[name] for name in NUMERIC_FIELDS]), points)
+                since = columns["timestamp"][-1]
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        recorder.close()
+    click.echo(f"{recorder.samples} samples recorded")
+
+
+@telemetry_cli.command("replay")
+@click.argument("recording", type=click.Path(exists=True, dir_okay=False))
+@click.option("-s", "--speed", type=float, default=1.0, help="Speed factor (1 = real time)")
+@click.option("--fastest", is_flag=True, help="Replay as fast as possible")
+@click.option("--keep-timestamps", is_flag=True, help="Publish the recorded timestamps unchanged")
+def replay_telemetry(recording, speed, fastest, keep_timestamps):
+    """Replay RECORDING into the shared telemetry store (replayed samples are not persisted)."""
+    import functools
+
+    from app.dashboard.recording import replay
+    from app.dashboard.telemetry import telemetry
+
+    result = replay(
+        recording,
+        functools.partial(telemetry.publish_columns, replayed=True),
+        speed=None if fastest else speed,
+        rebase=not keep_timestamps,
+    )
+    rate = f"{result['rate']:.0f} samples/s" if result["rate"] else "n/a"
+    click.echo(f"{result['samples']} samples in {result['blocks']} blocks, {result['elapsed']:.2f} s ({rate})")
+
+
+@click.command("export-history")
+@click.argument("kind", type=click.Choice(["courses", "connexions"]))
+@click.option("-f", "--format", "fmt", type=click.Choice(["csv", "ndjson"]), default="csv", show_default=True)
+@click.option(
+    "-o", "--output", type=click.File("w", encoding="utf-8"), default="-", help="Output file (default: stdout)"
+)
+@click.option(
+    "--filter",
+    "filters",
+    multiple=True,
+    metavar="NAME=VALUE",
+    help="History API filter, e.g. --filter q=essai --filter date_debut=2026-01-01",
+)
+def export_history(kind, fmt, output, filters):
+    """Stream every KIND history row matching the filters as CSV or NDJSON."""
+    from app.dashboard.history import export
+
+    args = {}
+    for item in filters:
+        name, sep, value = item.partition("=")
+        if not sep:
+            raise click.BadParameter(f"expected NAME=VALUE, got {item!r}", param_hint="--filter")
+        args[name] = value
+    for chunk in export(kind, args, fmt):
+        output.write(chunk)
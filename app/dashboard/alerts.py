@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""Règles d'alerte sur la télémétrie, évaluées par lot en NumPy.
+
+Une règle est déclarative (``ALERT_RULES``) : un champ, un seuil
+(``above`` / ``below``) ou une vitesse de variation par seconde
+(``rate_above`` / ``rate_below``), un seuil de retour ``clear`` (hystérésis)
+et une durée de maintien ``hold`` (secondes). Les règles sont compilées en
+tableaux : un lot de ``n`` échantillons est évalué pour toutes les règles en
+quelques opérations sur une matrice ``(règles, n)``, sans boucle Python par
+échantillon ni par champ.
+
+Une alerte est levée quand la condition tient depuis ``hold`` secondes et
+retombe seulement quand la valeur repasse du bon côté de ``clear`` : une
+valeur qui oscille autour du seuil ne produit pas de rafale d'alertes.
+L'état des règles est partagé entre les workers.
+"""
+import math
+import struct
+import zlib
+
+import numpy as np
+
+from app.dashboard.shared import SeqlockBuffer
+
+CONDITIONS = {"above": (1, False), "below": (-1, False), "rate_above": (1, True), "rate_below": (-1, True)}
+LEVELS = ("info", "warning", "danger")
+STATE_FIELDS = ("active", "since", "pending", "last_t", "last_v", "observed")
+
+
+def compile_rules(rules, fields):
+    """Vérifie les règles et les convertit en tableaux (une case par règle).
+
+    ``fields`` : ordre des lignes des blocs de colonnes évalués.
+
+    Lève ``ValueError`` pour une règle incomplète ou un champ inconnu.
+    """
+    compiled = {"rules": [], "field": [], "sign": [], "rate": [], "trigger": [], "clear": [], "hold": []}
+    for rule in rules:
+        conditions = [key for key in CONDITIONS if key in rule]
+        if len(conditions) != 1:
+            raise ValueError(f"Règle {rule.get('id')!r} : une condition parmi {', '.join(CONDITIONS)} attendue")
+        if rule.get("field") not in fields:
+            raise ValueError(f"Règle {rule.get('id')!r} : champ inconnu {rule.get('field')!r}")
+        if rule.get("level", "warning") not in LEVELS:
+            raise ValueError(f"Règle {rule.get('id')!r} : niveau parmi {', '.join(LEVELS)} attendu")
+        sign, rate = CONDITIONS[conditions[0]]
+        trigger = float(rule[conditions[0]])
+        clear = float(rule.get("clear", trigger))
+        if sign * clear > sign * trigger:
+            raise ValueError(f"Règle {rule.get('id')!r} : 'clear' doit être du côté normal du seuil")
+        compiled["rules"].append({
+            "id": rule.get("id") or f"{rule['field']}_{conditions[0]}",
+            "field": rule["field"],
+            "level": rule.get("level", "warning"),
+            "message": rule.get("message") or f"{rule['field']} : {conditions[0]} {trigger:g}",
+        })
+        compiled["field"].append(fields.index(rule["field"]))
+        compiled["sign"].append(sign)
+        compiled["rate"].append(rate)
+        # Conditions ramenées à « sign × valeur > seuil » pour toutes les règles
+        compiled["trigger"].append(sign * trigger)
+        compiled["clear"].append(sign * clear)
+        compiled["hold"].append(float(rule.get("hold", 0)))
+    arrays = {key: np.array(values, dtype=int if key == "field" else float) for key, values in compiled.items()
+              if key != "rules"}
+    arrays["rate"] = arrays["rate"].astype(bool)
+    return compiled["rules"], arrays
+
+
+def evaluate_batch(arrays, timestamps, values, state):
+    """Évalue un lot pour toutes les règles.
+
+    ``values`` : matrice ``(règles, n)`` des champs des règles ; ``state`` :
+    matrice ``(règles, STATE_FIELDS)`` de l'état précédent. Retourne le
+    nouvel état.
+    """
+    count = timestamps.size
+    active, since, pending, last_t, last_v, _observed = state.T
+    # Vitesse de variation : l'échantillon précédent du lot (ou du lot d'avant) sert de référence
+    all_t = np.concatenate([last_t[:, None], np.broadcast_to(timestamps, values.shape)], axis=1)
+    all_v = np.concatenate([last_v[:, None], values], axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rates = np.diff(all_v, axis=1) / np.diff(all_t, axis=1)
+    rates[~np.isfinite(rates)] = np.nan
+    observed = np.where(arrays["rate"][:, None], rates, values)
+    signed = arrays["sign"][:, None] * observed
+    condition = signed > arrays["trigger"][:, None]
+    cleared = signed <= arrays["clear"][:, None]  # faux pour NaN : pas de retour sans mesure
+
+    # Début de la période où la condition tient sans interruption
+    index = np.arange(count)
+    last_false = np.maximum.accumulate(np.where(condition, -1, index), axis=1)
+    carried = np.where(np.isnan(pending), timestamps[0], pending)
+    run_start = np.where(last_false >= 0, timestamps[np.minimum(last_false + 1, count - 1)], carried[:, None])
+    held = condition & (timestamps - run_start >= arrays["hold"][:, None])
+
+    # Hystérésis : l'état suit le dernier événement (levée ou retour) du lot
+    events = np.where(held, 1, np.where(cleared, -1, 0))
+    last_event = np.maximum.accumulate(np.where(events != 0, index, -1), axis=1)[:, -1]
+    rows = np.arange(len(events))
+    final = np.where(last_event >= 0, events[rows, np.maximum(last_event, 0)], 0)
+    new_active = np.where(last_event >= 0, final > 0, active > 0)
+
+    # Instant de la levée : premier maintien atteint après le dernier retour du lot
+    last_clear = np.maximum.accumulate(np.where(events < 0, index, -1), axis=1)[:, -1]
+    first_held = np.argmax(held & (index > last_clear[:, None]), axis=1)
+    raised = new_active & ~(active > 0)
+    since = np.where(raised, timestamps[first_held], np.where(new_active, since, np.nan))
+
+    return np.column_stack([
+        new_active.astype(float),
+        since,
+        np.where(condition[:, -1], run_start[:, -1], np.nan),
+        np.full(len(events), timestamps[-1]),
+        values[:, -1],
+        observed[:, -1],  # valeur ou variation, selon la règle
+    ])
+
+
+class AlertEngine(SeqlockBuffer):
+    """Règles compilées et leur état, partagé entre les workers."""
+
+    MAGIC = b"VALR"
+    VERSION = 1
+
+    _HEADER = struct.Struct("<4sHHII")  # magic, version, réservé, nb règles, empreinte des règles
+    _DATA_OFFSET = 32
+
+    def __init__(self, path=None, rules=(), fields=()):
+        """Créer une instance."""
+        self.rules, self._arrays = compile_rules(rules, tuple(fields))
+        self._timestamp = tuple(fields).index("timestamp") if self.rules else None
+        self._fingerprint = zlib.crc32(repr(self.rules + [self._arrays[k].tolist() for k in sorted(self._arrays)])
+                                       .encode())
+        size = len(self.rules) * len(STATE_FIELDS)
+        super().__init__(path, self._DATA_OFFSET + 8 * max(size, 1))
+        self._state = np.ndarray((len(self.rules), len(STATE_FIELDS)), dtype="<f8", buffer=self._buf,
+                                 offset=self._DATA_OFFSET)
+
+    def _expected_header(self):
+        return (self.MAGIC, self.VERSION, 0, len(self.rules), self._fingerprint)
+
+    def _reset(self):
+        state = np.ndarray((len(self.rules), len(STATE_FIELDS)), dtype="<f8", buffer=self._buf,
+                           offset=self._DATA_OFFSET)
+        state[:] = np.nan
+        state[:, STATE_FIELDS.index("active")] = 0
+
+    def close(self):
+        """Ferme le buffer partagé."""
+        self._state = None  # libère la vue NumPy avant de fermer le mmap
+        super().close()
+
+    def evaluate(self, columns):
+        """Évalue un lot ``(fields, n)`` ; retourne les alertes actives après le lot."""
+        if not self.rules or not columns.shape[1]:
+            return self.active()
+        timestamps = columns[self._timestamp]
+        values = columns[self._arrays["field"]]
+        result = []
+
+        def update():
+            self._state[:] = evaluate_batch(self._arrays, timestamps, values, self._state)
+            result.append(self._alerts(self._state))
+
+        with self._writer():
+            self._publish(update)
+        return result[0]
+
+    def active(self):
+        """Alertes actives, sans évaluation (lecture sans verrou)."""
+        if not self.rules:
+            return []
+        _seq, state = self._snapshot(lambda: self._state.copy())
+        return self._alerts(state)
+
+    def _alerts(self, state):
+        alerts = []
+        for index in np.flatnonzero(state[:, 0] > 0):
+            value = state[index, -1]
+            alerts.append(dict(
+                self.rules[index],
+                value=None if math.isnan(value) else round(float(value), 3),
+                since=float(state[index, 1]),
+            ))
+        return alerts
@@ -0,0 +1,464 @@
+# -*- coding: utf-8 -*-
+"""Flux caméra MJPEG : une seule capture par source, diffusée à tous les spectateurs.
+
+Pour chaque source, une tâche de fond (greenlet sous gunicorn ``-k gevent``)
+lit les images JPEG et dépose la plus récente dans un buffer partagé entre
+les workers ; un verrou ``flock`` élit un seul worker capteur. Dans chaque
+worker, un ``Broadcaster`` met en forme chaque nouvelle image une fois, en
+partie ``multipart/x-mixed-replace``, et la dépose chez chaque spectateur :
+un spectateur lent saute des images au lieu d'accumuler du retard.
+
+Sources : URL ``http(s)://`` d'un flux MJPEG (caméra du véhicule), dossier
+d'images ``.jpg`` lues en boucle, ou fichier unique (image de remplacement).
+
+Pour les spectateurs à faible débit, chaque image est aussi réencodée une
+fois en quelques niveaux de résolution et de qualité ; chaque spectateur
+choisit son niveau et sa cadence maximale.
+"""
+import collections
+import io
+import os
+import struct
+import threading
+import time
+import urllib.request
+
+from app.dashboard.shared import LeaderLock, SeqlockBuffer, keyed_path
+from app.dashboard.stream import Broadcaster
+
+try:
+    from PIL import Image
+except ImportError:  # sans Pillow : pas de niveaux réencodés
+    Image = None
+
+BOUNDARY = "frame"
+MJPEG_MIMETYPE = f"multipart/x-mixed-replace; boundary={BOUNDARY}"
+JPEG_EXTENSIONS = (".jpg", ".jpeg")
+SOI, EOI = b"\xff\xd8", b"\xff\xd9"
+FULL_TIER = "full"  # images d'origine, sans réencodage
+AUTO_TIER = "auto"  # niveau choisi selon le débit du spectateur
+
+
+def format_part(jpeg):
+    """Partie multipart d'une image JPEG."""
+    header = f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n"
+    return header.encode() + jpeg + b"\r\n"
+
+
+class FileSource:
+    """Image unique, relue seulement quand le fichier change."""
+
+    def __init__(self, path, fps=15):
+        """Créer une instance."""
+        self.path = path
+        self.interval = 1 / fps
+
+    def frames(self):
+        """Images JPEG ; ``None`` quand rien n'a changé (permet à l'appelant de s'arrêter)."""
+        mtime = None
+        while True:
+            current = os.stat(self.path).st_mtime_ns
+            if current != mtime:
+                mtime = current
+                with open(self.path, "rb") as f:
+                    yield f.read()
+            else:
+                yield None
+            time.sleep(self.interval)
+
+
+class DirectorySource:
+    """Images ``.jpg`` d'un dossier, lues en boucle à ``fps`` images par seconde."""
+
+    def __init__(self, path, fps=15):
+        """Créer une instance."""
+        self.path = path
+        self.interval = 1 / fps
+
+    def frames(self):
+        """Images JPEG du répertoire, en boucle, à ``fps`` images par seconde."""
+        while True:
+            names = sorted(n for n in os.listdir(self.path) if n.lower().endswith(JPEG_EXTENSIONS))
+            if not names:
+                raise FileNotFoundError(f"Aucune image JPEG dans {self.path}")
+            for name in names:
+                with open(os.path.join(self.path, name), "rb") as f:
+                    yield f.read()
+                time.sleep(self.interval)
+
+
+class HttpMjpegSource:
+    """Flux MJPEG HTTP (caméra du véhicule), découpé sur les marqueurs JPEG."""
+
+    def __init__(self, url, timeout=5, chunk_size=65536):
+        """Créer une instance."""
+        self.url = url
+        self.timeout = timeout
+        self.chunk_size = chunk_size
+
+    def frames(self):
+        """Images JPEG extraites du flux MJPEG distant."""
+        with urllib.request.urlopen(self.url, timeout=self.timeout) as response:
+            pending = b""
+            while True:
+                chunk = response.read1(self.chunk_size)
+                if not chunk:
+                    return
+                pending += chunk
+                while True:
+                    start = pending.find(SOI)
+                    end = pending.find(EOI, start + 2) if start >= 0 else -1
+                    if end < 0:
+                        # Ne garde que le début de l'image en cours
+                        pending = pending[start:] if start >= 0 else b""
+                        break
+                    yield pending[start:end + 2]
+                    pending = pending[end + 2:]
+
+
+def open_source(spec, fps=15, root=None):
+    """Source décrite par ``spec`` : URL, dossier, ou fichier (relatif à ``root``)."""
+    if spec.startswith(("http://", "https://")):
+        return HttpMjpegSource(spec)
+    path = os.path.join(root, spec) if root and not os.path.isabs(spec) else spec
+    if os.path.isdir(path):
+        return DirectorySource(path, fps)
+    return FileSource(path, fps)
+
+
+class FrameBuffer(SeqlockBuffer):
+    """Dernière image JPEG d'une source, partagée entre les workers.
+
+    ``last_viewed`` (écrit sans verrou par les workers qui ont des
+    spectateurs) permet au capteur de s'arrêter quand plus personne ne regarde.
+    """
+
+    MAGIC = b"VCAM"
+    VERSION = 1
+
+    _HEADER = struct.Struct("<4sHHI")  # magic, version, réservé, capacité
+    _STATE = struct.Struct("<QdI")  # numéro d'image, horodatage, taille
+    _STATE_OFFSET = 24
+    _VIEWED = struct.Struct("<d")
+    _VIEWED_OFFSET = 48
+    _DATA_OFFSET = 64
+
+    def __init__(self, path=None, capacity=1_000_000):
+        """Créer une instance."""
+        self.capacity = capacity
+        super().__init__(path, self._DATA_OFFSET + capacity)
+
+    def _expected_header(self):
+        return (self.MAGIC, self.VERSION, 0, self.capacity)
+
+    def write(self, jpeg, timestamp=None):
+        """Publie une image ; retourne ``False`` si elle dépasse la capacité."""
+        if len(jpeg) > self.capacity:
+            return False
+        timestamp = timestamp if timestamp is not None else time.time()
+
+        def copy():
+            number = self._STATE.unpack_from(self._buf, self._STATE_OFFSET)[0]
+            self._buf[self._DATA_OFFSET:self._DATA_OFFSET + len(jpeg)] = jpeg
+            self._STATE.pack_into(self._buf, self._STATE_OFFSET, number + 1, timestamp, len(jpeg))
+
+        with self._writer():
+            self._publish(copy)
+        return True
+
+    def read(self):
+        """``(numéro, horodatage, image)`` de la dernière image, ou ``None`` avant la première."""
+
+        def copy():
+            number, timestamp, length = self._STATE.unpack_from(self._buf, self._STATE_OFFSET)
+            if length > self.capacity:
+                return None  # état déchiré : on recommence
+            return number, timestamp, self._buf[self._DATA_OFFSET:self._DATA_OFFSET + length]
+
+        _seq, frame = self._snapshot(copy)
+        return frame if frame[0] else None
+
+    def touch(self, now):
+        """Note que l'image a été demandée à ``now``."""
+        self._VIEWED.pack_into(self._buf, self._VIEWED_OFFSET, now)
+
+    @property
+    def last_viewed(self):
+        """Date de la dernière demande d'image (epoch, 0 si jamais)."""
+        return self._VIEWED.unpack_from(self._buf, self._VIEWED_OFFSET)[0]
+
+
+class FrameBroadcaster(Broadcaster):
+    """Diffuse les images du buffer, mises en forme une seule fois par image."""
+
+    def __init__(self, buffer, interval=0.01):
+        """Créer une instance."""
+        self.buffer = buffer
+        super().__init__(lambda: buffer.seq, buffer.read, interval=interval, name="camera-broadcaster")
+
+    def _current(self):
+        seq = self._seq()
+        if seq != self._last[0]:
+            frame = self._read()
+            self._last = (seq, format_part(frame[2]) if frame else None)
+        return self._last
+
+    def poll(self):
+        """Note la demande puis diffuse la dernière image si elle est nouvelle."""
+        self.buffer.touch(time.time())
+        return super().poll()
+
+
+class Tier(collections.namedtuple("Tier", "name width quality")):
+    """Niveau de qualité réencodé : largeur max (px) et qualité JPEG."""
+
+
+def encode_tiers(jpeg, tiers):
+    """Réencode ``jpeg`` pour chaque niveau ; l'image n'est décodée qu'une fois."""
+    image = Image.open(io.BytesIO(jpeg))
+    widest = max(tier.width for tier in tiers)
+    image.draft("RGB", (widest, widest * image.height // image.width))  # décodage JPEG déjà réduit
+    image = image.convert("RGB")
+    encoded = {}
+    for tier in tiers:
+        resized = image
+        if image.width > tier.width:
+            resized = image.resize((tier.width, max(1, image.height * tier.width // image.width)))
+        output = io.BytesIO()
+        resized.save(output, "JPEG", quality=tier.quality)
+        encoded[tier.name] = output.getvalue()
+    return encoded
+
+
+class TierSelector:
+    """Choix automatique du niveau d'un spectateur selon son débit mesuré.
+
+    Le débit est la taille d'une partie divisée par le temps passé à
+    l'envoyer (bloquant quand le tampon réseau est plein), lissé
+    exponentiellement. On descend d'un niveau dès que le débit ne suffit plus
+    à ``fps`` images par seconde ; on remonte après ``upgrade_frames`` images
+    consécutives où le niveau supérieur tiendrait avec de la marge.
+    """
+
+    def __init__(self, tiers, fps, smoothing=0.3, headroom=0.8, upgrade_frames=30):
+        """Créer une instance."""
+        self.tiers = list(tiers)  # du meilleur au plus léger
+        self.fps = fps
+        self.smoothing = smoothing
+        self.headroom = headroom
+        self.upgrade_frames = upgrade_frames
+        self.index = 0
+        self.throughput = None
+        self._sizes = {}
+        self._streak = 0
+
+    @property
+    def tier(self):
+        """Qualité choisie pour le débit mesuré."""
+        return self.tiers[self.index]
+
+    def record(self, size, seconds):
+        """Prend en compte l'envoi d'une partie ; retourne le niveau à utiliser ensuite."""
+        sample = size / max(seconds, 1e-4)
+        self.throughput = sample if self.throughput is None else (
+            self.smoothing * sample + (1 - self.smoothing) * self.throughput
+        )
+        self._sizes[self.index] = size
+        budget = self.throughput * self.headroom
+        if size * self.fps > budget and self.index < len(self.tiers) - 1:
+            self.index += 1
+            self._streak = 0
+        elif self.index > 0 and self._sizes.get(self.index - 1, 4 * size) * self.fps < budget:
+            self._streak += 1
+            if self._streak >= self.upgrade_frames:
+                self.index -= 1
+                self._streak = 0
+        else:
+            self._streak = 0
+        return self.tier
+
+
+class Camera:
+    """Source caméra : capteur de fond (un seul worker) et diffusion locale.
+
+    Chaque image est publiée telle quelle (niveau ``full``) et réencodée une
+    fois par niveau de ``tiers`` regardé récemment, chaque niveau ayant son
+    buffer partagé et sa diffusion : le coût d'encodage ne dépend pas du
+    nombre de spectateurs.
+    """
+
+    def __init__(self, name, source, buffer, idle_timeout=30, lock_path=None, tiers=(), fps=15):
+        """Créer une instance."""
+        self.name = name
+        self.source = source
+        self.idle_timeout = idle_timeout
+        self.leader = LeaderLock(lock_path)
+        self.fps = fps
+        self.tiers = {tier.name: tier for tier, _buffer in tiers}
+        self.buffers = {FULL_TIER: buffer, **{tier.name: tier_buffer for tier, tier_buffer in tiers}}
+        self.broadcasters = {name: FrameBroadcaster(tier_buffer) for name, tier_buffer in self.buffers.items()}
+        self.stats = {"frames": 0, "oversized": 0, "errors": 0, "last_error": None, "encode_ms": 0.0}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+
+    @property
+    def tier_names(self):
+        """Niveaux disponibles, du meilleur au plus léger."""
+        return list(self.buffers)
+
+    def subscribe(self, tier=FULL_TIER):
+        """Abonne un spectateur au niveau ``tier`` (et démarre la capture si besoin)."""
+        self.buffers[tier].touch(time.time())
+        self.start()
+        return self.broadcasters[tier].subscribe()
+
+    def unsubscribe(self, subscription):
+        """Retire l'abonnement de toutes les qualités."""
+        for broadcaster in self.broadcasters.values():
+            broadcaster.unsubscribe(subscription)
+
+    def viewer(self, tier=FULL_TIER, max_fps=None, clock=time.monotonic, sleep=time.sleep):
+        """Parties MJPEG pour un spectateur.
+
+        ``tier`` : niveau fixe, ou ``"auto"`` pour un choix selon le débit
+        mesuré (``TierSelector``). ``max_fps`` espace les images envoyées ;
+        celles arrivées entre-temps sont sautées.
+        """
+        selector = TierSelector(self.tier_names, max_fps or self.fps) if tier == AUTO_TIER else None
+        current = selector.tier if selector else tier
+        subscription = self.subscribe(current)
+        try:
+            while True:
+                part = subscription.get(timeout=1)
+                if part is None:
+                    continue
+                started = clock()
+                yield part
+                sent = clock()
+                if selector is not None and selector.record(len(part), sent - started) != current:
+                    self.unsubscribe(subscription)
+                    current = selector.tier
+                    subscription = self.subscribe(current)
+                if max_fps:
+                    sleep(max(0.0, 1 / max_fps - (clock() - started)))
+        finally:
+            self.unsubscribe(subscription)
+
+    def start(self):
+        """Démarre le thread de capture s'il ne tourne pas."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"camera-{self.name}", daemon=True)
+                self._thread.start()
+
+    def _viewed(self, buffer, now):
+        return now - buffer.last_viewed <= self.idle_timeout
+
+    def _idle(self):
+        now = time.time()
+        return self._closed or not any(self._viewed(buffer, now) for buffer in self.buffers.values())
+
+    def _run(self):
+        try:
+            while not self._idle():
+                if not self.leader.acquire():
+                    time.sleep(1)  # un autre worker capture déjà
+                    continue
+                self._capture()
+        finally:
+            self.leader.release()
+            with self._lock:
+                self._thread = None
+
+    def _capture(self):
+        """Recopie les images de la source jusqu'à l'inactivité ou une erreur."""
+        try:
+            for jpeg in self.source.frames():
+                if jpeg is not None:
+                    self._publish(jpeg)
+                if self._idle():
+                    return
+        except OSError as exc:
+            self.stats["errors"] += 1
+            self.stats["last_error"] = str(exc)
+        time.sleep(1)  # source indisponible ou terminée : nouvelle tentative
+
+    def _publish(self, jpeg):
+        now = time.time()
+        if self.buffers[FULL_TIER].write(jpeg, now):
+            self.stats["frames"] += 1
+        else:
+            self.stats["oversized"] += 1
+        # Seuls les niveaux regardés récemment (dans n'importe quel worker) sont réencodés
+        tiers = [tier for name, tier in self.tiers.items() if self._viewed(self.buffers[name], now)]
+        if not tiers:
+            return
+        started = time.perf_counter()
+        try:
+            encoded = encode_tiers(jpeg, tiers)
+        except (OSError, ValueError) as exc:  # image illisible
+            self.stats["errors"] += 1
+            self.stats["last_error"] = str(exc)
+            return
+        self.stats["encode_ms"] = (time.perf_counter() - started) * 1000
+        for name, data in encoded.items():
+            self.buffers[name].write(data, now)
+
+    def close(self):
+        """Arrête la capture puis libère les buffers."""
+        self._closed = True
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=2)
+        for buffer in self.buffers.values():
+            buffer.close()
+
+
+class Cameras:
+    """Extension Flask : caméras déclarées dans ``CAMERA_SOURCES`` (nom → source).
+
+    ``CAMERA_TIERS`` (nom → ``[largeur, qualité]``, du meilleur au plus léger)
+    décrit les niveaux réencodés ; ils demandent Pillow, sans lequel seul le
+    niveau ``full`` (images d'origine) est proposé.
+    """
+
+    def __init__(self, app=None):
+        """Créer une instance."""
+        self.cameras = {}
+        self.default = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Lit les caméras configurées (``CAMERA_SOURCES``)."""
+        for camera in self.cameras.values():
+            camera.close()
+        sources = app.config.get("CAMERA_SOURCES") or {"default": "static/build/camera-placeholder.jpg"}
+        shm_path = app.config.get("CAMERA_SHM_PATH")
+        fps = app.config.get("CAMERA_FPS", 15)
+        capacity = app.config.get("CAMERA_MAX_FRAME_BYTES", 1_000_000)
+        tiers = [Tier(name, *spec) for name, spec in (app.config.get("CAMERA_TIERS") or {}).items()]
+        if Image is None:
+            tiers = []
+        self.cameras = {}
+        for name, spec in sources.items():
+            path = keyed_path(shm_path, name)
+            self.cameras[name] = Camera(
+                name,
+                open_source(spec, fps=fps, root=app.root_path),
+                FrameBuffer(path, capacity=capacity),
+                idle_timeout=app.config.get("CAMERA_IDLE_TIMEOUT", 30),
+                lock_path=f"{path}.lock" if path else None,
+                tiers=[(tier, FrameBuffer(keyed_path(path, tier.name), capacity=capacity)) for tier in tiers],
+                fps=fps,
+            )
+        self.default = next(iter(self.cameras.values()))
+        app.extensions["cameras"] = self
+
+    def get(self, name):
+        """Caméra ``name``, ou ``None`` si elle n'est pas déclarée."""
+        return self.cameras.get(name)
+
+
+cameras = Cameras()
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""Canal de commande de pilotage : dernière commande partagée entre les workers."""
+import os
+import socket
+import struct
+import threading
+import time
+
+from app.dashboard.shared import LeaderLock, SeqlockBuffer, keyed_path
+
+CONTROL_FIELDS = ("throttle", "brake", "steering")
+CONTROL_LIMITS = {"throttle": (-1.0, 1.0), "brake": (0.0, 1.0), "steering": (-1.0, 1.0)}
+# Commande appliquée quand aucune commande fraîche n'est disponible
+SAFE_STOP = {"throttle": 0.0, "brake": 1.0, "steering": 0.0}
+# Compteurs partagés du canal de commande
+CONTROL_COUNTERS = ("received", "dropped", "coalesced", "ticks", "safe_stops")
+
+
+def clean_command(raw):
+    """Valide une commande de pilotage et borne ses valeurs.
+
+    Lève ``ValueError`` si la commande n'est pas un objet ou si un champ
+    n'est pas numérique. ``seq`` est facultatif : sans lui, la commande n'a
+    pas de clé ``seq`` et n'est pas soumise au contrôle d'ordre.
+    """
+    if not isinstance(raw, dict):
+        raise ValueError("Commande invalide : objet JSON attendu")
+    command = {}
+    for key in CONTROL_FIELDS:
+        value = raw.get(key, 0)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError(f"Champ '{key}' : nombre attendu")
+        low, high = CONTROL_LIMITS[key]
+        command[key] = min(high, max(low, float(value)))
+    if "seq" not in raw:
+        return command
+    seq = raw["seq"]
+    if isinstance(seq, bool) or not isinstance(seq, int) or seq < 0:
+        raise ValueError("Champ 'seq' : entier positif attendu")
+    command["seq"] = seq
+    return command
+
+
+class ControlSlot(SeqlockBuffer):
+    """Case « dernière commande » (latest-wins) partagée entre les workers.
+
+    Chaque écriture remplace la précédente : le consommateur côté véhicule lit
+    toujours la commande la plus récente, les commandes intermédiaires ne sont
+    jamais mises en file. Les compteurs (``CONTROL_COUNTERS``) suivent la
+    commande et sont mis à jour sans toucher à ``seq``.
+    """
+
+    MAGIC = b"VCTL"
+    VERSION = 2
+
+    _HEADER = struct.Struct("<4sHHI")  # magic, version, nb champs, nb compteurs
+    _COMMAND = struct.Struct("<Qd%dd" % len(CONTROL_FIELDS))  # seq client, horodatage, commandes
+    _COUNTERS = struct.Struct("<%dQ" % len(CONTROL_COUNTERS))
+    _COMMAND_OFFSET = 24
+    _COUNTERS_OFFSET = _COMMAND_OFFSET + _COMMAND.size
+
+    def __init__(self, path=None):
+        """Créer une instance."""
+        super().__init__(path, self._COUNTERS_OFFSET + self._COUNTERS.size)
+
+    def _expected_header(self):
+        return (self.MAGIC, self.VERSION, len(CONTROL_FIELDS), len(CONTROL_COUNTERS))
+
+    def counters(self):
+        """Valeurs courantes des compteurs."""
+        return dict(zip(CONTROL_COUNTERS, self._COUNTERS.unpack_from(self._buf, self._COUNTERS_OFFSET)))
+
+    def _add_counters_locked(self, increments):
+        values = self._COUNTERS.unpack_from(self._buf, self._COUNTERS_OFFSET)
+        values = [v + increments.get(k, 0) for k, v in zip(CONTROL_COUNTERS, values)]
+        self._COUNTERS.pack_into(self._buf, self._COUNTERS_OFFSET, *values)
+
+    def add_counters(self, **increments):
+        """Incrémente des compteurs, passés en arguments nommés (``dropped=1``…)."""
+        with self._writer():
+            self._add_counters_locked(increments)
+
+    def write(self, command, timestamp=None):
+        """Remplace la commande courante et retourne sa version."""
+        values = (
+            command.get("seq", 0),
+            timestamp if timestamp is not None else time.time(),
+            *(command[k] for k in CONTROL_FIELDS),
+        )
+        with self._writer():
+            self._add_counters_locked({"received": 1})
+            return self._publish(lambda: self._COMMAND.pack_into(self._buf, self._COMMAND_OFFSET, *values))
+
+    def read(self):
+        """Commande courante, avec sa version et son horodatage de réception."""
+        version, values = self._snapshot(lambda: self._COMMAND.unpack_from(self._buf, self._COMMAND_OFFSET))
+        seq, timestamp, *controls = values
+        return dict(zip(CONTROL_FIELDS, controls), seq=seq, timestamp=timestamp, version=version)
+
+
+class UdpVehicleLink:
+    """Liaison vers le véhicule : un datagramme UDP par pas de commande.
+
+    Datagramme (little-endian) : n° de pas (uint64), horodatage (float64),
+    puis ``CONTROL_FIELDS`` en float64.
+    """
+
+    PACKET = struct.Struct("<Qd%dd" % len(CONTROL_FIELDS))
+
+    def __init__(self, host, port):
+        """Créer une instance."""
+        self.address = (host, port)
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def send(self, tick, timestamp, command):
+        """Envoie une commande au véhicule (un datagramme)."""
+        packet = self.PACKET.pack(tick, timestamp, *(command[k] for k in CONTROL_FIELDS))
+        try:
+            self._socket.sendto(packet, self.address)
+        except OSError:
+            pass  # véhicule injoignable : le pas suivant réessaiera
+
+    def close(self):
+        """Ferme la socket."""
+        self._socket.close()
+
+
+class ControlScheduler:
+    """Émet la commande courante vers le véhicule à cadence fixe.
+
+    À chaque pas, la dernière commande de la case partagée est lue : toutes les
+    commandes reçues depuis le pas précédent sauf la dernière sont comptées
+    comme fusionnées. Si aucune commande n'est arrivée depuis plus de
+    ``deadline`` secondes, l'arrêt sûr est émis (homme mort).
+
+    Un seul processus émet : le premier à obtenir le verrou ``lock_path`` ;
+    les autres workers restent en attente et prennent le relais s'il disparaît.
+    """
+
+    def __init__(self, slot, link=None, rate=50, deadline=0.5, lock_path=None):
+        """Créer une instance."""
+        self.slot = slot
+        self.link = link
+        self.period = 1.0 / rate
+        self.deadline = deadline
+        self.leader = LeaderLock(lock_path)
+        self.tick_count = 0
+        self.last_output = dict(SAFE_STOP)
+        self._last_version = None
+        self._stopped = True
+        self._thread = None
+
+    def tick(self, now=None):
+        """Calcule et émet la commande du pas courant."""
+        now = now if now is not None else time.time()
+        command = self.slot.read()
+        increments = {"ticks": 1}
+        if self._last_version is not None:
+            writes = (command["version"] - self._last_version) // 2
+            if writes > 1:
+                increments["coalesced"] = writes - 1
+        self._last_version = command["version"]
+
+        fresh = command["timestamp"] and now - command["timestamp"] <= self.deadline
+        if fresh:
+            output = {k: command[k] for k in CONTROL_FIELDS}
+            self._stopped = False
+        else:
+            output = dict(SAFE_STOP)
+            if not self._stopped:
+                increments["safe_stops"] = 1
+            self._stopped = True
+        self.slot.add_counters(**increments)
+
+        self.tick_count += 1
+        self.last_output = output
+        if self.link is not None:
+            self.link.send(self.tick_count, now, output)
+        return output
+
+    def _run(self):
+        while not self.leader.acquire():
+            time.sleep(1)
+        next_tick = time.monotonic()
+        while True:
+            self.tick()
+            next_tick += self.period
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.monotonic()  # retard : on ne rattrape pas les pas manqués
+
+    def start(self):
+        """Démarre la tâche de fond (une seule fois par processus)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="control-scheduler", daemon=True)
+            self._thread.start()
+
+
+class VehicleControl:
+    """Extension Flask donnant accès à la case de commande partagée."""
+
+    def __init__(self, app=None):
+        """Créer une instance."""
+        self.slot = None
+        self.scheduler = None
+        self.max_age = 0.5
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, vehicle_id=None, host=None):
+        """Ouvre la case de commande configurée par ``CONTROL_SHM_PATH``.
+
+        L'ordonnanceur démarre à la première requête (pas pendant les
+        commandes ``flask``) si ``CONTROL_SCHEDULER_ENABLED`` est vrai. Avec
+        ``vehicle_id``, la case est propre au véhicule et les commandes sont
+        émises vers ``host``.
+        """
+        if self.slot is not None:
+            self.slot.close()
+        shm_path = keyed_path(app.config.get("CONTROL_SHM_PATH"), vehicle_id)
+        self.slot = ControlSlot(shm_path)
+        self.max_age = app.config.get("CONTROL_COMMAND_MAX_AGE", 0.5)
+        link = None
+        if app.config.get("CONTROL_LINK_PORT"):
+            override = app.config.get("CONTROL_LINK_HOST") if vehicle_id is None else None
+            host = override or host or os.getenv("ROBOT_IP", "192.168.1.100")
+            link = UdpVehicleLink(host, app.config["CONTROL_LINK_PORT"])
+        self.scheduler = ControlScheduler(
+            self.slot,
+            link=link,
+            rate=app.config.get("CONTROL_TICK_RATE", 50),
+            deadline=self.max_age,
+            lock_path=f"{shm_path}.lock" if shm_path else None,
+        )
+        if app.config.get("CONTROL_SCHEDULER_ENABLED", False):
+            app.before_request(self.scheduler.start)
+        if vehicle_id is None:
+            app.extensions["vehicle_control"] = self
+
+    def submit(self, command):
+        """Enregistre une commande validée ; retourne sa version."""
+        return self.slot.write(command)
+
+    def reject(self):
+        """Compte une commande ignorée (invalide ou arrivée en retard)."""
+        self.slot.add_counters(dropped=1)
+
+    def stats(self):
+        """Compteurs partagés et réglages de l'ordonnanceur."""
+        return {
+            "counters": self.slot.counters(),
+            "tick_rate": round(1.0 / self.scheduler.period, 3),
+            "deadline": self.max_age,
+        }
+
+    def latest(self, now=None):
+        """Commande à appliquer par le véhicule.
+
+        Une commande plus vieille que ``CONTROL_COMMAND_MAX_AGE`` est périmée :
+        elle est remplacée par l'arrêt sûr plutôt que rejouée en retard.
+        """
+        command = self.slot.read()
+        now = now if now is not None else time.time()
+        age = now - command["timestamp"] if command["timestamp"] else None
+        command["age"] = age
+        command["stale"] = age is None or age > self.max_age
+        if command["stale"]:
+            command.update(SAFE_STOP)
+        return command
+
+
+control = VehicleControl()
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""Sous-échantillonnage de l'historique de télémétrie pour les graphiques.
+
+Deux méthodes, qui retournent les indices des points conservés :
+
+* ``lttb_indices`` : Largest-Triangle-Three-Buckets, fidèle à la forme de la
+  courbe ;
+* ``minmax_indices`` : minimum et maximum de chaque seau, qui conserve les pics.
+
+``TelemetryRollups`` tient à jour des agrégats (moyenne, min, max) à plusieurs
+résolutions au fil de l'arrivée des échantillons : une vue large lit des seaux
+déjà calculés au lieu de parcourir tous les échantillons.
+"""
+import struct
+import zlib
+
+import numpy as np
+
+from app.dashboard.shared import SeqlockBuffer
+
+DOWNSAMPLE_METHODS = ("lttb", "minmax")
+
+
+def lttb_indices(x, y, max_points):
+    """Indices des ``max_points`` points retenus par LTTB (premier et dernier inclus).
+
+    Les moyennes des seaux sont calculées d'un bloc par sommes cumulées ; seul
+    le choix du point de chaque seau, qui dépend du point retenu dans le seau
+    précédent, reste une boucle sur les seaux (O(seaux), pas O(points)).
+    """
+    n = len(x)
+    if n <= max_points:
+        return np.arange(n)
+    if max_points < 3:
+        return np.array([0, n - 1][:max(max_points, 0)], dtype=np.intp)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    buckets = max_points - 2
+    edges = np.linspace(1, n - 1, buckets + 1).astype(np.intp)
+    cum_x = np.concatenate(([0.0], np.cumsum(x)))
+    cum_y = np.concatenate(([0.0], np.cumsum(y)))
+    sizes = np.diff(edges)
+    avg_x = (cum_x[edges[1:]] - cum_x[edges[:-1]]) / sizes
+    avg_y = (cum_y[edges[1:]] - cum_y[edges[:-1]]) / sizes
+    # Le « seau suivant » du dernier seau est le dernier point
+    avg_x = np.append(avg_x[1:], x[-1])
+    avg_y = np.append(avg_y[1:], y[-1])
+
+    selected = np.empty(max_points, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for b in range(buckets):
+        lo, hi = edges[b], edges[b + 1]
+        area = np.abs((x[a] - avg_x[b]) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y[b] - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[b + 1] = a
+    return selected
+
+
+def minmax_indices(y, max_points):
+    """Indices du minimum et du maximum de chaque seau, dans l'ordre chronologique."""
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n)
+    y = np.asarray(y, dtype=float)
+    buckets = max(max_points // 2, 1)
+    starts = np.linspace(0, n, buckets + 1).astype(np.intp)[:-1]
+    sizes = np.diff(np.append(starts, n))
+    positions = np.arange(n)
+    lows = np.repeat(np.minimum.reduceat(y, starts), sizes)
+    highs = np.repeat(np.maximum.reduceat(y, starts), sizes)
+    first_low = np.minimum.reduceat(np.where(y == lows, positions, n), starts)
+    first_high = np.minimum.reduceat(np.where(y == highs, positions, n), starts)
+    return np.unique(np.concatenate((first_low, first_high)))
+
+
+def downsample_indices(x, y, max_points, method="lttb"):
+    """Indices retenus par ``method`` (``DOWNSAMPLE_METHODS``)."""
+    if method == "minmax":
+        return minmax_indices(y, max_points)
+    if method == "lttb":
+        return lttb_indices(x, y, max_points)
+    raise ValueError(f"Méthode inconnue : {method}")
+
+
+class TelemetryRollups(SeqlockBuffer):
+    """Agrégats par seaux de temps (``resolutions`` en secondes), partagés entre workers.
+
+    Chaque résolution est un anneau de ``capacity`` seaux : numéro de seau,
+    nombre d'échantillons, puis somme, minimum et maximum de chaque champ. Un
+    bloc d'échantillons est réduit par seau en une passe NumPy puis fusionné
+    dans les seaux existants : le coût d'ajout ne dépend pas de la durée de la
+    course, et la mémoire est fixe.
+    """
+
+    MAGIC = b"VRUP"
+    VERSION = 1
+
+    _HEADER = struct.Struct("<4sHHI")  # magic, version, nb champs, empreinte des résolutions
+    _DATA_OFFSET = 24
+
+    def __init__(self, path=None, resolutions=(1, 10, 60), capacity=4320, fields=()):
+        """Créer une instance."""
+        self.resolutions = tuple(sorted(resolutions))
+        self.capacity = capacity
+        self.fields = tuple(fields)
+        self._columns = {name: i for i, name in enumerate(self.fields)}
+        nfields = len(self.fields)
+        level_size = 8 + 16 * capacity + 24 * nfields * capacity
+        super().__init__(path, self._DATA_OFFSET + level_size * len(self.resolutions))
+        self._levels = {}
+        for i, resolution in enumerate(self.resolutions):
+            offset = self._DATA_OFFSET + i * level_size
+            latest = np.ndarray((1,), dtype="<i8", buffer=self._buf, offset=offset)
+            buckets = np.ndarray((capacity,), dtype="<i8", buffer=self._buf, offset=offset + 8)
+            counts = np.ndarray((capacity,), dtype="<f8", buffer=self._buf, offset=offset + 8 + 8 * capacity)
+            stats = np.ndarray(
+                (3, nfields, capacity), dtype="<f8", buffer=self._buf, offset=offset + 8 + 16 * capacity
+            )
+            self._levels[resolution] = (latest, buckets, counts, stats)
+        if not self.seq:
+            with self._writer():
+                self._publish(self._clear)
+
+    def _expected_header(self):
+        layout = repr((self.resolutions, self.capacity)).encode()
+        return (self.MAGIC, self.VERSION, len(self.fields), zlib.crc32(layout))
+
+    def _clear(self):
+        for latest, buckets, _counts, _stats in self._levels.values():
+            latest[0] = -1
+            buckets[:] = -1
+
+    def close(self):
+        """Ferme le buffer partagé."""
+        self._levels = {}  # libère les vues NumPy avant de fermer le mmap
+        super().close()
+
+    def extend(self, columns):
+        """Fusionne un bloc d'échantillons ``(nb champs, n)`` dans chaque résolution."""
+        if not columns.shape[1]:
+            return
+        order = np.argsort(columns[0], kind="stable")
+        columns = columns[:, order]
+        with self._writer():
+            self._publish(lambda: [self._merge(resolution, columns) for resolution in self.resolutions])
+
+    def _merge(self, resolution, columns):
+        latest, buckets, counts, stats = self._levels[resolution]
+        ids = np.floor(columns[0] / resolution).astype(np.int64)
+        starts = np.flatnonzero(np.diff(ids, prepend=ids[0] - 1))
+        keys = ids[starts]
+        newest = max(int(latest[0]), int(keys[-1]))
+        # Les seaux sortis de l'anneau écraseraient des seaux plus récents
+        recent = keys > newest - self.capacity
+        if not recent.all():
+            first = int(np.argmax(recent))
+            columns = columns[:, starts[first]:]
+            starts, keys = starts[first:] - starts[first], keys[first:]
+        sizes = np.diff(np.append(starts, columns.shape[1])).astype(float)
+        sums = np.add.reduceat(columns, starts, axis=1)
+        lows = np.minimum.reduceat(columns, starts, axis=1)
+        highs = np.maximum.reduceat(columns, starts, axis=1)
+
+        slots = keys % self.capacity
+        same = buckets[slots] == keys
+        if same.any():
+            kept = slots[same]
+            sizes[same] += counts[kept]
+            sums[:, same] += stats[0][:, kept]
+            lows[:, same] = np.minimum(lows[:, same], stats[1][:, kept])
+            highs[:, same] = np.maximum(highs[:, same], stats[2][:, kept])
+        buckets[slots] = keys
+        counts[slots] = sizes
+        stats[0][:, slots] = sums
+        stats[1][:, slots] = lows
+        stats[2][:, slots] = highs
+        latest[0] = newest
+
+    def read(self, resolution, fields, since=None):
+        """Retourne ``(timestamps, moyennes, minimums, maximums)`` des seaux postérieurs à ``since``.
+
+        ``timestamps`` est le début de chaque seau ; les trois autres valeurs
+        sont des dictionnaires ``{champ: colonne}``. Coût proportionnel au
+        nombre de seaux lus.
+        """
+        if resolution not in self._levels:
+            raise KeyError(str(resolution))
+        unknown = set(fields) - set(self._columns)
+        if unknown:
+            raise KeyError(", ".join(sorted(unknown)))
+        rows = [self._columns[name] for name in fields]
+        latest, buckets, counts, stats = self._levels[resolution]
+
+        def copy():
+            newest = int(latest[0])
+            if newest < 0:
+                return np.empty(0, dtype=np.int64), np.empty(0), np.empty((3, len(rows), 0))
+            oldest = newest - self.capacity + 1
+            if since is not None:
+                oldest = max(oldest, int(np.floor(since / resolution)))
+            keys = np.arange(oldest, newest + 1, dtype=np.int64)
+            slots = keys % self.capacity
+            valid = buckets[slots] == keys
+            keys, slots = keys[valid], slots[valid]
+            return keys, counts[slots], stats[:, rows][:, :, slots]
+
+        _seq, (keys, sizes, values) = self._snapshot(copy)
+        means, lows, highs = values[0] / sizes, values[1], values[2]
+        return (
+            keys * float(resolution),
+            dict(zip(fields, means)),
+            dict(zip(fields, lows)),
+            dict(zip(fields, highs)),
+        )
+
+    def oldest(self, resolution):
+        """Début du plus ancien seau encore conservé à cette résolution (``None`` si vide)."""
+        latest, buckets, _counts, _stats = self._levels[resolution]
+        kept = buckets[(buckets >= 0) & (buckets > int(latest[0]) - self.capacity)]
+        return float(kept.min()) * resolution if kept.size else None
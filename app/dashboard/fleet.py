@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Registre des véhicules : chaque voiture a sa télémétrie et son canal de commande."""
+import os
+
+from app.dashboard.control import VehicleControl, control
+from app.dashboard.telemetry import Telemetry, telemetry
+
+
+class Vehicle:
+    """Véhicule de la flotte, avec ses propres buffers partagés."""
+
+    def __init__(self, vehicle_id, ip, mac, telemetry, control):
+        """Créer une instance."""
+        self.id = vehicle_id
+        self.ip = ip
+        self.mac = mac
+        self.telemetry = telemetry
+        self.control = control
+
+    def info(self):
+        """Identité et adresse réseau du véhicule."""
+        return {"id": self.id, "ip": self.ip, "mac": self.mac}
+
+
+class Fleet:
+    """Extension Flask tenant le registre des véhicules déclarés dans ``VEHICLES``.
+
+    ``VEHICLES`` associe un identifiant à ``{"ip": ..., "mac": ...}``. Le
+    premier véhicule est le véhicule par défaut : il utilise les instances
+    ``telemetry`` et ``control`` du module (routes sans identifiant), les
+    suivants ont chacun leurs buffers, suffixés par leur identifiant. La
+    mémoire et le coût d'ingestion croissent donc linéairement avec la flotte.
+    """
+
+    def __init__(self, app=None):
+        """Créer une instance."""
+        self.vehicles = {}
+        self.default = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Crée les véhicules configurés (``VEHICLES``)."""
+        for vehicle in self.vehicles.values():
+            if vehicle is not self.default:
+                vehicle.telemetry.close()
+        vehicles = app.config.get("VEHICLES") or {
+            "default": {
+                "ip": os.getenv("ROBOT_IP", "192.168.1.100"),
+                "mac": os.getenv("ROBOT_MAC", "00:00:00:00:00:00"),
+            }
+        }
+        self.vehicles = {}
+        for index, (vehicle_id, address) in enumerate(vehicles.items()):
+            if index == 0:
+                telemetry.init_app(app)
+                control.init_app(app, host=address.get("ip"))
+                vehicle_telemetry, vehicle_control = telemetry, control
+            else:
+                vehicle_telemetry = Telemetry()
+                vehicle_telemetry.init_app(app, vehicle_id=vehicle_id)
+                vehicle_control = VehicleControl()
+                vehicle_control.init_app(app, vehicle_id=vehicle_id, host=address.get("ip"))
+            self.vehicles[vehicle_id] = Vehicle(
+                vehicle_id, address.get("ip"), address.get("mac"), vehicle_telemetry, vehicle_control
+            )
+        self.default = next(iter(self.vehicles.values()))
+        app.extensions["fleet"] = self
+
+    def get(self, vehicle_id):
+        """Véhicule ``vehicle_id``, ou ``None`` s'il n'est pas déclaré."""
+        return self.vehicles.get(vehicle_id)
+
+    def overview(self):
+        """Dernière trame de chaque véhicule, en une seule lecture par véhicule."""
+        return [dict(vehicle.info(), frame=vehicle.telemetry.latest()) for vehicle in self.vehicles.values()]
+
+
+fleet = Fleet()
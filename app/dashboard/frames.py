@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""Format binaire compact des trames de télémétrie.
+
+Une charge utile est un en-tête de 8 octets suivi de ``n`` trames de largeur
+fixe, chaque trame étant la suite des champs de ``NUMERIC_FIELDS`` en float64
+little-endian::
+
+    magic "VT" | version (uint8) | nb champs (uint8) | nb trames (uint32) | n × champs
+"""
+import struct
+
+import numpy as np
+
+from app.dashboard.telemetry import NUMERIC_FIELDS
+
+MIMETYPE = "application/octet-stream"
+MAGIC = b"VT"
+VERSION = 1
+HEADER = struct.Struct("<2sBBI")
+DTYPE = np.dtype("<f8")
+FRAME_SIZE = DTYPE.itemsize * len(NUMERIC_FIELDS)
+
+
+class FrameFormatError(ValueError):
+    """Charge utile binaire invalide."""
+
+
+def decode_frames(body, default_timestamp=None):
+    """Décode une charge utile en colonnes ``(nb champs, n)`` sans passer par des dictionnaires.
+
+    Les trames sans horodatage (0) reçoivent ``default_timestamp``.
+    """
+    if len(body) < HEADER.size:
+        raise FrameFormatError("En-tête binaire tronqué")
+    magic, version, nb_fields, count = HEADER.unpack_from(body)
+    if magic != MAGIC or version != VERSION:
+        raise FrameFormatError(f"Format binaire inconnu (version {version})")
+    if nb_fields != len(NUMERIC_FIELDS):
+        raise FrameFormatError(f"{nb_fields} champs reçus, {len(NUMERIC_FIELDS)} attendus")
+    if len(body) != HEADER.size + count * FRAME_SIZE:
+        raise FrameFormatError("Taille de la charge utile incohérente avec l'en-tête")
+    columns = np.frombuffer(body, dtype=DTYPE, count=count * nb_fields, offset=HEADER.size)
+    columns = columns.reshape(count, nb_fields).T
+    if not np.isfinite(columns).all():
+        raise FrameFormatError("Valeur non finie dans la charge utile")
+    timestamps = columns[0]
+    if default_timestamp is not None and not timestamps.all():
+        columns = columns.copy()
+        columns[0][timestamps == 0] = default_timestamp
+    return columns
+
+
+def encode_columns(columns):
+    """Encode des colonnes ``(nb champs, n)`` dans le format binaire."""
+    columns = np.asarray(columns, dtype=DTYPE)
+    return HEADER.pack(MAGIC, VERSION, columns.shape[0], columns.shape[1]) + columns.T.tobytes()
+
+
+def encode_frames(frames):
+    """Encode une liste de trames (dictionnaires) dans le format binaire."""
+    rows = [[float(frame.get(k) or 0) for k in NUMERIC_FIELDS] for frame in frames]
+    return encode_columns(np.array(rows, dtype=DTYPE).reshape(len(rows), len(NUMERIC_FIELDS)).T)
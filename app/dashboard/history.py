@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+"""Requêtes de l'historique (courses, connexions) et export en flux.
+
+Les filtres sont lus dans un mapping (``request.args`` ou options de la
+commande ``flask export-history``) : l'API paginée, les routes d'export et la
+commande sélectionnent exactement les mêmes lignes.
+"""
+import csv
+import io
+import json
+import struct
+import time
+from datetime import datetime
+from functools import lru_cache
+
+import pytz
+from flask import has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from app.dashboard.models import ConnectionLog, RaceLog
+from app.dashboard.search import contains
+from app.dashboard.shared import SharedBuffer
+from app.extensions import cache
+
+COURSE_FIELDS = (
+    'id', 'race_name', 'start_time', 'end_time', 'duration', 'user_name', 'average_speed',
+    'max_speed', 'distance', 'weather_conditions', 'track_conditions',
+)
+CONNEXION_FIELDS = ('user_name', 'type', 'connection_date')
+# Colonnes lues en base (tuples, sans objets ORM), dans l'ordre attendu par ``course_row`` / ``connexion_row``
+COURSE_COLUMNS = (
+    RaceLog.id, RaceLog.race_name, RaceLog.start_time, RaceLog.end_time, RaceLog.user_name,
+    RaceLog.average_speed, RaceLog.max_speed, RaceLog.distance, RaceLog.weather_conditions,
+    RaceLog.track_conditions,
+)
+CONNEXION_COLUMNS = (ConnectionLog.id, ConnectionLog.user_name, ConnectionLog.type, ConnectionLog.connection_date)
+PARIS = pytz.timezone("Europe/Paris")
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+EXPORT_BATCH_SIZE = 1000  # lignes chargées par aller-retour avec la base
+CHANGED_TABLES = "history_changed_tables"  # clé de ``Session.info``
+
+
+class GenerationCounters(SharedBuffer):
+    """Générations des tables de l'historique, partagées entre les workers d'un hôte.
+
+    Un compteur uint64 par table de ``tables``, incrémenté sous le verrou
+    d'écriture ; la lecture d'un entier aligné de 8 octets n'a pas besoin de
+    verrou.
+    """
+
+    MAGIC = b"VGEN"
+    VERSION = 1
+
+    _HEADER = struct.Struct("<4sHHI")  # magic, version, nb tables, réservé
+    _COUNTER = struct.Struct("<Q")
+    _DATA_OFFSET = 24
+
+    def __init__(self, path=None, tables=(RaceLog.__tablename__, ConnectionLog.__tablename__)):
+        """Créer une instance."""
+        self.tables = tuple(tables)
+        super().__init__(path, self._DATA_OFFSET + self._COUNTER.size * len(self.tables))
+
+    def _expected_header(self):
+        return (self.MAGIC, self.VERSION, len(self.tables), 0)
+
+    def _offset(self, tablename):
+        return self._DATA_OFFSET + self._COUNTER.size * self.tables.index(tablename)
+
+    def get(self, tablename):
+        """Génération courante de ``tablename``."""
+        return self._COUNTER.unpack_from(self._buf, self._offset(tablename))[0]
+
+    def bump(self, tablename):
+        """Passe ``tablename`` à la génération suivante."""
+        with self._writer():
+            offset = self._offset(tablename)
+            self._COUNTER.pack_into(self._buf, offset, self._COUNTER.unpack_from(self._buf, offset)[0] + 1)
+
+
+class HistoryGenerations:
+    """Extension Flask : compteurs de génération de l'historique (``HISTORY_GENERATION_PATH``)."""
+
+    def __init__(self, app=None):
+        """Créer une instance."""
+        self.counters = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Ouvre les compteurs partagés."""
+        if self.counters is not None:
+            self.counters.close()
+        self.counters = GenerationCounters(app.config.get("HISTORY_GENERATION_PATH"))
+        app.extensions["history_generations"] = self
+
+    def get(self, tablename):
+        """Génération de ``tablename`` (0 avant ``init_app``)."""
+        return self.counters.get(tablename) if self.counters is not None else 0
+
+    def bump(self, tablename):
+        """Passe ``tablename`` à la génération suivante, pour tous les workers."""
+        if self.counters is not None:
+            self.counters.bump(tablename)
+
+
+generations = HistoryGenerations()
+
+
+def _generation_key(tablename):
+    return f"history-generation:{tablename}"
+
+
+def generation(tablename):
+    """Génération de ``tablename`` : change à chaque modification ou suppression validée.
+
+    Le compteur en mémoire partagée couvre les workers d'un même hôte ; la
+    valeur gardée dans le cache couvre les hôtes qui partagent un
+    ``CACHE_TYPE`` (Redis, memcached).
+    """
+    return f"{generations.get(tablename)}.{cache.get(_generation_key(tablename)) or 0}"
+
+
+def _mark_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(CHANGED_TABLES, set()).add(target.__tablename__)
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_generations(session):
+    """Nouvelle génération des tables modifiées, une fois la transaction validée."""
+    tables = session.info.pop(CHANGED_TABLES, None)
+    for tablename in tables or ():
+        generations.bump(tablename)
+        if has_app_context():
+            cache.set(_generation_key(tablename), time.time_ns(), timeout=0)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changes(session):
+    session.info.pop(CHANGED_TABLES, None)
+
+
+# Les insertions changent déjà le plus grand id (voir ``_count_key`` de l'historique)
+for _model in (RaceLog, ConnectionLog):
+    event.listen(_model, "after_update", _mark_changed)
+    event.listen(_model, "after_delete", _mark_changed)
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        return None
+
+
+def courses_query(args):
+    """Courses correspondant aux filtres ``args`` (sans tri)."""
+    q = args.get('q', '').strip()
+    date_debut = _parse_date(args.get('date_debut') or '')
+    date_fin = _parse_date(args.get('date_fin') or '')
+    type_course = args.get('type_course', '').strip()
+    statut = args.get('statut')
+
+    query = RaceLog.query.with_entities(*COURSE_COLUMNS)
+    if q:
+        query = query.filter(contains(RaceLog, q))
+    if date_debut:
+        query = query.filter(RaceLog.start_time >= date_debut)
+    if date_fin:
+        query = query.filter(RaceLog.start_time <= date_fin)
+    if type_course:
+        query = query.filter(contains(RaceLog, type_course, ['race_name']))
+    if statut == 'termine':
+        query = query.filter(RaceLog.end_time.isnot(None))
+    elif statut == 'en_cours':
+        query = query.filter(RaceLog.end_time.is_(None))
+    return query
+
+
+def connexions_query(args):
+    """Connexions au site correspondant aux filtres ``args`` (sans tri)."""
+    q = args.get('q', '').strip()
+    date_debut = _parse_date(args.get('date_debut') or '')
+    date_fin = _parse_date(args.get('date_fin') or '')
+    type_connexion = args.get('type_connexion')
+
+    query = ConnectionLog.query.with_entities(*CONNEXION_COLUMNS).filter(ConnectionLog.fonction == "site")
+    if q:
+        query = query.filter(contains(ConnectionLog, q))
+    if date_debut:
+        query = query.filter(ConnectionLog.connection_date >= date_debut)
+    if date_fin:
+        query = query.filter(ConnectionLog.connection_date <= date_fin)
+    if type_connexion:
+        query = query.filter(ConnectionLog.type == type_connexion)
+    return query
+
+
+def course_row(row):
+    """Course (tuple de ``COURSE_COLUMNS``) prête à sérialiser."""
+    (course_id, race_name, start_time, end_time, user_name, average_speed, max_speed, distance,
+     weather_conditions, track_conditions) = row
+    return {
+        'id': course_id,
+        'race_name': race_name,
+        'start_time': start_time.isoformat(),
+        'end_time': end_time.isoformat() if end_time else None,
+        'duration': str(end_time - start_time) if end_time else None,
+        'user_name': user_name,
+        'average_speed': average_speed,
+        'max_speed': max_speed,
+        'distance': distance,
+        'weather_conditions': weather_conditions,
+        'track_conditions': track_conditions
+    }
+
+
+@lru_cache(maxsize=4096)
+def _paris_offset(utc_hour):
+    """Décalage de l'heure de Paris pour une heure UTC (les changements d'heure tombent sur une heure pile)."""
+    return pytz.utc.localize(utc_hour).astimezone(PARIS).utcoffset()
+
+
+def to_paris(date):
+    """Date UTC naïve → date naïve à l'heure de Paris."""
+    return date + _paris_offset(date.replace(minute=0, second=0, microsecond=0))
+
+
+def connexion_row(row):
+    """Connexion (tuple de ``CONNEXION_COLUMNS``) prête à sérialiser, date à l'heure de Paris."""
+    _connexion_id, user_name, connexion_type, connection_date = row  # id : curseur de pagination
+    return {
+        'user_name': user_name,
+        'type': connexion_type,
+        'connection_date': to_paris(connection_date).isoformat(timespec='seconds')
+    }
+
+
+# Historique exportable : requête filtrée, tri (date, id), formatage, colonnes
+EXPORTS = {
+    'courses': (courses_query, RaceLog.start_time, RaceLog.id, course_row, COURSE_FIELDS),
+    'connexions': (connexions_query, ConnectionLog.connection_date, ConnectionLog.id, connexion_row, CONNEXION_FIELDS),
+}
+
+
+def export_rows(kind, args, batch_size=EXPORT_BATCH_SIZE):
+    """Toutes les lignes filtrées de ``kind``, du plus récent au plus ancien.
+
+    Les lignes sont lues par lots de ``batch_size`` sur un curseur serveur
+    (``yield_per``) : la mémoire ne dépend pas du nombre de lignes.
+    """
+    build, date_column, id_column, row, _fields = EXPORTS[kind]
+    query = build(args).order_by(date_column.desc(), id_column.desc())
+    for item in query.yield_per(batch_size):
+        yield row(item)
+
+
+def iter_csv(rows, fields):
+    """Encode ``rows`` en CSV (en-tête compris), un fragment par ligne."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+    writer.writeheader()
+    # L'en-tête part avant la première lecture en base
+    yield buffer.getvalue()
+    for row in rows:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(row)
+        yield buffer.getvalue()
+
+
+def iter_ndjson(rows):
+    """Encode ``rows`` en NDJSON (un objet JSON par ligne)."""
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def export(kind, args, fmt):
+    """Fragments texte de l'export ``kind`` au format ``fmt`` (``csv`` ou ``ndjson``).
+
+    Lève ``ValueError`` pour un historique ou un format inconnu.
+    """
+    if kind not in EXPORTS:
+        raise ValueError(f"Historique inconnu : {kind}")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"format doit valoir {', '.join(EXPORT_FORMATS)}")
+    rows = export_rows(kind, args)
+    return iter_csv(rows, EXPORTS[kind][4]) if fmt == 'csv' else iter_ndjson(rows)
@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""Détection des tours côté serveur et création automatique des ``RaceLog``.
+
+Chaque position reçue est comparée à la précédente : si le segment parcouru
+coupe la ligne de départ (dans le sens du premier passage), un tour est
+compté. Le premier passage ouvre une course, l'absence de données pendant
+``LAP_RACE_TIMEOUT`` la ferme. Distance, vitesse maximale et temps des tours
+sont cumulés à chaque échantillon : la ligne ``RaceLog`` est mise à jour en
+O(1) à chaque tour, sans relire les échantillons de la course.
+"""
+import datetime as dt
+import math
+import struct
+
+from flask import has_request_context
+from flask_login import current_user
+
+from app.dashboard.models import RaceLog
+from app.dashboard.persistence import telemetry_writer
+from app.dashboard.shared import SeqlockBuffer
+from app.dashboard.spatial import SegmentGrid
+from app.dashboard.telemetry import telemetry
+from app.extensions import db
+
+LAP_HISTORY = 64  # temps des derniers tours conservés
+STATE_FIELDS = (
+    "has_prev", "direction", "race_open", "laps",
+    "prev_ts", "prev_x", "prev_y", "race_start", "lap_start", "last_ts", "distance", "max_speed", "best_lap",
+    "race_id",
+)
+
+
+def _is_finite(*values):
+    return all(math.isfinite(value) for value in values)
+
+
+def crossing(start, end, line):
+    """Intersection du segment ``start``-``end`` avec ``line`` (x1, y1, x2, y2).
+
+    Retourne ``(fraction du segment, sens)`` ou ``None``. Le sens (+1/-1) est
+    le côté de la ligne d'où vient le véhicule.
+    """
+    (px, py), (qx, qy) = start, end
+    ax, ay, bx, by = line
+    rx, ry, sx, sy = qx - px, qy - py, bx - ax, by - ay
+    denominator = rx * sy - ry * sx
+    if denominator == 0:
+        return None
+    t = ((ax - px) * sy - (ay - py) * sx) / denominator
+    u = ((ax - px) * ry - (ay - py) * rx) / denominator
+    if not (0 < t <= 1 and 0 <= u <= 1):
+        return None
+    return t, 1 if denominator > 0 else -1
+
+
+class LapTracker(SeqlockBuffer):
+    """État de la course en cours, partagé entre les workers.
+
+    Les positions d'un même véhicule peuvent arriver sur n'importe quel
+    worker : l'état (position précédente, cumuls, temps des tours) est dans un
+    buffer mmap et chaque mise à jour se fait sous le verrou d'écriture.
+    """
+
+    MAGIC = b"VLAP"
+    VERSION = 1
+
+    _HEADER = struct.Struct("<4sHHI")  # magic, version, nb champs d'état, nb temps de tours
+    _STATE = struct.Struct("<IiII9dq")
+    _STATE_OFFSET = 24
+    _LAPS_OFFSET = _STATE_OFFSET + _STATE.size
+    _LAP_TIMES = struct.Struct("<%dd" % LAP_HISTORY)
+    _LAP_TIME = struct.Struct("<d")
+
+    def __init__(self, path=None, line=(500.0, 0.0, 500.0, 1000.0), min_lap=5.0, timeout=30.0, scale=1.0):
+        """Créer une instance."""
+        self.line = tuple(line)
+        self.min_lap = min_lap
+        self.timeout = timeout
+        self.scale = scale  # mètres par unité de coordonnée
+        self.app = None
+        super().__init__(path, self._LAPS_OFFSET + self._LAP_TIMES.size)
+
+    def _expected_header(self):
+        return (self.MAGIC, self.VERSION, len(STATE_FIELDS), LAP_HISTORY)
+
+    def _load(self):
+        return dict(zip(STATE_FIELDS, self._STATE.unpack_from(self._buf, self._STATE_OFFSET)))
+
+    def _store(self, state):
+        self._STATE.pack_into(self._buf, self._STATE_OFFSET, *(state[k] for k in STATE_FIELDS))
+
+    def _read_state(self):
+        state = self._load()
+        values = self._LAP_TIMES.unpack_from(self._buf, self._LAPS_OFFSET)
+        count = min(state["laps"], LAP_HISTORY)
+        return state, [values[i % LAP_HISTORY] for i in range(state["laps"] - count, state["laps"])]
+
+    def update(self, timestamp, x, y, speed=0.0):
+        """Traite une position ; retourne l'événement (``"start"``, ``"lap"``, ``"end"``) ou ``None``.
+
+        Une position non finie est ignorée : elle fausserait durablement les
+        cumuls de la course. Une vitesse non finie est traitée comme absente.
+        """
+        if not _is_finite(timestamp, x, y):
+            return None
+        if not _is_finite(speed or 0.0):
+            speed = 0.0
+        events = []
+        with self._writer():
+            self._publish(lambda: events.extend(self._update_locked(timestamp, x, y, speed)))
+        # Écritures en base hors du verrou : les autres workers ne les attendent pas
+        self._persist(events)
+        return events[-1][0] if events else None
+
+    def _update_locked(self, timestamp, x, y, speed):
+        state = self._load()
+        events = []
+        if state["has_prev"] and timestamp <= state["prev_ts"]:
+            if state["prev_ts"] - timestamp <= self.timeout:
+                return events  # trame en retard ou en double : la position précédente est conservée
+            # Horloge revenue en arrière (rejeu, redémarrage du véhicule) : nouvelle session
+            if state["race_open"]:
+                events.append(self._close_locked(state))
+            state["has_prev"] = 0
+        if state["race_open"] and timestamp - state["last_ts"] > self.timeout:
+            events.append(self._close_locked(state))
+            state["has_prev"] = 0
+        if state["has_prev"]:
+            event = self._advance_locked(state, timestamp, x, y, speed)
+            if event:
+                events.append(event)
+        state.update(has_prev=1, prev_ts=timestamp, prev_x=x, prev_y=y, last_ts=timestamp)
+        self._store(state)
+        return events
+
+    def _advance_locked(self, state, timestamp, x, y, speed):
+        """Avance d'un segment ; retourne ``(événement, état, instant)`` ou ``None``."""
+        elapsed = timestamp - state["prev_ts"]
+        length = math.hypot(x - state["prev_x"], y - state["prev_y"]) * self.scale
+        if state["race_open"]:
+            state["distance"] += length
+            state["max_speed"] = max(state["max_speed"], speed or length / elapsed * 3.6)
+        hit = crossing((state["prev_x"], state["prev_y"]), (x, y), self.line)
+        if hit is None or (state["direction"] and hit[1] != state["direction"]):
+            return None
+        crossed_at = state["prev_ts"] + hit[0] * elapsed
+        if not state["race_open"]:
+            state.update(
+                race_open=1, direction=hit[1], laps=0, race_start=crossed_at, lap_start=crossed_at,
+                distance=length * (1 - hit[0]), max_speed=speed or length / elapsed * 3.6, best_lap=0.0,
+                race_id=0,
+            )
+            return "start", dict(state), crossed_at
+        lap = crossed_at - state["lap_start"]
+        if lap < self.min_lap:
+            return None
+        self._LAP_TIME.pack_into(self._buf, self._LAPS_OFFSET + 8 * (state["laps"] % LAP_HISTORY), lap)
+        state.update(laps=state["laps"] + 1, lap_start=crossed_at)
+        state["best_lap"] = min(state["best_lap"] or lap, lap)
+        return "lap", dict(state), crossed_at
+
+    def _close_locked(self, state):
+        event = ("end", dict(state), state["last_ts"])
+        state.update(race_open=0, direction=0, race_id=0)
+        return event
+
+    def close_idle(self, now):
+        """Ferme la course si aucune position n'est arrivée depuis ``timeout`` secondes."""
+
+        def close():
+            state = self._load()
+            if not state["race_open"] or now - state["last_ts"] <= self.timeout:
+                return
+            events.append(self._close_locked(state))
+            state["has_prev"] = 0
+            self._store(state)
+
+        events = []
+        with self._writer():
+            self._publish(close)
+        self._persist(events)
+        return bool(events)
+
+    def status(self):
+        """État de la course en cours (tours, meilleur tour, cumuls)."""
+        _seq, (state, lap_times) = self._snapshot(self._read_state)
+        duration = state["last_ts"] - state["race_start"] if state["race_open"] else 0.0
+        return {
+            "racing": bool(state["race_open"]),
+            "race_id": state["race_id"] or None,
+            "laps": state["laps"],
+            "lap_times": lap_times,
+            "best_lap": state["best_lap"] or None,
+            "current_lap": state["last_ts"] - state["lap_start"] if state["race_open"] else None,
+            "distance": state["distance"],
+            "max_speed": state["max_speed"],
+            "average_speed": self._average_speed(state["distance"], duration),
+            "duration": duration,
+        }
+
+    @property
+    def lap(self):
+        """Numéro (à partir de 0) du tour en cours, ``None`` hors course."""
+        state = self._snapshot(self._load)[1]
+        return state["laps"] if state["race_open"] else None
+
+    @property
+    def race_id(self):
+        """Identifiant de la ``RaceLog`` en cours (``None`` hors course)."""
+        return self._snapshot(self._load)[1]["race_id"] or None
+
+    @staticmethod
+    def _average_speed(distance, duration):
+        return (distance / 1000) / (duration / 3600) if duration > 0 else 0.0
+
+    # Persistance : une écriture à l'ouverture, à chaque tour et à la fermeture. Les
+    # événements portent une copie de l'état prise sous le verrou ; la base est
+    # écrite après sa libération.
+
+    def _persist(self, events):
+        for event, state, timestamp in events:
+            if event == "start":
+                self._attach_race(state["race_start"], self._open_race(timestamp))
+            else:
+                self._save_race(state, timestamp, closed=event == "end")
+
+    def _attach_race(self, race_start, race_id):
+        """Associe la ``RaceLog`` créée à la course en cours, si c'est toujours la même."""
+        if not race_id:
+            return
+
+        def attach():
+            state = self._load()
+            if state["race_open"] and state["race_start"] == race_start and not state["race_id"]:
+                state["race_id"] = race_id
+                self._store(state)
+
+        with self._writer():
+            self._publish(attach)
+
+    def _open_race(self, started_at):
+        if self.app is None or not (has_request_context() and current_user.is_authenticated):
+            return 0  # pas de pilote connu (rejeu hors requête) : course non enregistrée
+        start = dt.datetime.utcfromtimestamp(started_at)
+        with self.app.app_context():
+            race = RaceLog(
+                race_name=f"Course du {start:%d/%m/%Y %H:%M}",
+                start_time=start,
+                user_id=current_user.id,
+                user_name=current_user.username,
+            )
+            db.session.add(race)
+            db.session.commit()
+            return race.id
+
+    def _save_race(self, state, timestamp, closed=False):
+        # Course dont la ligne n'est pas encore rattachée : le tour suivant la mettra à jour
+        if self.app is None or not state["race_id"]:
+            return
+        duration = timestamp - state["race_start"]
+        with self.app.app_context():
+            race = db.session.get(RaceLog, state["race_id"])
+            if race is None:
+                return
+            race.distance = state["distance"] / 1000
+            race.max_speed = state["max_speed"]
+            race.average_speed = self._average_speed(state["distance"], duration)
+            race.race_duration = dt.timedelta(seconds=duration)
+            if closed:
+                race.end_time = dt.datetime.utcfromtimestamp(timestamp)
+            db.session.commit()
+
+
+class Laps:
+    """Extension Flask : détecteur de tours abonné aux positions du véhicule par défaut.
+
+    Les segments parcourus pendant la course sont aussi inscrits, avec leur
+    numéro de tour, dans un index spatial (``index``) vidé à chaque départ.
+    """
+
+    def __init__(self, app=None):
+        """Créer une instance."""
+        self.tracker = None
+        self.index = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure le détecteur de tours (ligne de départ, durées minimales)."""
+        if self.tracker is not None:
+            self.tracker.close()
+            self.index.close()
+        self.tracker = LapTracker(
+            app.config.get("LAP_SHM_PATH"),
+            line=app.config.get("LAP_START_LINE", (500.0, 0.0, 500.0, 1000.0)),
+            min_lap=app.config.get("LAP_MIN_DURATION", 5.0),
+            timeout=app.config.get("LAP_RACE_TIMEOUT", 30.0),
+            scale=app.config.get("LAP_METERS_PER_UNIT", 1.0),
+        )
+        self.tracker.app = app
+        self.index = SegmentGrid(
+            app.config.get("LAP_INDEX_PATH"),
+            capacity=app.config.get("LAP_INDEX_SIZE", 65536),
+            cell=app.config.get("LAP_INDEX_CELL", 10.0),
+        )
+        telemetry.add_position_sink(self.update)
+        telemetry_writer.race_id_provider = lambda: self.tracker.race_id
+        app.extensions["laps"] = self
+
+    def update(self, timestamp, x, y, speed=0.0):
+        """Traite une position : détection des tours puis indexation du segment parcouru."""
+        if not _is_finite(timestamp, x, y):
+            return None
+        event = self.tracker.update(timestamp, x, y, speed)
+        if event == "start":
+            self.index.clear()
+        self.index.add_point(x, y, self.tracker.lap)
+        return event
+
+    def nearest(self, x, y, radius):
+        """Tour et segment de la course les plus proches de ``(x, y)`` (voir ``SegmentGrid.nearest``)."""
+        found = self.index.nearest(x, y, radius)
+        if found is not None:
+            found["lap"] = found.pop("label")
+        return found
+
+
+laps = Laps()
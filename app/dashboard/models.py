@@ -1,11 +1,21 @@
 # -*- coding: utf-8 -*-
 """Dashboard models."""
 import datetime as dt
-from app.extensions import db
+
 import pytz
 
+from app.dashboard import search
+from app.extensions import db
+
+
 class ConnectionLog(db.Model):
+    """Connexion ou déconnexion d'un utilisateur à une fonction du site."""
+
     __tablename__ = "connection_logs"
+    __table_args__ = (
+        # Historique par fonction, du plus récent au plus ancien (pagination par curseur)
+        db.Index("ix_connection_logs_fonction_date", "fonction", "connection_date", "id"),
+    )
     id = db.Column(db.Integer, primary_key=True)
 
     fonction = db.Column(db.String(50), nullable=False)  # dashboard, pilotage, etc.
@@ -16,13 +26,15 @@ class ConnectionLog(db.Model):
     user_name = db.Column(db.String(80), nullable=False)  # snapshot du nom d'utilisateur
 
     def __repr__(self):
-        return f"<ConnectionLog({self.type} - {self.fonction} - {self.connection_date.strftime('%d/%m/%Y %H:%M')} - {self.user_name})>"
+        """Représentation lisible du log."""
+        date = self.connection_date.strftime('%d/%m/%Y %H:%M')
+        return f"<ConnectionLog({self.type} - {self.fonction} - {date} - {self.user_name})>"
 
     @classmethod
     def get_last_connectionlog(cls, fonction):
-        """
-        Retourne le dernier log (tous utilisateurs confondus) pour une fonction donnée,
-        formaté à l'heure française.
+        """Retourne le dernier log d'une fonction, formaté à l'heure française.
+
+        Tous utilisateurs confondus.
         """
         log = (
             cls.query
@@ -37,35 +49,80 @@ class ConnectionLog(db.Model):
         return "Aucune"
 
 class RaceLog(db.Model):
+    """Course enregistrée."""
+
     __tablename__ = "race_logs"
+    __table_args__ = (
+        db.Index("ix_race_logs_start_time", "start_time", "id"),
+    )
     id = db.Column(db.Integer, primary_key=True)
-    
+
     # Informations sur la course
     race_name = db.Column(db.String(100), nullable=False)
     start_time = db.Column(db.DateTime, nullable=False)
     end_time = db.Column(db.DateTime, nullable=True)
     race_duration = db.Column(db.Interval, nullable=True)  # Durée de la course
-    
+
     # Informations sur le pilote
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     user_name = db.Column(db.String(80), nullable=False)
-    
+
     # Statistiques de la course
     average_speed = db.Column(db.Float, nullable=True)  # Vitesse moyenne en km/h
     max_speed = db.Column(db.Float, nullable=True)  # Vitesse maximale en km/h
     distance = db.Column(db.Float, nullable=True)  # Distance parcourue en km
-    
+
     # Conditions de la course
     weather_conditions = db.Column(db.String(50), nullable=True)
     track_conditions = db.Column(db.String(50), nullable=True)
-    
+
     created_at = db.Column(db.DateTime, default=dt.datetime.utcnow, nullable=False)
 
     def __repr__(self):
+        """Représentation lisible de la course."""
         return f"<RaceLog({self.race_name} - {self.start_time.strftime('%d/%m/%Y %H:%M')} - {self.user_name})>"
 
     @property
     def duration(self):
+        """Durée de la course, ou None si elle n'est pas terminée."""
         if self.end_time and self.start_time:
             return self.end_time - self.start_time
         return None
+
+
+search.register(ConnectionLog, "user_name")
+search.register(RaceLog, "race_name", "user_name")
+
+
+class TelemetrySample(db.Model):
+    """Échantillon de télémétrie enregistré pour l'analyse après course."""
+
+    __tablename__ = "telemetry_samples"
+    __table_args__ = (
+        db.Index("ix_telemetry_samples_race_timestamp", "race_id", "timestamp"),
+        db.Index("ix_telemetry_samples_vehicle_timestamp", "vehicle_id", "timestamp"),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+
+    vehicle_id = db.Column(db.String(64), nullable=True)  # identifiant dans ``VEHICLES``
+    race_id = db.Column(db.Integer, db.ForeignKey("race_logs.id"), nullable=True)
+    timestamp = db.Column(db.Float, nullable=False, index=True)  # horodatage epoch (s)
+
+    speed = db.Column(db.Float, nullable=True)
+    distance = db.Column(db.Float, nullable=True)
+    battery = db.Column(db.Float, nullable=True)
+    battery_voltage = db.Column(db.Float, nullable=True)
+    battery_temp = db.Column(db.Float, nullable=True)
+    energy = db.Column(db.Float, nullable=True)
+    current = db.Column(db.Float, nullable=True)
+    motor_power = db.Column(db.Float, nullable=True)
+    motor_speed = db.Column(db.Float, nullable=True)
+    motor_temp = db.Column(db.Float, nullable=True)
+    telemetry = db.Column(db.Float, nullable=True)
+    encoders = db.Column(db.Float, nullable=True)
+
+    race = db.relationship("RaceLog", backref=db.backref("samples", lazy="dynamic"))
+
+    def __repr__(self):
+        """Représentation lisible de l'échantillon."""
+        return f"<TelemetrySample({self.race_id} - {self.timestamp})>"
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""Persistance différée (write-behind) des échantillons de télémétrie."""
+import atexit
+import collections
+import functools
+import os
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.dashboard.fleet import fleet
+from app.dashboard.models import TelemetrySample
+from app.dashboard.telemetry import NUMERIC_FIELDS
+from app.extensions import db
+
+SAMPLE_COLUMNS = ("vehicle_id", "race_id") + NUMERIC_FIELDS
+
+
+class TelemetryWriter:
+    """Tampon borné d'échantillons, écrit en base par une tâche de fond.
+
+    Le chemin de requête ne fait qu'ajouter des tuples au tampon ; la tâche de
+    fond les insère par ``executemany`` dès ``batch_size`` échantillons ou
+    toutes les ``flush_interval`` secondes. Tampon plein : les échantillons les
+    plus anciens sont abandonnés et comptés dans ``dropped``.
+    """
+
+    def __init__(self, app=None):
+        """Créer une instance."""
+        self.app = None
+        self.race_id = None
+        self.race_id_provider = None  # ex. course ouverte par la détection des tours
+        self.tracked_vehicle = None  # véhicule dont la course en cours est suivie
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Configure le tampon et l'abonne à la télémétrie de chaque véhicule si ``TELEMETRY_PERSIST_ENABLED``."""
+        self.app = app
+        self.batch_size = app.config.get("TELEMETRY_PERSIST_BATCH_SIZE", 500)
+        self.flush_interval = app.config.get("TELEMETRY_PERSIST_INTERVAL", 0.5)
+        self.autostart = app.config.get("TELEMETRY_PERSIST_ENABLED", False)
+        self._buffer = collections.deque(maxlen=app.config.get("TELEMETRY_PERSIST_MAX_PENDING", 50000))
+        self._cond = threading.Condition()
+        self._thread = None
+        self.stats = {
+            "written": 0,
+            "dropped": 0,
+            "errors": 0,
+            "flushes": 0,
+            "last_flush_ms": 0.0,
+            "max_flush_ms": 0.0,
+            "total_flush_ms": 0.0,
+        }
+        self.tracked_vehicle = fleet.default.id if fleet.default else None
+        if self.autostart:
+            for vehicle in fleet.vehicles.values():
+                # Trames rejouées : déjà en base lors de l'enregistrement
+                vehicle.telemetry.add_sink(
+                    functools.partial(self.enqueue_columns, vehicle_id=vehicle.id), replayed=False
+                )
+        app.extensions["telemetry_writer"] = self
+
+    def enqueue_columns(self, columns, race_id=None, vehicle_id=None):
+        """Ajoute un bloc de colonnes ``(NUMERIC_FIELDS, n)`` au tampon, sans accès base.
+
+        Sans ``vehicle_id``, les échantillons sont ceux du véhicule par défaut ;
+        seul celui-ci est suivi par la détection des tours (course en cours).
+        """
+        if vehicle_id is None:
+            vehicle_id = self.tracked_vehicle
+        if race_id is None and vehicle_id == self.tracked_vehicle:
+            race_id = self.race_id_provider() if self.race_id_provider else self.race_id
+        rows = columns.T.tolist()
+        with self._cond:
+            overflow = len(self._buffer) + len(rows) - self._buffer.maxlen
+            if overflow > 0:
+                self.stats["dropped"] += overflow
+            self._buffer.extend((vehicle_id, race_id, row) for row in rows)
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify()
+        if self.autostart and self._thread is None:
+            self.start()
+
+    @property
+    def pending(self):
+        """Nombre d'échantillons en attente d'écriture."""
+        return len(self._buffer)
+
+    def flush(self):
+        """Écrit tout le tampon en une insertion groupée ; retourne le nombre de lignes."""
+        with self._cond:
+            pending = list(self._buffer)
+            self._buffer.clear()
+        if not pending:
+            return 0
+        rows = [dict(zip(SAMPLE_COLUMNS, (vehicle_id, race_id, *values))) for vehicle_id, race_id, values in pending]
+        start = time.perf_counter()
+        try:
+            with self.app.app_context():
+                with db.engine.begin() as connection:
+                    connection.execute(TelemetrySample.__table__.insert(), rows)
+        except SQLAlchemyError as exc:
+            self.stats["errors"] += 1
+            self.stats["dropped"] += len(rows)
+            with self.app.app_context():
+                current_app.logger.error("Écriture de la télémétrie impossible : %s", exc)
+            return 0
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.stats["written"] += len(rows)
+        self.stats["flushes"] += 1
+        self.stats["last_flush_ms"] = elapsed_ms
+        self.stats["max_flush_ms"] = max(self.stats["max_flush_ms"], elapsed_ms)
+        self.stats["total_flush_ms"] += elapsed_ms
+        return len(rows)
+
+    def metrics(self):
+        """Statistiques du tampon de ce worker."""
+        flushes = self.stats["flushes"]
+        return dict(
+            self.stats,
+            pending=self.pending,
+            avg_flush_ms=self.stats["total_flush_ms"] / flushes if flushes else 0.0,
+            pid=os.getpid(),
+        )
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._buffer) >= self.batch_size, timeout=self.flush_interval)
+            self.flush()
+
+    def start(self):
+        """Démarre la tâche d'écriture (une fois par processus) et vide le tampon à l'arrêt."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+
+telemetry_writer = TelemetryWriter()
@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+"""Joignabilité des véhicules : un seul sondeur ICMP par hôte, résultat partagé.
+
+Un sondeur de fond (un seul worker, élu par ``flock``) envoie un ping à
+cadence fixe et publie le résultat dans un buffer partagé ; les requêtes
+``/vehicle/ping`` ne font que le lire. Quand l'hôte ne répond plus,
+l'intervalle double à chaque échec (jusqu'à ``max_interval``) pour ne pas
+enchaîner les délais d'attente. Sans requête pendant ``idle_timeout``, le
+sondeur s'arrête ; la requête suivante le relance.
+
+Chaque sondage alimente aussi des statistiques de lien sur plusieurs
+fenêtres glissantes (``LinkStats``) : histogramme des latences, gigue et
+pertes, dans des tableaux de taille fixe.
+"""
+import math
+import re
+import struct
+import threading
+import time
+
+import numpy as np
+from ping3 import ping
+from ping3.errors import PingError
+
+from app.dashboard.shared import LeaderLock, SeqlockBuffer, keyed_path
+
+# Histogramme des latences : classes géométriques de 0,1 ms à 10 s
+LATENCY_BINS = 64
+LATENCY_MIN = 1e-4
+LATENCY_MAX = 10.0
+LATENCY_EDGES = np.geomspace(LATENCY_MIN, LATENCY_MAX, LATENCY_BINS + 1)
+WINDOW_SLOTS = 60  # tranches par fenêtre glissante
+SLOT_FIELDS = ("epoch", "sent", "lost", "jitter_sum", "jitter_count", "latency_sum")
+PERCENTILES = (50, 95, 99)
+MAX_BACKOFF_EXPONENT = 16  # 2 ** échecs borné : pas de dépassement flottant pendant une longue coupure
+
+
+def latency_bin(latency):
+    """Classe de l'histogramme d'une latence (secondes)."""
+    index = math.floor(math.log(max(latency, LATENCY_MIN) / LATENCY_MIN) / math.log(LATENCY_EDGES[1] / LATENCY_MIN))
+    return min(index, LATENCY_BINS - 1)
+
+
+def histogram_percentile(histogram, percentile):
+    """Percentile (secondes) d'un histogramme, interpolé géométriquement dans la classe."""
+    total = histogram.sum()
+    if not total:
+        return None
+    rank = percentile / 100 * total
+    cumulative = np.cumsum(histogram)
+    index = int(np.searchsorted(cumulative, rank))
+    below = cumulative[index - 1] if index else 0
+    fraction = (rank - below) / histogram[index]
+    low, high = LATENCY_EDGES[index], LATENCY_EDGES[index + 1]
+    return float(low * (high / low) ** fraction)
+
+
+class PingSlot(SeqlockBuffer):
+    """Dernier résultat de sondage d'un hôte et statistiques de lien, partagés entre les workers.
+
+    Pour chaque fenêtre de ``windows`` secondes, ``WINDOW_SLOTS`` tranches de
+    durée égale forment un anneau : la tranche courante est remise à zéro
+    quand elle est réutilisée, et une fenêtre se lit en additionnant les
+    tranches encore dans la fenêtre. Mémoire et coût d'un sondage sont
+    constants quelle que soit la durée couverte.
+    """
+
+    MAGIC = b"VPNG"
+    VERSION = 2
+
+    _HEADER = struct.Struct("<4sHHI")  # magic, version, taille de l'état, nb fenêtres
+    _STATE = struct.Struct("<ddII64sd")  # sondé à, latence (NaN si perdu), échecs, sondages, erreur, dernière latence
+    _STATE_OFFSET = 24
+    _REQUESTED = struct.Struct("<d")
+    _REQUESTED_OFFSET = _STATE_OFFSET + _STATE.size
+    _DATA_OFFSET = 128
+
+    def __init__(self, path=None, windows=(60, 300, 3600)):
+        """Créer une instance."""
+        self.windows = tuple(windows)
+        shape = (len(self.windows), WINDOW_SLOTS)
+        slots_size = 8 * len(SLOT_FIELDS) * shape[0] * shape[1]
+        super().__init__(path, self._DATA_OFFSET + slots_size + 4 * LATENCY_BINS * shape[0] * shape[1])
+        self._slots = np.ndarray(shape + (len(SLOT_FIELDS),), dtype="<f8", buffer=self._buf, offset=self._DATA_OFFSET)
+        self._histograms = np.ndarray(
+            shape + (LATENCY_BINS,), dtype="<u4", buffer=self._buf, offset=self._DATA_OFFSET + slots_size
+        )
+
+    def _expected_header(self):
+        return (self.MAGIC, self.VERSION, self._STATE.size, len(self.windows))
+
+    def _reset(self):
+        self._STATE.pack_into(self._buf, self._STATE_OFFSET, 0.0, math.nan, 0, 0, b"", math.nan)
+
+    def close(self):
+        """Ferme le buffer partagé."""
+        self._slots = self._histograms = None  # libère les vues NumPy avant de fermer le mmap
+        super().close()
+
+    def record(self, timestamp, latency, error=None):
+        """Publie un sondage : ``latency`` en secondes, ``None`` si pas de réponse."""
+
+        def copy():
+            _checked, _latency, failures, probes, _error, previous = self._STATE.unpack_from(
+                self._buf, self._STATE_OFFSET
+            )
+            failures = 0 if latency is not None else failures + 1
+            self._accumulate(timestamp, latency, previous)
+            self._STATE.pack_into(
+                self._buf, self._STATE_OFFSET,
+                timestamp, math.nan if latency is None else latency, failures, probes + 1,
+                (error or "").encode()[:64], previous if latency is None else latency,
+            )
+            return failures
+
+        with self._writer():
+            failures = []
+            self._publish(lambda: failures.append(copy()))
+        return failures[0]
+
+    def _accumulate(self, timestamp, latency, previous):
+        sent, lost, jitter_sum, jitter_count, latency_sum = range(1, 6)
+        for index, window in enumerate(self.windows):
+            epoch = math.floor(timestamp * WINDOW_SLOTS / window)
+            slot = self._slots[index, epoch % WINDOW_SLOTS]
+            histogram = self._histograms[index, epoch % WINDOW_SLOTS]
+            if slot[0] != epoch:
+                slot[:] = 0
+                slot[0] = epoch
+                histogram[:] = 0
+            slot[sent] += 1
+            if latency is None:
+                slot[lost] += 1
+                continue
+            histogram[latency_bin(latency)] += 1
+            slot[latency_sum] += latency
+            if not math.isnan(previous):
+                # Gigue : écart absolu entre deux latences successives (RFC 3550, sans lissage)
+                slot[jitter_sum] += abs(latency - previous)
+                slot[jitter_count] += 1
+
+    def read(self):
+        """``(sondé à, latence ou None, échecs consécutifs, sondages, erreur ou None)``."""
+        _seq, (checked, latency, failures, probes, error, _previous) = self._snapshot(
+            lambda: self._STATE.unpack_from(self._buf, self._STATE_OFFSET)
+        )
+        error = error.rstrip(b"\0").decode(errors="replace") or None
+        return checked, None if math.isnan(latency) else latency, failures, probes, error
+
+    def link_stats(self, now):
+        """Statistiques de chaque fenêtre : ``{durée: {sent, lost, loss, mean, jitter, p50, p95, p99}}``.
+
+        Latences et gigue en millisecondes, ``None`` sans réponse dans la fenêtre.
+        """
+        _seq, (slots, histograms) = self._snapshot(lambda: (self._slots.copy(), self._histograms.copy()))
+        stats = {}
+        for index, window in enumerate(self.windows):
+            current = math.floor(now * WINDOW_SLOTS / window)
+            live = (slots[index, :, 0] > current - WINDOW_SLOTS) & (slots[index, :, 0] <= current)
+            _epoch, sent, lost, jitter_sum, jitter_count, latency_sum = slots[index, live].sum(axis=0).tolist()
+            histogram = histograms[index, live].sum(axis=0)
+            received = sent - lost
+            entry = {
+                "sent": int(sent),
+                "lost": int(lost),
+                "loss": round(lost / sent, 4) if sent else None,
+                "mean": round(latency_sum / received * 1000, 2) if received else None,
+                "jitter": round(jitter_sum / jitter_count * 1000, 2) if jitter_count else None,
+            }
+            for percentile in PERCENTILES:
+                value = histogram_percentile(histogram, percentile) if received else None
+                entry[f"p{percentile}"] = round(value * 1000, 2) if value is not None else None
+            stats[window] = entry
+        return stats
+
+    def touch(self, now):
+        """Note que l'état a été demandé à ``now``."""
+        self._REQUESTED.pack_into(self._buf, self._REQUESTED_OFFSET, now)
+
+    @property
+    def last_requested(self):
+        """Date de la dernière demande d'état (epoch, 0 si jamais)."""
+        return self._REQUESTED.unpack_from(self._buf, self._REQUESTED_OFFSET)[0]
+
+
+class HostProber:
+    """Sondeur d'un hôte : mesure de fond, lecture instantanée."""
+
+    def __init__(self, host, slot, interval=1.0, timeout=1.0, max_interval=30.0, idle_timeout=60.0,
+                 lock_path=None, autostart=True):
+        """Créer une instance."""
+        self.host = host
+        self.slot = slot
+        self.interval = interval
+        self.timeout = timeout
+        self.max_interval = max_interval
+        self.idle_timeout = idle_timeout
+        self.autostart = autostart
+        self.leader = LeaderLock(lock_path)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def status(self):
+        """Dernier résultat publié (sans attendre de sondage)."""
+        self.slot.touch(time.time())
+        if self.autostart:
+            self.start()
+        checked, latency, failures, _probes, error = self.slot.read()
+        status = {
+            "connected": latency is not None,
+            "ping": round(latency * 1000, 2) if latency is not None else None,
+            "ip": self.host,
+            "checked_at": checked or None,
+            "failures": failures,
+        }
+        if error:
+            status["error"] = error
+        return status
+
+    def link_stats(self):
+        """Qualité du lien (latences, gigue, pertes) sur chaque fenêtre glissante."""
+        self.slot.touch(time.time())
+        if self.autostart:
+            self.start()
+        return {"ip": self.host, "windows": self.slot.link_stats(time.time())}
+
+    def probe(self):
+        """Envoie un ping, publie le résultat ; retourne le délai avant le suivant."""
+        error = None
+        try:
+            latency = ping(self.host, timeout=self.timeout)
+            if latency is False:  # ping3 : hôte inconnu ou erreur d'envoi
+                latency, error = None, "Hôte injoignable"
+        except (OSError, PingError) as exc:  # permissions ICMP, réseau…
+            latency, error = None, str(exc)
+        failures = self.slot.record(time.time(), latency, error)
+        return min(self.max_interval, self.interval * 2 ** min(failures, MAX_BACKOFF_EXPONENT))
+
+    def start(self):
+        """Démarre le thread de ping s'il ne tourne pas."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"ping-{self.host}", daemon=True)
+                self._thread.start()
+
+    def _idle(self):
+        return time.time() - self.slot.last_requested > self.idle_timeout
+
+    def _run(self):
+        try:
+            while not self._idle():
+                if not self.leader.acquire():
+                    time.sleep(self.interval)  # un autre worker sonde déjà
+                    continue
+                time.sleep(self.probe())
+        finally:
+            self.leader.release()
+            with self._lock:
+                self._thread = None
+
+
+class ReachabilityProbes:
+    """Extension Flask : un ``HostProber`` par hôte, créé à la première demande."""
+
+    def __init__(self, app=None):
+        """Créer une instance."""
+        self._probers = {}
+        self._lock = threading.Lock()
+        self.config = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Lit la configuration des pings (``PING_*``)."""
+        with self._lock:
+            for prober in self._probers.values():
+                prober.slot.close()
+            self._probers = {}
+        self.shm_path = app.config.get("PING_SHM_PATH")
+        self.windows = tuple(app.config.get("PING_STATS_WINDOWS", (60, 300, 3600)))
+        self.config = {
+            "interval": app.config.get("PING_INTERVAL", 1.0),
+            "timeout": app.config.get("PING_TIMEOUT", 1.0),
+            "max_interval": app.config.get("PING_MAX_INTERVAL", 30.0),
+            "idle_timeout": app.config.get("PING_IDLE_TIMEOUT", 60.0),
+            "autostart": app.config.get("PING_PROBER_ENABLED", True),
+        }
+        app.extensions["reachability"] = self
+
+    def get(self, host):
+        """Sondeur de ``host`` (créé et ouvert au besoin)."""
+        with self._lock:
+            prober = self._probers.get(host)
+            if prober is None:
+                path = keyed_path(self.shm_path, re.sub(r"[^A-Za-z0-9_.-]", "_", host))
+                prober = HostProber(
+                    host, PingSlot(path, self.windows), lock_path=f"{path}.lock" if path else None, **self.config
+                )
+                self._probers[host] = prober
+            return prober
+
+
+probes = ReachabilityProbes()
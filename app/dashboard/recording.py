@@ -0,0 +1,409 @@
+# -*- coding: utf-8 -*-
+"""Enregistrement et rejeu de la télémétrie.
+
+Un enregistrement est un fichier en ajout seul : un en-tête de 8 octets puis
+une suite de blocs, un bloc par écriture. Chaque bloc contient les trames au
+format binaire de ``frames`` (en-tête ``VT`` + trames float64) suivies des
+points de trajectoire reçus pendant le bloc (nombre de points, uint32, puis
+``x``, ``y`` en float64)::
+
+    magic "VREC" | version (uint16) | nb champs (uint16) | bloc | bloc | ...
+
+Les alertes ne sont pas enregistrées : le rejeu les réévalue. Les fichiers de
+version 1 (sans trajectoire) restent lisibles.
+"""
+import math
+import os
+import struct
+import threading
+import time
+
+import numpy as np
+
+from app.dashboard import frames as binary_frames
+from app.dashboard.shared import LeaderLock, SeqlockBuffer
+from app.dashboard.telemetry import NUMERIC_FIELDS
+
+RECORDING_EXTENSION = ".vrec"
+FILE_MAGIC = b"VREC"
+FILE_VERSION = 2
+FILE_HEADER = struct.Struct("<4sHH")
+TRACK_COUNT = struct.Struct("<I")
+
+
+class TelemetryRecorder:
+    """Ajoute des blocs de colonnes à un enregistrement.
+
+    Chaque bloc est écrit en un seul ``write`` sur un fichier ouvert en
+    ``O_APPEND`` : plusieurs processus peuvent enregistrer dans le même
+    fichier sans entrelacer leurs blocs.
+    """
+
+    def __init__(self, path):
+        """Créer une instance."""
+        self.path = path
+        self.samples = 0
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        if os.fstat(self._fd).st_size == 0:
+            os.write(self._fd, FILE_HEADER.pack(FILE_MAGIC, FILE_VERSION, len(NUMERIC_FIELDS)))
+        else:
+            with open(path, "rb") as f:
+                _magic, version, _nb_fields = FILE_HEADER.unpack(f.read(FILE_HEADER.size))
+            if version != FILE_VERSION:
+                os.close(self._fd)
+                raise binary_frames.FrameFormatError(f"Enregistrement en version {version} : ajout impossible")
+
+    def write(self, columns, points=None):
+        """Ajoute un bloc ``(NUMERIC_FIELDS, n)`` et les points ``(m, 2)`` reçus pendant le bloc."""
+        if not columns.shape[1]:
+            return
+        points = np.empty((0, 2)) if points is None else np.asarray(points, dtype="<f8").reshape(-1, 2)
+        block = binary_frames.encode_columns(columns) + TRACK_COUNT.pack(len(points)) + points.tobytes()
+        os.write(self._fd, block)
+        self.samples += columns.shape[1]
+
+    def close(self):
+        """Ferme le fichier d'enregistrement."""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def read_blocks(path):
+    """Itère sur les blocs d'un enregistrement : ``(colonnes, points de trajectoire (m, 2))``.
+
+    Lève ``FrameFormatError`` si le fichier n'est pas un enregistrement ; un
+    dernier bloc tronqué (enregistrement interrompu) est ignoré.
+    """
+    with open(path, "rb") as f:
+        header = f.read(FILE_HEADER.size)
+        if len(header) < FILE_HEADER.size:
+            raise binary_frames.FrameFormatError("En-tête d'enregistrement tronqué")
+        magic, version, nb_fields = FILE_HEADER.unpack(header)
+        if magic != FILE_MAGIC or version not in (1, FILE_VERSION):
+            raise binary_frames.FrameFormatError(f"Enregistrement inconnu (version {version})")
+        if nb_fields != len(NUMERIC_FIELDS):
+            raise binary_frames.FrameFormatError(f"{nb_fields} champs enregistrés, {len(NUMERIC_FIELDS)} attendus")
+        while True:
+            head = f.read(binary_frames.HEADER.size)
+            if len(head) < binary_frames.HEADER.size:
+                return
+            count = binary_frames.HEADER.unpack(head)[3]
+            body = f.read(count * binary_frames.FRAME_SIZE)
+            if len(body) < count * binary_frames.FRAME_SIZE:
+                return
+            points = np.empty((0, 2))
+            if version >= 2:
+                raw = f.read(TRACK_COUNT.size)
+                if len(raw) < TRACK_COUNT.size:
+                    return
+                (nb_points,) = TRACK_COUNT.unpack(raw)
+                raw = f.read(nb_points * 16)
+                if len(raw) < nb_points * 16:
+                    return
+                points = np.frombuffer(raw, dtype="<f8").reshape(nb_points, 2)
+            yield binary_frames.decode_frames(head + body), points
+
+
+def read_recording(path):
+    """Itère sur les blocs de colonnes d'un enregistrement, un bloc à la fois (voir ``read_blocks``)."""
+    for columns, _points in read_blocks(path):
+        yield columns
+
+
+def _positions(columns, points):
+    """Positions ``(m, 4)`` (horodatage, x, y, vitesse) des points d'un bloc.
+
+    Les points sont répartis régulièrement sur les échantillons du bloc, le
+    dernier point sur le dernier échantillon.
+    """
+    count = columns.shape[1]
+    owners = ((np.arange(len(points)) + 1) * count - 1) // len(points)
+    return np.column_stack([columns[0, owners], points, columns[1, owners]]), owners
+
+
+def _block_publisher(publish, columns, points):
+    """``publish_range(start, end)`` : publie les échantillons ``[start, end)`` du bloc et leurs points."""
+    if not len(points):
+        return lambda start, end: publish(columns[:, start:end])
+    positions, owners = _positions(columns, points)
+
+    def publish_range(start, end):
+        keep = (owners >= start) & (owners < end)
+        publish(columns[:, start:end], positions=positions[keep])
+    return publish_range
+
+
+def replay(path, publish, speed=1.0, rebase=True, clock=time.monotonic, sleep=time.sleep, stop=None):
+    """Rejoue un enregistrement en appelant ``publish(columns)``.
+
+    Les blocs enregistrés avec une trajectoire sont publiés par
+    ``publish(columns, positions=...)`` (voir ``_positions``) : les points
+    repassent par le tracé et la détection des tours. ``speed`` est le
+    facteur d'accélération (1 = temps réel, N = N fois plus vite) ; ``None``
+    rejoue aussi vite que possible, bloc par bloc. Avec ``rebase``, les
+    horodatages sont décalés pour commencer maintenant et compressés par
+    ``speed``. ``stop`` (``threading.Event``) interrompt le rejeu. Retourne
+    ``{"samples", "blocks", "elapsed", "rate"}``.
+    """
+    started = clock()
+    wall_start = time.time()
+    stopped = stop.is_set if stop is not None else (lambda: False)
+    origin = None
+    samples = blocks = 0
+    for columns, points in read_blocks(path):
+        if origin is None:
+            origin = columns[0, 0]
+        offsets = columns[0] - origin
+        if rebase:
+            columns = columns.copy()
+            columns[0] = wall_start + (offsets / speed if speed else offsets)
+        publish_range = _block_publisher(publish, columns, points)
+        if not speed:
+            publish_range(0, columns.shape[1])
+            samples, blocks = samples + columns.shape[1], blocks + 1
+        else:
+            # Publie, à chaque réveil, tous les échantillons arrivés à échéance
+            due = offsets / speed
+            index = 0
+            while index < columns.shape[1] and not stopped():
+                elapsed = clock() - started
+                ready = int(np.searchsorted(due, elapsed, side="right"))
+                if ready > index:
+                    publish_range(index, ready)
+                    samples, blocks = samples + ready - index, blocks + 1
+                    index = ready
+                else:
+                    sleep(min(due[index] - elapsed, 0.1))
+        if stopped():
+            break
+    elapsed = clock() - started
+    return {
+        "samples": samples,
+        "blocks": blocks,
+        "elapsed": elapsed,
+        "rate": samples / elapsed if elapsed > 0 else None,
+    }
+
+
+class ReplayState(SeqlockBuffer):
+    """État du rejeu en cours, partagé entre les workers.
+
+    Une demande d'arrêt incrémente ``stop_request`` ; le worker qui rejoue
+    compare ce compteur à sa valeur au démarrage.
+    """
+
+    MAGIC = b"VRPL"
+    VERSION = 1
+
+    _HEADER = struct.Struct("<4sHHI")  # magic, version, taille de l'état, réservé
+    # en cours, pid, demandes d'arrêt, vitesse (0 : au plus vite), début, échantillons, blocs, durée, débit,
+    # fichier, erreur
+    _STATE = struct.Struct("<IIQddQQdd128s128s")
+    _STATE_OFFSET = 24
+
+    def __init__(self, path=None):
+        """Créer une instance."""
+        super().__init__(path, self._STATE_OFFSET + self._STATE.size)
+
+    def _expected_header(self):
+        return (self.MAGIC, self.VERSION, self._STATE.size, 0)
+
+    def _reset(self):
+        self._STATE.pack_into(self._buf, self._STATE_OFFSET, 0, 0, 0, 0.0, 0.0, 0, 0, math.nan, math.nan, b"", b"")
+
+    def _load(self):
+        return list(self._STATE.unpack_from(self._buf, self._STATE_OFFSET))
+
+    def _update(self, change):
+        """Applique ``change(valeurs)`` sous le verrou d'écriture ; retourne les valeurs écrites."""
+
+        def copy():
+            values = self._load()
+            change(values)
+            self._STATE.pack_into(self._buf, self._STATE_OFFSET, *values)
+            written.append(values)
+
+        written = []
+        with self._writer():
+            self._publish(copy)
+        return written[0]
+
+    def begin(self, name, speed):
+        """Publie le démarrage d'un rejeu ; retourne le compteur d'arrêts à surveiller."""
+
+        def change(values):
+            values[0:2] = [1, os.getpid()]
+            values[3:] = [speed or 0.0, time.time(), 0, 0, math.nan, math.nan, name.encode()[:128], b""]
+
+        return self._update(change)[2]
+
+    def finish(self, result, error=None):
+        """Publie le bilan du rejeu terminé (voir ``replay``)."""
+
+        def change(values):
+            values[0] = 0
+            values[5:9] = [
+                result.get("samples", 0), result.get("blocks", 0), result.get("elapsed", math.nan),
+                result.get("rate") or math.nan,
+            ]
+            values[10] = (error or "").encode()[:128]
+
+        self._update(change)
+
+    def request_stop(self):
+        """Demande l'arrêt du rejeu en cours, quel que soit le worker qui le joue."""
+        def change(values):
+            values[2] += 1
+
+        self._update(change)
+
+    def stop_requested(self, token):
+        """Indique si un arrêt a été demandé depuis ``token`` (voir ``begin``)."""
+        return self.read()["stop_request"] != token
+
+    def read(self):
+        """État publié du rejeu (dictionnaire)."""
+        running, pid, stop_request, speed, started, samples, blocks, elapsed, rate, name, error = self._snapshot(
+            self._load
+        )[1]
+        state = {"running": bool(running), "pid": pid, "stop_request": stop_request}
+        if name:
+            state.update(
+                file=name.rstrip(b"\0").decode(errors="replace"),
+                speed=speed or None,
+                started=started,
+            )
+        if name and not running:
+            state.update(
+                samples=samples,
+                blocks=blocks,
+                elapsed=None if math.isnan(elapsed) else elapsed,
+                rate=None if math.isnan(rate) else rate,
+            )
+        if error.rstrip(b"\0"):
+            state["error"] = error.rstrip(b"\0").decode(errors="replace")
+        return state
+
+
+class _StopRequest:
+    """``threading.Event`` minimal pour ``replay`` : arrêt demandé depuis n'importe quel worker."""
+
+    def __init__(self, state, token):
+        self.state = state
+        self.token = token
+
+    def is_set(self):
+        return self.state.stop_requested(self.token)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class ReplayEngine:
+    """Extension Flask : rejeu en tâche de fond pour le mode « rejeu » du dashboard.
+
+    Un seul rejeu à la fois pour tous les workers : le worker qui rejoue tient
+    un verrou de leader et publie l'état dans un ``ReplayState`` ; n'importe
+    quel worker lit cet état, demande l'arrêt ou démarre un autre rejeu.
+    """
+
+    def __init__(self, app=None):
+        """Créer une instance."""
+        self.state = None
+        self.leader = None
+        self._thread = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Ouvre l'état partagé du rejeu et son verrou."""
+        if self.state is not None:
+            self.stop()
+            self.state.close()
+        path = app.config.get("REPLAY_SHM_PATH")
+        self.state = ReplayState(path)
+        self.leader = LeaderLock(f"{path}.lock" if path else None)
+        app.extensions["replay"] = self
+
+    @property
+    def running(self):
+        """Indique si un rejeu est en cours, dans ce worker ou un autre."""
+        return self.status()["running"]
+
+    def start(self, path, publish, speed=1.0, timeout=1.0):
+        """Démarre le rejeu de ``path`` après avoir arrêté le rejeu en cours.
+
+        Lève ``RuntimeError`` si le rejeu en cours (dans ce worker ou un
+        autre) ne s'est pas arrêté dans ``timeout`` secondes.
+        """
+        with self._lock:
+            self._start(path, publish, speed, timeout)
+
+    def _start(self, path, publish, speed, timeout):
+        self.stop(timeout)
+        deadline = time.monotonic() + timeout
+        if self._thread is not None:
+            # Le flock est déjà tenu par ce processus : le thread précédent le
+            # rendrait dans son ``finally`` pendant le nouveau rejeu
+            self._thread.join(max(deadline - time.monotonic(), 0))
+            if self._thread.is_alive():
+                raise RuntimeError("Le rejeu précédent de ce worker ne s'est pas arrêté")
+            self._thread = None
+        while not self.leader.acquire():
+            if time.monotonic() > deadline:
+                raise RuntimeError("Un rejeu est déjà en cours sur un autre worker")
+            time.sleep(0.02)
+        stop = _StopRequest(self.state, self.state.begin(os.path.basename(path), speed))
+
+        def run():
+            result, error = {}, None
+            try:
+                result = replay(path, publish, speed=speed, stop=stop)
+            except (OSError, ValueError) as exc:
+                error = str(exc)
+            finally:
+                self.state.finish(result, error)
+                self.leader.release()
+
+        self._thread = threading.Thread(target=run, name="telemetry-replay", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        """Demande l'arrêt du rejeu en cours, quel que soit son worker, et l'attend au plus ``timeout``."""
+        if not self.running:
+            return
+        self.state.request_stop()
+        deadline = time.monotonic() + timeout
+        while self.running and time.monotonic() < deadline:
+            time.sleep(0.02)
+        if self._thread is not None:
+            self._thread.join(max(deadline - time.monotonic(), 0))
+
+    def status(self):
+        """État du rejeu, ``running`` corrigé si le worker qui le jouait est mort."""
+        state = self.state.read()
+        # Worker mort pendant le rejeu : l'état publié n'est plus à jour
+        if state["running"] and not _pid_alive(state["pid"]):
+            state["running"] = False
+        del state["pid"], state["stop_request"]
+        return state
+
+
+def list_recordings(directory):
+    """Noms des enregistrements disponibles dans ``directory``, du plus récent au plus ancien."""
+    if not directory or not os.path.isdir(directory):
+        return []
+    names = [name for name in os.listdir(directory) if name.endswith(RECORDING_EXTENSION)]
+    return sorted(names, key=lambda name: os.path.getmtime(os.path.join(directory, name)), reverse=True)
+
+
+replay_engine = ReplayEngine()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""Recherche de sous-chaînes indexée dans l'historique.
+
+Un filtre ``ilike('%q%')`` ne peut pas utiliser d'index B-tree : chaque
+recherche parcourt toute la table. Selon la base :
+
+* SQLite : une table FTS5 (tokenizer ``trigram``) à contenu externe par
+  table indexée, tenue à jour par des triggers à l'insertion, la
+  modification et la suppression ;
+* PostgreSQL : des index GIN ``pg_trgm``, que ``ilike`` utilise directement ;
+* autres bases, ou recherche de moins de trois caractères : ``ilike``.
+
+Les tables et triggers sont créés avec les tables (``create_all``) et par la
+migration correspondante.
+"""
+import sqlite3
+
+from sqlalchemy import DDL, bindparam, event, literal_column, or_, select, text
+
+from app.extensions import db
+
+# Le tokenizer trigram ne sait pas chercher moins de trois caractères
+MIN_QUERY_LENGTH = 3
+SQLITE_TRIGRAM = sqlite3.sqlite_version_info >= (3, 34, 0)
+
+_indexed = {}  # nom de table → colonnes indexées
+
+
+def fts_table(tablename):
+    """Nom de la table FTS5 de ``tablename``."""
+    return f"{tablename}_fts"
+
+
+def sqlite_statements(tablename, columns):
+    """DDL SQLite : table FTS5 à contenu externe et triggers de synchronisation."""
+    fts = fts_table(tablename)
+    names = ", ".join(columns)
+    new = ", ".join(f"new.{name}" for name in columns)
+    old = ", ".join(f"old.{name}" for name in columns)
+    delete = f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old});"
+    insert = f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({names}, content='{tablename}', "
+        f"content_rowid='id', tokenize='trigram')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tablename} BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tablename} BEGIN {delete} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {names} ON {tablename} "
+        f"BEGIN {delete} {insert} END",
+    ]
+
+
+def postgresql_statements(tablename, columns):
+    """DDL PostgreSQL : un index GIN trigramme par colonne."""
+    return ["CREATE EXTENSION IF NOT EXISTS pg_trgm"] + [
+        f"CREATE INDEX IF NOT EXISTS ix_{tablename}_{name}_trgm ON {tablename} USING gin ({name} gin_trgm_ops)"
+        for name in columns
+    ]
+
+
+def _is_sqlite(ddl, target, bind, **kw):
+    return bind.dialect.name == "sqlite" and SQLITE_TRIGRAM
+
+
+def register(model, *columns):
+    """Déclare les colonnes de ``model`` cherchables par sous-chaîne."""
+    table = model.__table__
+    _indexed[table.name] = columns
+    for statement in sqlite_statements(table.name, columns):
+        event.listen(table, "after_create", DDL(statement).execute_if(callable_=_is_sqlite))
+    event.listen(
+        table, "before_drop", DDL(f"DROP TABLE IF EXISTS {fts_table(table.name)}").execute_if(callable_=_is_sqlite)
+    )
+    for statement in postgresql_statements(table.name, columns):
+        event.listen(table, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+
+
+def _fts_available(tablename):
+    if db.engine.dialect.name != "sqlite" or not SQLITE_TRIGRAM:
+        return False
+    found = db.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": fts_table(tablename)}
+    )
+    return found.first() is not None
+
+
+def contains(model, q, columns=None):
+    """Critère « une des ``columns`` contient ``q`` » (insensible à la casse).
+
+    ``columns`` : noms de colonnes parmi celles déclarées par ``register``
+    (toutes par défaut).
+    """
+    tablename = model.__table__.name
+    columns = tuple(columns or _indexed[tablename])
+    if len(q) >= MIN_QUERY_LENGTH and _fts_available(tablename):
+        fts = fts_table(tablename)
+        phrase = '"' + q.replace('"', '""') + '"'
+        # Requête FTS5 limitée aux colonnes : « {col1 col2} : "phrase" »
+        query = f"{{{' '.join(columns)}}} : {phrase}"
+        match = literal_column(fts).op("MATCH")(bindparam("fts_query", query, unique=True))
+        return model.id.in_(select(literal_column("rowid")).select_from(text(fts)).where(match))
+    return or_(*(getattr(model, name).ilike(f"%{q}%") for name in columns))
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""Buffers en mémoire partagée entre les workers gunicorn."""
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou inter-processus
+    fcntl = None
+
+
+def keyed_path(path, key):
+    """Chemin du buffer d'une instance ``key`` (``None`` : chemin configuré tel quel)."""
+    return f"{path}.{key}" if path and key is not None else path
+
+
+class LeaderLock:
+    """Élection d'un seul processus pour une tâche de fond (``flock`` non bloquant).
+
+    Sans chemin (ou sans ``fcntl``), chaque processus est son propre leader.
+    Le verrou est libéré à la fermeture du descripteur, y compris si le
+    processus meurt : un autre worker reprend alors la tâche.
+    """
+
+    def __init__(self, path):
+        """Créer une instance."""
+        self.path = path
+        self._fd = None
+
+    def acquire(self):
+        """Tente de devenir leader ; retourne ``True`` si c'est (déjà) le cas."""
+        if not self.path or fcntl is None:
+            return True
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def release(self):
+        """Rend le verrou."""
+        if self._fd is not None:
+            os.close(self._fd)  # libère aussi le flock
+            self._fd = None
+
+
+class SharedBuffer:
+    """Buffer mmap partagé entre processus via un fichier (ou anonyme sans chemin).
+
+    Les écrivains sont sérialisés par un verrou local et, entre processus, par
+    ``flock`` sur le fichier. Les sous-classes décrivent leur en-tête attendu
+    et remplissent le buffer vierge dans ``_reset``.
+    """
+
+    _HEADER_OFFSET = 8
+
+    def __init__(self, path, size):
+        """Créer une instance."""
+        self.path = path
+        self.size = size
+        self._lock = threading.Lock()
+        self._fd = None
+        if path:
+            self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+            self._buf = mmap.mmap(self._fd, size)
+        else:
+            # Sans chemin : mémoire anonyme, propre au processus (tests, dev)
+            self._buf = mmap.mmap(-1, size)
+        with self._writer():
+            expected = self._expected_header()
+            if self._HEADER.unpack_from(self._buf, self._HEADER_OFFSET) != expected:
+                self._buf[:] = bytes(size)
+                self._HEADER.pack_into(self._buf, self._HEADER_OFFSET, *expected)
+                self._reset()
+
+    def _expected_header(self):
+        raise NotImplementedError
+
+    def _reset(self):
+        """Initialise le contenu d'un buffer vierge ou incompatible."""
+
+    @contextmanager
+    def _writer(self):
+        with self._lock:
+            if self._fd is not None and fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if self._fd is not None and fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def close(self):
+        """Libère le mapping mémoire et le descripteur de fichier."""
+        self._buf.close()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class SeqlockBuffer(SharedBuffer):
+    """Buffer partagé dont les lectures sont protégées par un seqlock.
+
+    Le compteur ``seq`` (uint64, offset 0) est rendu impair par l'écrivain
+    pendant la copie puis pair une fois les données complètes ; un lecteur
+    recommence tant que ``seq`` est impair ou a changé pendant sa copie. Les
+    lectures ne prennent donc aucun verrou.
+    """
+
+    _SEQ = struct.Struct("<Q")
+    read_retries = 1000
+
+    def __init__(self, path, size):
+        """Créer une instance."""
+        super().__init__(path, size)
+        with self._writer():
+            # Écrivain mort pendant une copie : compteur resté impair dans le fichier
+            seq = self.seq
+            if seq & 1:
+                self._SEQ.pack_into(self._buf, 0, seq + 1)
+
+    @property
+    def seq(self):
+        """Numéro de version des données courantes (pair = stable)."""
+        return self._SEQ.unpack_from(self._buf, 0)[0]
+
+    def _publish(self, copy):
+        """Exécute ``copy()`` entre les deux incréments de ``seq`` (écrivain verrouillé)."""
+        seq = self.seq
+        self._SEQ.pack_into(self._buf, 0, seq + 1)
+        try:
+            copy()
+        finally:
+            # Même en cas d'erreur : un compteur impair bloquerait tous les lecteurs
+            self._SEQ.pack_into(self._buf, 0, seq + 2)
+        return seq + 2
+
+    def _snapshot(self, copy):
+        """Retourne ``(seq, copy())`` pour une copie cohérente des données.
+
+        ``copy`` peut retourner ``None`` si elle lit un état manifestement
+        incohérent ; la lecture est alors recommencée.
+        """
+        for _ in range(self.read_retries):
+            seq = self.seq
+            if not seq & 1:
+                value = copy()
+                if value is not None and self.seq == seq:
+                    return seq, value
+            time.sleep(0)  # laisse l'écrivain terminer (greenlet ou autre processus)
+        with self._writer():
+            return self.seq, copy()
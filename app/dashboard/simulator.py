@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""Véhicule simulé déterministe, un par session de dashboard.
+
+L'état à l'instant ``t`` est une fonction explicite de ``t`` : la puissance
+moteur est une somme de sinusoïdes (phases et fréquences tirées de la graine)
+dont l'intégrale donne directement l'énergie, la batterie et la distance. Un
+instant quelconque se calcule donc en O(1), sans pas de simulation ni état
+global, et une série d'instants en un seul calcul NumPy.
+"""
+import collections
+import math
+import random
+import threading
+import time
+
+import numpy as np
+
+from app.dashboard.telemetry import NUMERIC_FIELDS, default_payload
+
+# Puissance moteur (W) = POWER_MEAN + Σ amplitude × sin(ω t + φ), toujours dans [0, 100]
+POWER_MEAN = 50.0
+POWER_AMPLITUDES = (30.0, 20.0)
+# Décharge : 0,1 % par seconde à pleine puissance (100 W)
+BATTERY_DRAIN = 0.1 / 100
+
+
+class VehicleSimulator:
+    """Trajectoire de télémétrie reproductible à partir de ``seed`` et de l'instant de départ."""
+
+    def __init__(self, seed, start):
+        """Créer une instance."""
+        self.seed = seed
+        self.start = start
+        rng = random.Random(seed)
+        # Périodes de 20 s à 2 min pour la puissance, 5 à 15 s pour le télémètre
+        self._omegas = tuple(2 * math.pi / rng.uniform(20, 120) for _ in POWER_AMPLITUDES)
+        self._phases = tuple(rng.uniform(0, 2 * math.pi) for _ in POWER_AMPLITUDES)
+        self._range_omega = 2 * math.pi / rng.uniform(5, 15)
+        self._range_phase = rng.uniform(0, 2 * math.pi)
+
+    def _power(self, elapsed):
+        power = POWER_MEAN
+        for amplitude, omega, phase in zip(POWER_AMPLITUDES, self._omegas, self._phases):
+            power = power + amplitude * np.sin(omega * elapsed + phase)
+        return power
+
+    def _work(self, elapsed):
+        """Intégrale de la puissance entre le départ et ``elapsed`` (J)."""
+        work = POWER_MEAN * elapsed
+        for amplitude, omega, phase in zip(POWER_AMPLITUDES, self._omegas, self._phases):
+            work = work + amplitude / omega * (np.cos(phase) - np.cos(omega * elapsed + phase))
+        return work
+
+    def columns(self, timestamps):
+        """État aux instants ``timestamps`` (tableau), en colonnes ``(NUMERIC_FIELDS, n)``."""
+        timestamps = np.asarray(timestamps, dtype=float)
+        elapsed = np.maximum(timestamps - self.start, 0.0)
+        power = self._power(elapsed)
+        work = self._work(elapsed)
+        battery = np.maximum(0.0, 100.0 - BATTERY_DRAIN * work)
+        voltage = 10 + battery / 100 * 2.6  # 10-12.6V
+        motor_speed = power * 10  # 0-1000 tr/min
+        values = {
+            "timestamp": timestamps,
+            "speed": motor_speed * 0.001 * 3.6,  # km/h
+            "distance": 0.01 * work,  # 0,001 m par tour/min et par seconde
+            "battery": battery,
+            "battery_voltage": voltage,
+            "battery_temp": 20 + battery / 100 * 10,  # 20-30°C
+            "energy": work / 3600,  # Wh
+            "current": power / voltage,
+            "motor_power": power,
+            "motor_speed": motor_speed,
+            "motor_temp": 25 + power / 100 * 20,  # 25-45°C
+            "telemetry": 105 + 95 * np.sin(self._range_omega * elapsed + self._range_phase),  # 10-200 cm
+            "encoders": np.zeros_like(timestamps),
+        }
+        return np.vstack([values[name] for name in NUMERIC_FIELDS])
+
+    def history(self, fields, until, since=None, points=120):
+        """Historique sur ``points`` instants réguliers jusqu'à ``until``, au format de ``Telemetry.query_history``.
+
+        Sans ``since``, la fenêtre couvre ``points`` secondes. Lève ``KeyError``
+        pour un champ inconnu.
+        """
+        unknown = set(fields) - set(NUMERIC_FIELDS)
+        if unknown:
+            raise KeyError(", ".join(sorted(unknown)))
+        start = max(self.start, since if since is not None else until - points)
+        timestamps = np.linspace(start, until, max(points, 1)) if until > start else np.array([until])
+        columns = self.columns(timestamps)
+        return {
+            "timestamp": timestamps.tolist(),
+            "fields": {name: columns[NUMERIC_FIELDS.index(name)].tolist() for name in fields},
+            "count": len(timestamps),
+            "resolution": "simu",
+        }
+
+    def frame(self, timestamp):
+        """Trame complète (comme ``telemetry.latest()``) à l'instant ``timestamp``."""
+        frame = default_payload()
+        frame.update(zip(NUMERIC_FIELDS, self.columns([timestamp])[:, 0].tolist()))
+        return frame
+
+
+class SimulatorPool:
+    """Simulateurs des sessions actives, en nombre borné.
+
+    Un simulateur inutilisé depuis ``idle_timeout`` secondes est libéré ; au
+    delà de ``max_size``, le moins récemment utilisé l'est aussi. Comme l'état
+    ne dépend que de la graine et du départ, un simulateur évincé (ou absent
+    de ce worker) est simplement reconstruit.
+    """
+
+    def __init__(self, app=None):
+        """Créer une instance."""
+        self.max_size = 256
+        self.idle_timeout = 600
+        self._simulators = collections.OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Lit la taille du pool et le délai d'inactivité."""
+        self.max_size = app.config.get("SIMULATOR_POOL_SIZE", 256)
+        self.idle_timeout = app.config.get("SIMULATOR_IDLE_TIMEOUT", 600)
+        self._simulators.clear()
+        app.extensions["simulators"] = self
+
+    def __len__(self):
+        """Nombre de simulateurs actifs."""
+        return len(self._simulators)
+
+    def get(self, seed, start, now=None):
+        """Simulateur de la session (``seed``, ``start``), créé au besoin."""
+        now = now if now is not None else time.monotonic()
+        key = (seed, start)
+        with self._lock:
+            entry = self._simulators.pop(key, None)
+            simulator = entry[0] if entry else VehicleSimulator(seed, start)
+            self._simulators[key] = (simulator, now)
+            self._evict(now)
+        return simulator
+
+    def _evict(self, now):
+        while self._simulators:
+            key, (_simulator, last_used) = next(iter(self._simulators.items()))
+            if len(self._simulators) <= self.max_size and now - last_used <= self.idle_timeout:
+                return
+            del self._simulators[key]
+
+
+simulators = SimulatorPool()
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""Index spatial des segments parcourus, pour les requêtes « segment le plus proche ».
+
+Grille uniforme hachée : chaque segment est inscrit dans les cellules de
+``cell`` unités que couvre sa boîte englobante, chaque cellule (ramenée à
+l'un des ``buckets`` seaux par hachage) tient la liste chaînée de ses
+entrées, des plus récentes aux plus anciennes. Segments et entrées sont dans
+des anneaux de taille fixe : une entrée ou un segment sorti de l'anneau
+termine simplement le parcours. Une insertion et une requête ne touchent
+donc que quelques cellules, quelle que soit la longueur de la course.
+"""
+import math
+import struct
+
+import numpy as np
+
+from app.dashboard.shared import SeqlockBuffer
+
+MAX_CELLS = 64  # cellules au plus par segment (au delà, segment aberrant ignoré)
+MAX_SPAN = 16  # côté max (en cellules) de la zone d'une requête
+
+
+def _cell_hash(ix, iy, buckets):
+    return ((ix * 73856093) ^ (iy * 19349663)) % buckets
+
+
+class SegmentGrid(SeqlockBuffer):
+    """Segments étiquetés (numéro de tour), partagés entre les workers.
+
+    Les points arrivent un par un (``add_point``) : chaque point forme un
+    segment avec le précédent. Les requêtes ne prennent pas de verrou.
+    """
+
+    MAGIC = b"VIDX"
+    VERSION = 1
+
+    _HEADER = struct.Struct("<4sHHII")  # magic, version, réservé, capacité, nb seaux
+    _STATE = struct.Struct("<qqddI")  # nb segments, nb entrées, dernier point, drapeau « dernier point »
+    _STATE_OFFSET = 24
+    _DATA_OFFSET = 64
+
+    def __init__(self, path=None, capacity=65536, cell=10.0, buckets=4096, entries_per_segment=2):
+        """Créer une instance."""
+        self.capacity = capacity
+        self.cell = float(cell)
+        self.buckets = buckets
+        self.entry_capacity = capacity * entries_per_segment
+        heads = 8 * buckets
+        segments = 32 * capacity
+        labels = 4 * capacity
+        entries = 16 * self.entry_capacity
+        super().__init__(path, self._DATA_OFFSET + heads + segments + labels + entries)
+        offset = self._DATA_OFFSET
+        self._heads = np.ndarray((buckets,), dtype="<i8", buffer=self._buf, offset=offset)
+        offset += heads
+        self._segments = np.ndarray((capacity, 4), dtype="<f8", buffer=self._buf, offset=offset)
+        offset += segments
+        self._labels = np.ndarray((capacity,), dtype="<i4", buffer=self._buf, offset=offset)
+        offset += labels
+        # Entrée : (numéro du segment, entrée suivante de la même cellule)
+        self._entries = np.ndarray((self.entry_capacity, 2), dtype="<i8", buffer=self._buf, offset=offset)
+        # Parcours des listes chaînées en Python : un memoryview évite le coût d'un scalaire NumPy par entrée
+        self._links = memoryview(self._buf)[offset:offset + entries].cast("q")
+
+    @property
+    def max_radius(self):
+        """Rayon de recherche maximal accepté par ``nearest``."""
+        return self.cell * MAX_SPAN / 2
+
+    def _expected_header(self):
+        return (self.MAGIC, self.VERSION, 0, self.capacity, self.buckets)
+
+    def _reset(self):
+        np.ndarray((self.buckets,), dtype="<i8", buffer=self._buf, offset=self._DATA_OFFSET)[:] = -1
+
+    def close(self):
+        """Libère les vues NumPy puis ferme le buffer partagé."""
+        self._links.release()
+        self._heads = self._segments = self._labels = self._entries = self._links = None  # vues avant le mmap
+        super().close()
+
+    def _state(self):
+        return self._STATE.unpack_from(self._buf, self._STATE_OFFSET)
+
+    def __len__(self):
+        """Nombre de segments indexés."""
+        count = self._state()[0]
+        return min(count, self.capacity)
+
+    def add_point(self, x, y, label=None):
+        """Ajoute le segment (dernier point → ``(x, y)``) étiqueté ``label``.
+
+        Sans ``label`` (hors course), le point devient seulement le nouveau
+        point de départ.
+        """
+        with self._writer():
+            self._publish(lambda: self._add_locked(x, y, label))
+
+    def _add_locked(self, x, y, label):
+        count, entries, last_x, last_y, has_last = self._state()
+        if has_last and label is not None and (x, y) != (last_x, last_y):
+            cells = self._cells(min(x, last_x), min(y, last_y), max(x, last_x), max(y, last_y), MAX_CELLS)
+            if cells is not None:
+                slot = count % self.capacity
+                self._segments[slot] = (last_x, last_y, x, y)
+                self._labels[slot] = label
+                for bucket in {_cell_hash(ix, iy, self.buckets) for ix, iy in cells}:
+                    self._entries[entries % self.entry_capacity] = (count, self._heads[bucket])
+                    self._heads[bucket] = entries
+                    entries += 1
+                count += 1
+        self._STATE.pack_into(self._buf, self._STATE_OFFSET, count, entries, x, y, 1)
+
+    def _cells(self, min_x, min_y, max_x, max_y, limit):
+        """Cellules couvrant la boîte, ou ``None`` s'il y en a plus de ``limit``."""
+        x0, x1 = math.floor(min_x / self.cell), math.floor(max_x / self.cell)
+        y0, y1 = math.floor(min_y / self.cell), math.floor(max_y / self.cell)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > limit:
+            return None
+        return [(ix, iy) for ix in range(x0, x1 + 1) for iy in range(y0, y1 + 1)]
+
+    def clear(self):
+        """Vide l'index (nouvelle course)."""
+
+        def reset():
+            self._heads[:] = -1
+            self._STATE.pack_into(self._buf, self._STATE_OFFSET, 0, 0, 0.0, 0.0, 0)
+
+        with self._writer():
+            self._publish(reset)
+
+    def nearest(self, x, y, radius):
+        """Segment le plus proche de ``(x, y)`` à moins de ``radius``, ou ``None``.
+
+        Retourne ``{"segment", "label", "points", "distance", "point"}`` ;
+        ``ValueError`` si ``radius`` dépasse ``max_radius``.
+        """
+        if not 0 <= radius <= self.max_radius:
+            raise ValueError(f"Rayon entre 0 et {self.max_radius:g} attendu")
+        buckets = {
+            _cell_hash(ix, iy, self.buckets)
+            for ix, iy in self._cells(x - radius, y - radius, x + radius, y + radius, (MAX_SPAN + 1) ** 2)
+        }
+        _seq, (ids, segments, labels) = self._snapshot(lambda: self._candidates(buckets))
+        if not len(ids):
+            return None
+        start, end = segments[:, :2], segments[:, 2:]
+        direction = end - start
+        lengths = np.einsum("ij,ij->i", direction, direction)
+        t = np.clip(np.einsum("ij,ij->i", (x, y) - start, direction) / np.where(lengths, lengths, 1), 0, 1)
+        closest = start + t[:, None] * direction
+        distances = np.hypot(closest[:, 0] - x, closest[:, 1] - y)
+        best = int(np.argmin(distances))
+        if distances[best] > radius:
+            return None
+        return {
+            "segment": int(ids[best]),
+            "label": int(labels[best]),
+            "points": segments[best].reshape(2, 2).tolist(),
+            "distance": float(distances[best]),
+            "point": closest[best].tolist(),
+        }
+
+    def _candidates(self, buckets):
+        count, entries, *_last = self._state()
+        oldest_segment = count - self.capacity
+        oldest_entry = entries - self.entry_capacity
+        links, capacity = self._links, self.entry_capacity
+        ids = set()
+        for bucket in buckets:
+            entry = int(self._heads[bucket])
+            while entry >= 0 and entry >= oldest_entry and entry < entries:
+                slot = 2 * (entry % capacity)
+                segment, following = links[slot], links[slot + 1]
+                if following >= entry:
+                    return None  # entrée réécrite pendant la lecture : on recommence
+                if segment < oldest_segment:
+                    break  # entrées plus anciennes : segments déjà recouverts
+                ids.add(segment)
+                entry = following
+        ids = np.fromiter(sorted(ids), dtype=np.int64, count=len(ids))
+        slots = ids % self.capacity
+        return ids, self._segments[slots].copy(), self._labels[slots].copy()
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""Diffusion en continu (Server-Sent Events) de la télémétrie véhicule."""
+import json
+import threading
+import time
+
+
+def format_sse(data, event=None, event_id=None):
+    """Formate un message Server-Sent Events."""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in data.splitlines() or [""])
+    return "\n".join(lines) + "\n\n"
+
+
+class Subscription:
+    """Case « dernier message » d'un abonné.
+
+    Un nouveau message remplace le précédent s'il n'a pas encore été lu :
+    un client lent reçoit la trame la plus récente au lieu d'accumuler un retard.
+    """
+
+    def __init__(self):
+        """Créer une instance."""
+        self._cond = threading.Condition()
+        self._message = None
+        self._version = 0
+        self._seen = 0
+        self.coalesced = 0
+
+    def push(self, message):
+        """Dépose un message ; un message non lu est remplacé."""
+        with self._cond:
+            if self._version != self._seen:
+                self.coalesced += 1
+            self._message = message
+            self._version += 1
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Attend un nouveau message ; retourne ``None`` à l'expiration du délai."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._version != self._seen, timeout):
+                return None
+            self._seen = self._version
+            return self._message
+
+
+class Broadcaster:
+    """Diffuse un même message à tous les abonnés depuis une seule tâche de fond.
+
+    La tâche surveille le numéro de séquence de la source (partagé entre
+    workers) toutes les ``interval`` secondes ; à chaque changement, la trame
+    est lue et sérialisée une seule fois puis déposée chez chaque abonné. La
+    tâche démarre avec le premier abonné et s'arrête avec le dernier. Les
+    messages déposés sont des événements SSE prêts à envoyer.
+    """
+
+    def __init__(self, seq, read, event="telemetry", serialize=json.dumps, interval=0.05, name="telemetry-broadcaster"):
+        """Créer une instance."""
+        self._seq = seq
+        self._read = read
+        self.event = event
+        self._serialize = serialize
+        self.interval = interval
+        self.name = name
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._last = (None, None)  # (seq, message) : dernière trame sérialisée
+        self._pushed = (None, None)  # dernière trame diffusée, modifiée sous ``_lock``
+
+    @property
+    def subscriber_count(self):
+        """Nombre d'abonnés de ce worker."""
+        return len(self._subscribers)
+
+    def subscribe(self):
+        """Crée un abonnement, déjà garni du dernier message connu s'il existe."""
+        subscription = Subscription()
+        with self._lock:
+            # Le dernier message diffusé : ``poll`` déposera les suivants, dans l'ordre
+            if self._pushed[0] is None:
+                self._pushed = self._current()
+            # Rien encore publié (caméra pas encore démarrée) : le premier ``get`` attend une vraie trame
+            if self._pushed[1] is not None:
+                subscription.push(self._pushed[1])
+            self._subscribers.add(subscription)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Retire un abonnement."""
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def _current(self):
+        seq = self._seq()
+        if seq != self._last[0]:
+            data = self._serialize(self._read())
+            self._last = (seq, format_sse(data, event=self.event, event_id=seq))
+        return self._last
+
+    def poll(self):
+        """Diffuse la trame courante si elle a changé depuis le dernier passage."""
+        current = self._current()
+        with self._lock:
+            if current[0] == self._pushed[0]:
+                return False
+            self._pushed = current
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.push(current[1])
+        return True
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+            self.poll()
+            time.sleep(self.interval)
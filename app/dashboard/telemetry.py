@@ -0,0 +1,538 @@
+# -*- coding: utf-8 -*-
+"""Stockage de la télémétrie véhicule partagé entre les workers gunicorn."""
+import json
+import math
+import struct
+
+import numpy as np
+
+from app.dashboard.alerts import AlertEngine
+from app.dashboard.downsample import TelemetryRollups, downsample_indices
+from app.dashboard.shared import SeqlockBuffer, SharedBuffer, keyed_path
+from app.dashboard.stream import Broadcaster
+from app.dashboard.track import DEFAULT_RESOLUTION, TrackStore, parse_points
+
+# Champs numériques de la trame, dans l'ordre de la disposition mémoire
+NUMERIC_FIELDS = (
+    "timestamp",
+    "speed",
+    "distance",
+    "battery",
+    "battery_voltage",
+    "battery_temp",
+    "energy",
+    "current",
+    "motor_power",
+    "motor_speed",
+    "motor_temp",
+    "telemetry",
+    "encoders",
+)
+# Champs de taille variable, sérialisés en JSON à la suite des champs numériques
+EXTRA_FIELDS = ("mode", "track", "alerts")
+MODE_MAX_LENGTH = 32
+# Champs renvoyés par défaut par l'historique
+HISTORY_FIELDS = (
+    "battery",
+    "motor_speed",
+    "motor_power",
+    "current",
+    "battery_temp",
+    "motor_temp",
+    "telemetry",
+    "distance",
+)
+# Facteur de marge : résolution la plus fine donnant au plus ``ROLLUP_OVERSAMPLE × max_points`` points
+ROLLUP_OVERSAMPLE = 4
+
+
+def default_payload():
+    """Trame par défaut, avant toute donnée reçue du véhicule."""
+    return {
+        "timestamp": 0,
+        "mode": "simu",
+        "track": [],
+        "speed": 0,
+        "distance": 0,
+        "battery": 100,
+        "battery_voltage": 12.6,
+        "battery_temp": 25,
+        "energy": 0,
+        "current": 0,
+        "motor_power": 0,
+        "motor_speed": 0,
+        "motor_temp": 25,
+        "telemetry": 0,
+        "encoders": 0,
+        "alerts": [],
+    }
+
+
+def _to_number(key, value):
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            raise ValueError(f"Champ '{key}' : nombre attendu") from None
+    elif isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"Champ '{key}' : nombre attendu")
+    # NaN et infinis refusés, comme par le format binaire
+    if not math.isfinite(value):
+        raise ValueError(f"Champ '{key}' : nombre fini attendu")
+    return value
+
+
+def clean_frame(raw, default_timestamp=None, track_resolution=DEFAULT_RESOLUTION):
+    """Valide une trame reçue et la complète avec les valeurs par défaut.
+
+    L'horodatage fourni par le véhicule est conservé ; à défaut on prend
+    ``default_timestamp`` (heure de réception). Lève ``ValueError`` si la
+    trame n'est pas un objet, si un champ a un type invalide ou si un point
+    du tracé n'est pas quantifiable à ``track_resolution``.
+    """
+    if not isinstance(raw, dict):
+        raise ValueError("Trame invalide : objet JSON attendu")
+    frame = default_payload()
+    for key in NUMERIC_FIELDS:
+        if raw.get(key) is not None:
+            frame[key] = _to_number(key, raw[key])
+    if not frame["timestamp"] and default_timestamp is not None:
+        frame["timestamp"] = default_timestamp
+    if not isinstance(raw.get("mode", frame["mode"]), str):
+        raise ValueError("Champ 'mode' : chaîne attendue")
+    if len(raw.get("mode", frame["mode"])) > MODE_MAX_LENGTH:
+        raise ValueError(f"Champ 'mode' : {MODE_MAX_LENGTH} caractères au plus")
+    frame["mode"] = raw.get("mode", frame["mode"])
+    for key in ("track", "alerts"):
+        value = raw.get(key, frame[key])
+        if not isinstance(value, list):
+            raise ValueError(f"Champ '{key}' : liste attendue")
+        frame[key] = value
+    parse_points(frame["track"], track_resolution)
+    return frame
+
+
+def _take(columns, index):
+    """Applique une même sélection (tranche ou indices) à chaque colonne."""
+    return {name: values[index] for name, values in columns.items()}
+
+
+def frames_to_columns(frames, fields=NUMERIC_FIELDS):
+    """Convertit une liste de trames en colonnes ``(nb champs, n)`` float64."""
+    rows = [[float(frame.get(k) or 0) for k in fields] for frame in frames]
+    return np.array(rows, dtype="<f8").reshape(len(rows), len(fields)).T
+
+
+class SharedTelemetryStore(SeqlockBuffer):
+    """Dernière trame de télémétrie dans un buffer mmap à disposition fixe.
+
+    Disposition : ``seq`` (uint64) | en-tête | champs numériques (float64) |
+    longueur (uint32) + JSON des champs variables.
+
+    Les lectures sont sans verrou (voir ``SeqlockBuffer``).
+    """
+
+    MAGIC = b"VTEL"
+    VERSION = 1
+
+    _HEADER = struct.Struct("<4sHHI")  # magic, version, nb champs, capacité extra
+    _FRAME = struct.Struct("<%dd" % len(NUMERIC_FIELDS))
+    _EXTRA_LEN = struct.Struct("<I")
+
+    _FRAME_OFFSET = 24
+    _EXTRA_OFFSET = _FRAME_OFFSET + _FRAME.size
+
+    def __init__(self, path=None, extra_capacity=65536):
+        """Créer une instance."""
+        self.extra_capacity = extra_capacity
+        super().__init__(path, self._EXTRA_OFFSET + self._EXTRA_LEN.size + extra_capacity)
+
+    def _expected_header(self):
+        return (self.MAGIC, self.VERSION, len(NUMERIC_FIELDS), self.extra_capacity)
+
+    def _reset(self):
+        self._write_locked(default_payload())
+
+    def _encode_extra(self, frame):
+        defaults = default_payload()
+        extra = {k: frame.get(k, defaults[k]) for k in EXTRA_FIELDS}
+        extra["mode"] = str(extra["mode"])[:MODE_MAX_LENGTH]
+        blob = json.dumps(extra, separators=(",", ":")).encode()
+        # Trajectoire trop longue : on garde les points les plus récents
+        while len(blob) > self.extra_capacity and extra["track"]:
+            extra["track"] = extra["track"][len(extra["track"]) // 2 + 1:]
+            blob = json.dumps(extra, separators=(",", ":")).encode()
+        if len(blob) > self.extra_capacity:
+            extra["alerts"] = []
+            blob = json.dumps(extra, separators=(",", ":")).encode()
+        if len(blob) > self.extra_capacity:
+            # Vérifié avant la copie : le buffer partagé reste intact
+            raise ValueError("Trame trop volumineuse pour le buffer partagé")
+        return blob
+
+    def _write_locked(self, frame):
+        numeric = self._FRAME.pack(*(float(frame.get(k) or 0) for k in NUMERIC_FIELDS))
+        extra = self._encode_extra(frame)
+
+        def copy():
+            self._buf[self._FRAME_OFFSET:self._EXTRA_OFFSET] = numeric
+            self._EXTRA_LEN.pack_into(self._buf, self._EXTRA_OFFSET, len(extra))
+            start = self._EXTRA_OFFSET + self._EXTRA_LEN.size
+            self._buf[start:start + len(extra)] = extra
+
+        return self._publish(copy)
+
+    def write(self, frame):
+        """Publie une trame complète et retourne le nouveau numéro de séquence."""
+        with self._writer():
+            return self._write_locked(frame)
+
+    def _copy(self):
+        values = self._FRAME.unpack_from(self._buf, self._FRAME_OFFSET)
+        (length,) = self._EXTRA_LEN.unpack_from(self._buf, self._EXTRA_OFFSET)
+        if length > self.extra_capacity:
+            return None
+        start = self._EXTRA_OFFSET + self._EXTRA_LEN.size
+        return values, self._buf[start:start + length]
+
+    def read(self):
+        """Retourne la dernière trame complète sous forme de dictionnaire."""
+        _, (values, extra) = self._snapshot(self._copy)
+        frame = dict(zip(NUMERIC_FIELDS, values))
+        frame.update(json.loads(extra))
+        return frame
+
+
+class TelemetryRing(SharedBuffer):
+    """Historique circulaire à capacité fixe, une colonne NumPy par champ numérique.
+
+    Les colonnes sont contiguës (tableau ``(nb champs, capacité)``) : extraire
+    un champ sur une plage est une simple tranche. ``count`` compte les
+    échantillons publiés depuis la création, l'échantillon ``i`` occupe la case
+    ``i % capacité``. ``head`` est avancé *avant* la copie et ``count`` *après* :
+    un lecteur relit ``head`` après sa copie et écarte les cases réécrites
+    entre-temps, sans prendre de verrou.
+    """
+
+    MAGIC = b"VHIS"
+    VERSION = 1
+
+    _COUNT = struct.Struct("<Q")
+    _HEADER = struct.Struct("<4sHHI")  # magic, version, nb champs, capacité
+    _HEAD = struct.Struct("<Q")
+
+    _HEAD_OFFSET = 24
+    _DATA_OFFSET = 32
+
+    def __init__(self, path=None, capacity=36000, fields=NUMERIC_FIELDS):
+        """Créer une instance."""
+        self.capacity = capacity
+        self.fields = tuple(fields)
+        self._columns = {name: i for i, name in enumerate(self.fields)}
+        super().__init__(path, self._DATA_OFFSET + 8 * len(self.fields) * capacity)
+        self._data = np.ndarray(
+            (len(self.fields), capacity), dtype="<f8", buffer=self._buf, offset=self._DATA_OFFSET
+        )
+
+    def _expected_header(self):
+        return (self.MAGIC, self.VERSION, len(self.fields), self.capacity)
+
+    def close(self):
+        """Libère la vue NumPy puis ferme le buffer partagé."""
+        self._data = None  # libère la vue NumPy avant de fermer le mmap
+        super().close()
+
+    @property
+    def count(self):
+        """Nombre d'échantillons publiés depuis la création du buffer."""
+        return self._COUNT.unpack_from(self._buf, 0)[0]
+
+    @property
+    def head(self):
+        """Nombre de trames ajoutées depuis la création de l'historique."""
+        return self._HEAD.unpack_from(self._buf, self._HEAD_OFFSET)[0]
+
+    def append(self, frame):
+        """Ajoute une trame (dictionnaire) à l'historique."""
+        return self.extend(frames_to_columns([frame], self.fields))
+
+    def extend_frames(self, frames):
+        """Ajoute une liste de trames en construisant toutes les colonnes d'un coup."""
+        return self.extend(frames_to_columns(frames, self.fields))
+
+    def extend(self, columns):
+        """Ajoute un bloc d'échantillons ``(nb champs, n)`` en une seule copie."""
+        n = columns.shape[1]
+        skipped = max(0, n - self.capacity)
+        if skipped:
+            columns = columns[:, skipped:]
+            n = self.capacity
+        with self._writer():
+            count = self.count + skipped
+            self._HEAD.pack_into(self._buf, self._HEAD_OFFSET, count + n)
+            start = count % self.capacity
+            first = min(n, self.capacity - start)
+            self._data[:, start:start + first] = columns[:, :first]
+            self._data[:, :n - first] = columns[:, first:]
+            self._COUNT.pack_into(self._buf, 0, count + n)
+        return count + n
+
+    def bounds(self):
+        """Horodatages ``(plus ancien, plus récent)`` conservés, ou ``(None, None)``."""
+        count = self.count
+        available = min(count, self.capacity)
+        if not available:
+            return None, None
+        row = self._data[self._columns["timestamp"]]
+        return float(row[(count - available) % self.capacity]), float(row[(count - 1) % self.capacity])
+
+    def count_since(self, since=None):
+        """Nombre d'échantillons conservés postérieurs à ``since``, par dichotomie dans l'anneau."""
+        count = self.count
+        available = min(count, self.capacity)
+        if since is None:
+            return available
+        row = self._data[self._columns["timestamp"]]
+        low, high = count - available, count
+        while low < high:
+            middle = (low + high) // 2
+            if row[middle % self.capacity] <= since:
+                low = middle + 1
+            else:
+                high = middle
+        return count - low
+
+    def read(self, fields=HISTORY_FIELDS, since=None, limit=None):
+        """Retourne ``(timestamps, {champ: colonne}, count)`` pour les échantillons postérieurs à ``since``.
+
+        Les horodatages sont supposés croissants : la borne ``since`` est
+        trouvée par dichotomie, sans parcourir l'historique.
+        """
+        unknown = set(fields) - set(self._columns)
+        if unknown:
+            raise KeyError(", ".join(sorted(unknown)))
+        count = self.count
+        available = min(count, self.capacity)
+        slots = np.arange(count - available, count) % self.capacity
+        timestamps = self._data[self._columns["timestamp"], slots]
+        first = 0
+        if since is not None:
+            first = int(np.searchsorted(timestamps, since, side="right"))
+        if limit is not None:
+            first = max(first, available - limit)
+        slots = slots[first:]
+        columns = {name: self._data[self._columns[name], slots] for name in fields}
+        # Cases réécrites par un écrivain pendant la copie
+        lost = self.head - self.capacity - (count - available + first)
+        if lost > 0:
+            columns = {name: values[lost:] for name, values in columns.items()}
+            first += lost
+        return timestamps[first:], columns, count
+
+
+class Telemetry:
+    """Extension Flask donnant accès au stockage partagé de la télémétrie."""
+
+    def __init__(self, app=None):
+        """Créer une instance."""
+        self.store = None
+        self.history = None
+        self.rollups = None
+        self.track = None
+        self.alerts = None
+        self.broadcaster = None
+        self.sinks = []
+        self.position_sinks = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, vehicle_id=None):
+        """Ouvre (ou crée) les buffers partagés configurés dans les settings.
+
+        Avec ``vehicle_id``, les fichiers partagés sont suffixés par
+        l'identifiant : chaque véhicule de la flotte a ses propres buffers.
+        """
+        self.sinks = []
+        self.position_sinks = []
+        self.close()
+        self.store = SharedTelemetryStore(
+            keyed_path(app.config.get("TELEMETRY_SHM_PATH"), vehicle_id),
+            extra_capacity=app.config.get("TELEMETRY_SHM_EXTRA_BYTES", 65536),
+        )
+        self.history = TelemetryRing(
+            keyed_path(app.config.get("TELEMETRY_HISTORY_PATH"), vehicle_id),
+            capacity=app.config.get("TELEMETRY_HISTORY_SIZE", 36000),
+        )
+        self.rollups = TelemetryRollups(
+            keyed_path(app.config.get("TELEMETRY_ROLLUP_PATH"), vehicle_id),
+            resolutions=app.config.get("TELEMETRY_ROLLUP_RESOLUTIONS", (1, 10, 60)),
+            capacity=app.config.get("TELEMETRY_ROLLUP_SIZE", 4320),
+            fields=NUMERIC_FIELDS,
+        )
+        self.track = TrackStore(
+            keyed_path(app.config.get("TELEMETRY_TRACK_PATH"), vehicle_id),
+            capacity=app.config.get("TELEMETRY_TRACK_SIZE", 20000),
+            resolution=app.config.get("TELEMETRY_TRACK_RESOLUTION", 0.01),
+            tolerance=app.config.get("TELEMETRY_TRACK_TOLERANCE", 0.05),
+        )
+        self.alerts = AlertEngine(
+            keyed_path(app.config.get("ALERT_SHM_PATH"), vehicle_id),
+            rules=app.config.get("ALERT_RULES", ()),
+            fields=NUMERIC_FIELDS,
+        )
+        self.broadcaster = Broadcaster(
+            lambda: self.store.seq,
+            self.latest,
+            interval=app.config.get("TELEMETRY_STREAM_INTERVAL", 0.05),
+        )
+        if vehicle_id is None:
+            app.extensions["telemetry"] = self
+
+    def close(self):
+        """Libère les buffers partagés."""
+        for buffer in (self.store, self.history, self.rollups, self.track, self.alerts):
+            if buffer is not None:
+                buffer.close()
+        self.store = self.history = self.rollups = self.track = self.alerts = None
+
+    def latest(self):
+        """Dernière trame publiée, quel que soit le worker qui l'a reçue."""
+        return self.store.read()
+
+    def _pick_resolution(self, since, max_points):
+        """Source la plus fine couvrant la fenêtre en au plus ``ROLLUP_OVERSAMPLE × max_points`` points."""
+        oldest, newest = self.history.bounds()
+        if oldest is None:
+            return "raw"
+        budget = max_points * ROLLUP_OVERSAMPLE
+        covered = since is None or since >= oldest
+        if covered and self.history.count_since(since) <= budget:
+            return "raw"
+        span = newest - (oldest if since is None else since)
+        for resolution in self.rollups.resolutions:
+            if span / resolution <= budget:
+                return resolution
+        return self.rollups.resolutions[-1]
+
+    def query_history(self, fields=HISTORY_FIELDS, since=None, limit=None, max_points=None,
+                      method="lttb", by=None, resolution=None):
+        """Historique en colonnes, prêt à sérialiser, réduit à ``max_points`` points si demandé.
+
+        ``resolution`` vaut ``"raw"`` (échantillons bruts), une résolution des
+        agrégats en secondes, ou ``None`` pour la choisir selon la fenêtre. Les
+        points conservés sont choisis sur le champ ``by`` (par défaut le premier
+        champ demandé) puis appliqués à tous les champs. Lève ``KeyError`` pour
+        un champ ou une résolution inconnus, ``ValueError`` pour une méthode
+        inconnue.
+        """
+        fields = list(fields)
+        if by is not None and by not in fields:
+            fields.append(by)
+        if resolution is None:
+            resolution = self._pick_resolution(since, max_points) if max_points else "raw"
+        extrema = None
+        if resolution == "raw":
+            timestamps, columns, count = self.history.read(fields, since=since, limit=limit)
+        else:
+            timestamps, columns, lows, highs = self.rollups.read(resolution, fields, since=since)
+            count = self.history.count
+            extrema = {"min": lows, "max": highs}
+            if limit is not None:
+                keep = slice(max(len(timestamps) - limit, 0), None)
+                timestamps, columns = timestamps[keep], _take(columns, keep)
+                extrema = {stat: _take(values, keep) for stat, values in extrema.items()}
+        if max_points and len(timestamps) > max_points:
+            reference = columns[by or fields[0]] if fields else timestamps
+            indices = downsample_indices(timestamps, reference, max_points, method)
+            timestamps, columns = timestamps[indices], _take(columns, indices)
+            if extrema is not None:
+                extrema = {stat: _take(values, indices) for stat, values in extrema.items()}
+        result = {
+            "timestamp": timestamps.tolist(),
+            "fields": {name: values.tolist() for name, values in columns.items()},
+            "count": count,
+            "resolution": resolution,
+        }
+        if extrema is not None:
+            for stat, values in extrema.items():
+                result[stat] = {name: column.tolist() for name, column in values.items()}
+        return result
+
+    def add_sink(self, sink, replayed=True):
+        """Abonne ``sink(columns)`` aux trames publiées par ce worker.
+
+        ``columns`` est un tableau ``(NUMERIC_FIELDS, n)`` ; les sinks
+        (persistance, agrégats…) ne doivent pas bloquer la requête. Avec
+        ``replayed=False``, le sink ne reçoit pas les trames d'un rejeu.
+        """
+        self.sinks.append((sink, replayed))
+
+    def add_position_sink(self, sink):
+        """Abonne ``sink(timestamp, x, y, speed)`` à la position courante de chaque trame reçue."""
+        self.position_sinks.append(sink)
+
+    def _ingest(self, columns, latest, replayed=False):
+        self.history.extend(columns)
+        self.rollups.extend(columns)
+        # Alertes du véhicule + alertes des règles, évaluées sur tout le lot
+        latest = dict(latest, alerts=list(latest.get("alerts") or []) + self.alerts.evaluate(columns))
+        seq = self.store.write(latest)
+        for sink, accepts_replay in self.sinks:
+            if accepts_replay or not replayed:
+                sink(columns)
+        return seq
+
+    def _consume_track(self, frames):
+        """Verse la trajectoire des trames dans le tracé partagé.
+
+        La trame courante ne garde que la position courante : sa taille ne
+        dépend plus de la durée de la course (tracé complet via ``track.read``).
+        """
+        for frame in frames:
+            if frame.get("track"):
+                self.track.ingest(frame["track"])
+                if self.position_sinks:
+                    (x, y), = parse_points(frame["track"][-1:], self.track.resolution)
+                    for sink in self.position_sinks:
+                        sink(frame["timestamp"], x, y, frame.get("speed") or 0.0)
+        latest = dict(frames[-1])
+        latest["track"] = list(latest.get("track") or [])[-1:]
+        return latest
+
+    def publish(self, frame):
+        """Publie une trame pour tous les workers et l'ajoute à l'historique."""
+        return self._ingest(frames_to_columns([frame]), self._consume_track([frame]))
+
+    def publish_batch(self, frames):
+        """Ajoute un lot de trames validées à l'historique en une seule écriture.
+
+        Seule la dernière trame du lot devient la trame courante.
+        """
+        if not frames:
+            return self.store.seq
+        return self._ingest(frames_to_columns(frames), self._consume_track(frames))
+
+    def publish_columns(self, columns, positions=None, replayed=False, mode="real"):
+        """Ajoute un bloc de colonnes ``(NUMERIC_FIELDS, n)`` déjà décodé (format binaire, rejeu).
+
+        ``positions`` : tableau ``(m, 4)`` (horodatage, x, y, vitesse) versé
+        dans le tracé et transmis aux abonnés des positions. ``replayed``
+        marque les trames d'un rejeu (mode ``replay``, non persistées, sans
+        abonnés des positions : un rejeu ne compte pas de tours). Le
+        format binaire ne transporte pas le mode : ``mode`` est celui de la
+        trame courante publiée (``real`` par défaut, trames du véhicule).
+        """
+        if not columns.shape[1]:
+            return self.store.seq
+        latest = dict(zip(NUMERIC_FIELDS, columns[:, -1].tolist()), mode="replay" if replayed else mode)
+        if positions is not None and len(positions):
+            self.track.ingest(positions[:, 1:3])
+            if not replayed:
+                for timestamp, x, y, speed in positions.tolist():
+                    for sink in self.position_sinks:
+                        sink(timestamp, x, y, speed)
+            latest["track"] = [positions[-1, 1:3].tolist()]
+        return self._ingest(columns, latest, replayed=replayed)
+
+
+telemetry = Telemetry()
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""Trajectoire du véhicule : points simplifiés et quantifiés, lus par curseur.
+
+Les points reçus sont quantifiés (entiers en unités de ``resolution``) puis
+simplifiés au fil de l'eau : un point n'est conservé que lorsque le segment
+depuis le dernier point conservé ne passe plus à moins de ``tolerance`` de
+tous les points intermédiaires (critère de Douglas-Peucker appliqué à une
+fenêtre glissante). Les points conservés sont numérotés : un client demande
+ceux postérieurs à son curseur et reçoit une réponse de taille constante,
+quelle que soit la durée de la course.
+
+Format binaire (``encode_points``) : en-tête ``<QIIf`` (curseur, nb points,
+drapeaux, résolution) puis les coordonnées en varints zigzag, le premier
+point en absolu et les suivants en delta.
+"""
+import struct
+
+import numpy as np
+
+from app.dashboard.shared import SeqlockBuffer
+
+TRACK_HEADER = struct.Struct("<QIIf")
+FLAG_RESET = 1  # le curseur était trop ancien : les points repartent du plus ancien conservé
+FLAG_TAIL = 2  # le dernier point est la position courante, pas encore conservée
+DEFAULT_RESOLUTION = 0.01
+MAX_QUANTIZED = 2**31 - 1  # coordonnées quantifiées stockées en int32
+
+
+def check_points(points, resolution=DEFAULT_RESOLUTION):
+    """Lève ``ValueError`` si un point n'est pas fini ou sort de la plage quantifiable à ``resolution``."""
+    if not np.isfinite(points).all():
+        raise ValueError("Champ 'track' : coordonnées finies attendues")
+    limit = MAX_QUANTIZED * resolution
+    if len(points) and np.abs(points).max() > limit:
+        raise ValueError(f"Champ 'track' : coordonnées comprises entre -{limit:g} et {limit:g} attendues")
+
+
+def parse_points(points, resolution=DEFAULT_RESOLUTION):
+    """Convertit une liste de points ``[x, y]`` ou ``{"x", "y"}`` en tableau ``(n, 2)``.
+
+    Lève ``ValueError`` si un point n'a pas deux coordonnées numériques,
+    finies et quantifiables à ``resolution`` (voir ``check_points``).
+    """
+    pairs = []
+    for point in points:
+        if isinstance(point, dict):
+            point = (point.get("x"), point.get("y"))
+        if not isinstance(point, (list, tuple)) or len(point) < 2:
+            raise ValueError("Champ 'track' : points [x, y] attendus")
+        x, y = point[0], point[1]
+        if any(isinstance(v, bool) or not isinstance(v, (int, float)) for v in (x, y)):
+            raise ValueError("Champ 'track' : coordonnées numériques attendues")
+        pairs.append((x, y))
+    array = np.array(pairs, dtype=float).reshape(len(pairs), 2)
+    check_points(array, resolution)
+    return array
+
+
+def _segment_distances(points, start, end):
+    """Distance de chaque point au segment ``start``-``end``."""
+    direction = end - start
+    length = float(direction @ direction)
+    if length == 0:
+        return np.hypot(*(points - start).T)
+    t = np.clip((points - start) @ direction / length, 0, 1)
+    return np.hypot(*(points - (start + t[:, None] * direction)).T)
+
+
+def encode_varints(values):
+    """Encode des entiers signés en varints zigzag (LEB128), sans boucle sur les valeurs."""
+    values = np.asarray(values, dtype=np.int64)
+    zigzag = ((values << 1) ^ (values >> 63)).astype(np.uint64)
+    shifts = np.arange(10, dtype=np.uint64) * np.uint64(7)
+    groups = ((zigzag[:, None] >> shifts) & np.uint64(0x7F)).astype(np.uint8)
+    lengths = np.maximum(1, 10 - np.argmax((groups != 0)[:, ::-1], axis=1))
+    lengths[~groups.any(axis=1)] = 1
+    position = np.arange(10)
+    groups[position < lengths[:, None] - 1] |= 0x80
+    return groups[position < lengths[:, None]].tobytes()
+
+
+def decode_varints(data):
+    """Décode une suite de varints zigzag en entiers signés."""
+    raw = np.frombuffer(data, dtype=np.uint8)
+    if not raw.size:
+        return np.empty(0, dtype=np.int64)
+    ends = np.flatnonzero((raw & 0x80) == 0)
+    group = np.concatenate(([0], np.cumsum((raw & 0x80) == 0)[:-1]))
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    shifts = (np.arange(raw.size) - starts[group]).astype(np.uint64) * np.uint64(7)
+    parts = (raw & 0x7F).astype(np.uint64) << shifts
+    zigzag = np.bitwise_or.reduceat(parts, starts)
+    return (zigzag >> np.uint64(1)).astype(np.int64) ^ -(zigzag & np.uint64(1)).astype(np.int64)
+
+
+def encode_points(cursor, points, resolution, reset=False, tail=None):
+    """Encode des points ``(n, 2)`` (et la position courante) au format binaire."""
+    flags = (FLAG_RESET if reset else 0) | (FLAG_TAIL if tail is not None else 0)
+    if tail is not None:
+        points = np.vstack([points, np.asarray(tail, dtype=float).reshape(1, 2)])
+    quantized = np.rint(points / resolution).astype(np.int64)
+    deltas = np.diff(quantized, axis=0, prepend=np.zeros((1, 2), dtype=np.int64))
+    header = TRACK_HEADER.pack(cursor, len(points), flags, resolution)
+    return header + encode_varints(deltas.ravel())
+
+
+def decode_points(body):
+    """Inverse de ``encode_points`` : ``(cursor, points, reset, tail)``."""
+    cursor, count, flags, resolution = TRACK_HEADER.unpack_from(body)
+    deltas = decode_varints(body[TRACK_HEADER.size:]).reshape(count, 2)
+    points = np.cumsum(deltas, axis=0) * float(np.float32(resolution))
+    tail = None
+    if flags & FLAG_TAIL:
+        points, tail = points[:-1], points[-1]
+    return cursor, points, bool(flags & FLAG_RESET), tail
+
+
+class TrackStore(SeqlockBuffer):
+    """Trajectoire simplifiée, partagée entre les workers, à mémoire fixe.
+
+    Les ``capacity`` derniers points conservés sont gardés dans un anneau
+    d'entiers 32 bits ; la fenêtre de simplification (points reçus depuis le
+    dernier point conservé, ``window`` au plus) est elle aussi en mémoire
+    partagée, ainsi n'importe quel worker peut recevoir la suite du tracé.
+    """
+
+    MAGIC = b"VTRK"
+    VERSION = 1
+
+    _HEADER = struct.Struct("<4sHHI")  # magic, version, taille de fenêtre, capacité
+    _STATE = struct.Struct("<QII")  # nb points conservés, nb points en fenêtre, drapeau « dernier brut »
+    _STATE_OFFSET = 24
+    _LAST_OFFSET = 40  # dernier point brut reçu (2 × float64)
+    _DATA_OFFSET = 56
+
+    def __init__(self, path=None, capacity=20000, resolution=DEFAULT_RESOLUTION, tolerance=0.05, window=256):
+        """Créer une instance."""
+        self.capacity = capacity
+        self.resolution = resolution
+        self.tolerance = tolerance / resolution  # en unités quantifiées
+        self.window = window
+        super().__init__(path, self._DATA_OFFSET + 8 * (capacity + window))
+        self._points = np.ndarray((capacity, 2), dtype="<i4", buffer=self._buf, offset=self._DATA_OFFSET)
+        self._pending = np.ndarray(
+            (window, 2), dtype="<i4", buffer=self._buf, offset=self._DATA_OFFSET + 8 * capacity
+        )
+        self._last = np.ndarray((2,), dtype="<f8", buffer=self._buf, offset=self._LAST_OFFSET)
+
+    def _expected_header(self):
+        return (self.MAGIC, self.VERSION, self.window, self.capacity)
+
+    def close(self):
+        """Ferme le buffer partagé."""
+        self._points = self._pending = self._last = None  # libère les vues NumPy avant de fermer le mmap
+        super().close()
+
+    def _state(self):
+        return self._STATE.unpack_from(self._buf, self._STATE_OFFSET)
+
+    @property
+    def count(self):
+        """Nombre de points conservés depuis la création (curseur du dernier point)."""
+        return self._state()[0]
+
+    def ingest(self, points):
+        """Ajoute les nouveaux points d'une trajectoire reçue.
+
+        Le véhicule peut renvoyer toute sa trajectoire ou seulement les derniers
+        points : seuls ceux qui suivent le dernier point déjà reçu sont ajoutés.
+        """
+        if isinstance(points, np.ndarray):
+            check_points(points, self.resolution)
+        else:
+            points = parse_points(points, self.resolution)
+        if not len(points):
+            return 0
+        with self._writer():
+            _count, _pending, has_last = self._state()
+            if has_last:
+                matches = np.flatnonzero((points == self._last).all(axis=1))
+                if matches.size:
+                    points = points[matches[-1] + 1:]
+            if not len(points):
+                return 0
+            return self._publish(lambda: self._extend_locked(points))
+
+    def _extend_locked(self, points):
+        count, pending, _has_last = self._state()
+        quantized = np.rint(points / self.resolution).astype(np.int32)
+        for point in quantized:
+            if count == 0:
+                self._points[0] = point
+                count, pending = 1, 0
+                continue
+            anchor = self._points[(count - 1) % self.capacity].astype(float)
+            window = self._pending[:pending].astype(float)
+            fits = pending < self.window and (
+                not pending or _segment_distances(window, anchor, point.astype(float)).max() <= self.tolerance
+            )
+            if fits:
+                self._pending[pending] = point
+                pending += 1
+            else:
+                # Le dernier point de la fenêtre devient un point conservé
+                self._points[count % self.capacity] = self._pending[pending - 1]
+                count += 1
+                self._pending[0] = point
+                pending = 1
+        self._last[:] = points[-1]
+        self._STATE.pack_into(self._buf, self._STATE_OFFSET, count, pending, 1)
+
+    def read(self, cursor=0):
+        """Points conservés après ``cursor`` : ``(points, nouveau curseur, reset, position courante)``.
+
+        Un curseur sorti de l'anneau (ou venant d'une trajectoire précédente)
+        renvoie tous les points conservés avec ``reset`` vrai.
+        """
+
+        def copy():
+            count, pending, _has_last = self._state()
+            oldest = max(0, count - self.capacity)
+            reset = cursor < oldest or cursor > count
+            first = oldest if reset else cursor
+            slots = np.arange(first, count) % self.capacity
+            tail = self._pending[pending - 1].copy() if pending else None
+            return self._points[slots].copy(), count, reset, tail
+
+        _seq, (points, count, reset, tail) = self._snapshot(copy)
+        tail = tail * self.resolution if tail is not None else None
+        return points * self.resolution, count, reset, tail
+
+    def clear(self):
+        """Efface la trajectoire (nouvelle course)."""
+        with self._writer():
+            self._publish(lambda: self._STATE.pack_into(self._buf, self._STATE_OFFSET, 0, 0, 0))
@@ -1,53 +1,48 @@
 # -*- coding: utf-8 -*-
 """Dashboard views."""
-from app.common.views import *
-from app.dashboard.models import ConnectionLog, RaceLog
+import functools
+import json
+import math
 import random
+from urllib.parse import urlparse
 
-dashboard_bp = Blueprint("dashboard", __name__, url_prefix="/dashboard")
+from app.common.views import *
+from app.dashboard import frames as binary_frames
+from app.dashboard.camera import AUTO_TIER, MJPEG_MIMETYPE, cameras
+from app.dashboard.control import CONTROL_FIELDS, clean_command
+from app.dashboard.downsample import DOWNSAMPLE_METHODS
+from app.dashboard.fleet import fleet
+from app.dashboard.laps import laps
+from app.dashboard.models import ConnectionLog
+from app.dashboard.persistence import telemetry_writer
+from app.dashboard.reachability import probes
+from app.dashboard.recording import RECORDING_EXTENSION, list_recordings, replay_engine
+from app.dashboard.simulator import simulators
+from app.dashboard.stream import format_sse
+from app.dashboard.telemetry import HISTORY_FIELDS, clean_frame, telemetry
+from app.dashboard.track import encode_points
+from app.extensions import sock
 
-connection_info = {
-    "ip": os.getenv("ROBOT_IP", "192.168.1.100"),
-    "mac": os.getenv("ROBOT_MAC", "00:00:00:00:00:00"),
-}
-
-def _default_payload():
-    return {
-        "timestamp": 0,
-        "mode": "simu",
-        "track": [],
-        "speed": 0,
-        "distance": 0,
-        "battery": 100,
-        "battery_voltage": 12.6,
-        "battery_temp": 25,
-        "energy": 0,
-        "current": 0,
-        "motor_power": 0,
-        "motor_speed": 0,
-        "motor_temp": 25,
-        "telemetry": 0,
-        "encoders": 0,
-        "alerts": [],
-    }
-
-LATEST_DATA = _default_payload()
+dashboard_bp = Blueprint("dashboard", __name__, url_prefix="/dashboard")
 
 @dashboard_bp.route("/")
 @login_required
 @permission_required("dashboard")
 def index():
+    """Redirige vers la page de connexion au véhicule."""
     return redirect(url_for("dashboard.connect"))
 
 @dashboard_bp.route("/connect", methods=["GET", "POST"])
 @login_required
 @permission_required("dashboard")
 def connect():
+    """Connexion au véhicule (POST : connecter ou déconnecter, journalisé)."""
     last_log = ConnectionLog.get_last_connectionlog("dashboard")
     if request.method == "POST":
         action = request.form.get("action")
         session["dashboard_connected"] = True
         session["dashboard_mode"] = "simu" if action == "simulate" else "real"
+        session.pop("simu_seed", None)  # nouvelle simulation à chaque connexion
 
         next_page = session.pop("dashboard_next", None)
         if next_page and next_page.startswith("/dashboard"):
@@ -56,7 +51,7 @@ def connect():
 
     return render_template(
         "dashboard/connect.html",
-        config_connection=connection_info,
+        config_connection=fleet.default.info(),
         last_connection=last_log,
     )
 
@@ -64,113 +59,534 @@ def connect():
 @login_required
 @permission_required("dashboard")
 def maps():
+    """Carte du circuit."""
     if not session.get("dashboard_connected"):
         session["dashboard_next"] = request.path
         return redirect(url_for("dashboard.connect"))
     current_user.log_connection("dashboard", "view_maps")
     return render_template(
         "dashboard/maps.html",
-        config_connection=connection_info,
+        config_connection=fleet.default.info(),
     )
 
+@dashboard_bp.route("/maps/nearest")
+@login_required
+@permission_required("dashboard")
+def maps_nearest():
+    """Tour et segment de la course les plus proches de ``(x, y)``, à moins de ``radius``."""
+    x = request.args.get("x", type=float)
+    y = request.args.get("y", type=float)
+    radius = request.args.get("radius", 5.0, type=float)
+    # float() accepte « inf » et « nan » : refusés avant le calcul des cellules
+    if x is None or y is None or radius is None or not all(map(math.isfinite, (x, y, radius))):
+        return jsonify({"status": "error", "message": "Paramètres 'x', 'y' et 'radius' numériques finis attendus"}), 400
+    try:
+        nearest = laps.nearest(x, y, radius)
+    except ValueError as exc:
+        return jsonify({"status": "error", "message": str(exc)}), 400
+    return jsonify({"found": nearest is not None, **(nearest or {})})
+
 @dashboard_bp.route("/stats")
 @login_required
 @permission_required("dashboard")
 def stats():
+    """Statistiques de la course."""
     if not session.get("dashboard_connected"):
         session["dashboard_next"] = request.path
         return redirect(url_for("dashboard.connect"))
     current_user.log_connection("dashboard", "view_stats")
     return render_template(
         "dashboard/stats.html",
-        config_connection=connection_info,
+        config_connection=fleet.default.info(),
     )
 
 @dashboard_bp.route("/pilotage")
 @login_required
 @permission_required("pilotage")
 def pilotage():
+    """Page de pilotage."""
     if not session.get("dashboard_connected"):
         session["dashboard_next"] = request.path
         return redirect(url_for("dashboard.connect"))
     return render_template(
         "dashboard/pilotage.html",
-        config_connection=connection_info,
+        config_connection=fleet.default.info(),
     )
 
+def _session_simulator():
+    """Simulateur propre à la session : graine et départ sont conservés dans la session."""
+    if "simu_seed" not in session:
+        session["simu_seed"] = random.getrandbits(32)
+        session["simu_start"] = time.time()
+    return simulators.get(session["simu_seed"], session["simu_start"])
+
 @dashboard_bp.route("/vehicle/data", methods=["GET", "POST"])
 @login_required
 @permission_required("dashboard")
 def vehicle_data():
-    global LATEST_DATA
+    """Trame du véhicule par défaut, ou de la simulation de la session en mode ``simu``."""
+    if request.method == "GET" and session.get("dashboard_mode") == "simu":
+        return _frame_response(_session_simulator().frame(time.time()))
+    return _vehicle_data(fleet.default)
+
+@dashboard_bp.route("/vehicle/<vehicle_id>/data", methods=["GET", "POST"])
+@login_required
+@permission_required("dashboard")
+def fleet_vehicle_data(vehicle_id):
+    """Trame d'un véhicule de la flotte (voir ``_vehicle_data``)."""
+    vehicle = fleet.get(vehicle_id)
+    if vehicle is None:
+        return _unknown_vehicle(vehicle_id)
+    return _vehicle_data(vehicle)
+
+def _unknown_vehicle(vehicle_id):
+    return jsonify({"status": "error", "message": f"Véhicule inconnu : {vehicle_id}"}), 404
+
+def _vehicle_data(vehicle):
+    """Trame courante du véhicule (GET) ou ingestion d'une trame JSON ou binaire (POST)."""
+    if request.method == "POST" and request.mimetype == binary_frames.MIMETYPE:
+        return _ingest_binary(vehicle.telemetry)
     if request.method == "POST":
         payload = request.get_json(silent=True) or {}
-        payload["timestamp"] = int(time.time())
-        clean = _default_payload()
-        clean.update({k: payload.get(k, clean[k]) for k in clean.keys()})
-        LATEST_DATA = clean
+        if isinstance(payload, dict):
+            payload["timestamp"] = time.time()
+        try:
+            clean = clean_frame(payload, track_resolution=vehicle.telemetry.track.resolution)
+        except ValueError as exc:
+            return jsonify({"status": "error", "message": str(exc)}), 400
+        vehicle.telemetry.publish(clean)
         return jsonify({"status": "ok"})
-    
-    # En mode simulation, générer des données réalistes
+    return _frame_response(vehicle.telemetry.latest())
+
+def _frame_response(data):
+    if _wants_binary():
+        return _binary_response(binary_frames.encode_frames([data]))
+    return jsonify(data)
+
+def _wants_binary():
+    """Indique si le client demande la trame au format binaire (``?format=binary`` ou ``Accept``)."""
+    if request.args.get("format") == "binary":
+        return True
+    best = request.accept_mimetypes.best_match(["application/json", binary_frames.MIMETYPE])
+    return best == binary_frames.MIMETYPE
+
+def _binary_response(body):
+    return current_app.response_class(body, mimetype=binary_frames.MIMETYPE)
+
+def _ingest_binary(telemetry):
+    """Ingestion d'une charge utile binaire, décodée directement en colonnes."""
+    try:
+        columns = binary_frames.decode_frames(request.get_data(), default_timestamp=time.time())
+    except binary_frames.FrameFormatError as exc:
+        return jsonify({"status": "error", "message": str(exc)}), 400
+    telemetry.publish_columns(columns)
+    return jsonify({"status": "ok", "accepted": columns.shape[1], "rejected": []})
+
+def _iter_batch_frames():
+    """Trames brutes d'un lot : tableau JSON ou flux NDJSON (une trame par ligne)."""
+    if request.mimetype in ("application/x-ndjson", "application/jsonl"):
+        for line in request.stream:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield line  # ligne illisible : rejetée par clean_frame
+        return
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, list):
+        raise ValueError("Tableau JSON ou NDJSON attendu")
+    yield from payload
+
+@dashboard_bp.route("/vehicle/data/batch", methods=["POST"])
+@login_required
+@permission_required("dashboard")
+def vehicle_data_batch():
+    """Ingestion d'un lot de trames horodatées par le véhicule."""
+    return _vehicle_data_batch(fleet.default)
+
+@dashboard_bp.route("/vehicle/<vehicle_id>/data/batch", methods=["POST"])
+@login_required
+@permission_required("dashboard")
+def fleet_vehicle_data_batch(vehicle_id):
+    """Lot de trames d'un véhicule de la flotte (voir ``_vehicle_data_batch``)."""
+    vehicle = fleet.get(vehicle_id)
+    if vehicle is None:
+        return _unknown_vehicle(vehicle_id)
+    return _vehicle_data_batch(vehicle)
+
+def _vehicle_data_batch(vehicle):
+    if request.mimetype == binary_frames.MIMETYPE:
+        return _ingest_binary(vehicle.telemetry)
+    received_at = time.time()
+    resolution = vehicle.telemetry.track.resolution
+    frames, rejected = [], []
+    try:
+        for index, raw in enumerate(_iter_batch_frames()):
+            try:
+                frames.append(clean_frame(raw, default_timestamp=received_at, track_resolution=resolution))
+            except ValueError:
+                rejected.append(index)
+    except ValueError as exc:
+        return jsonify({"status": "error", "message": str(exc)}), 400
+    if not frames:
+        return jsonify({"status": "error", "message": "Aucune trame valide", "rejected": rejected}), 400
+    vehicle.telemetry.publish_batch(frames)
+    return jsonify({"status": "ok", "accepted": len(frames), "rejected": rejected})
+
+@dashboard_bp.route("/vehicle/stream")
+@login_required
+@permission_required("dashboard")
+def vehicle_stream():
+    """Flux SSE de la télémétrie : chaque nouvelle trame est poussée aux abonnés."""
     if session.get("dashboard_mode") == "simu":
-        current_time = time.time()
-        if LATEST_DATA["timestamp"] == 0:
-            LATEST_DATA["timestamp"] = current_time
-        
-        # Simuler la décharge de la batterie
-        time_diff = current_time - LATEST_DATA["timestamp"]
-        if time_diff > 1:  # Mettre à jour toutes les secondes
-            # Simuler la consommation en fonction de la puissance moteur
-            power_factor = LATEST_DATA["motor_power"] / 100  # 100W max
-            battery_drain = 0.1 * power_factor  # 0.1% par seconde à pleine puissance
-            
-            # Mettre à jour les données
-            LATEST_DATA["battery"] = max(0, LATEST_DATA["battery"] - battery_drain)
-            LATEST_DATA["battery_voltage"] = 10 + (LATEST_DATA["battery"] / 100) * 2.6  # 10-12.6V
-            LATEST_DATA["battery_temp"] = 20 + (LATEST_DATA["battery"] / 100) * 10  # 20-30°C
-            
-            # Simuler la puissance moteur et la vitesse
-            if random.random() < 0.3:  # 30% de chance de changement
-                LATEST_DATA["motor_power"] = random.randint(0, 100)
-                LATEST_DATA["motor_speed"] = int(LATEST_DATA["motor_power"] * 10)  # 0-1000 tr/min
-                LATEST_DATA["motor_temp"] = 25 + (LATEST_DATA["motor_power"] / 100) * 20  # 25-45°C
-            
-            # Simuler la consommation d'énergie
-            LATEST_DATA["current"] = LATEST_DATA["motor_power"] / LATEST_DATA["battery_voltage"]
-            LATEST_DATA["energy"] += LATEST_DATA["motor_power"] / 3600  # Wh par seconde
-            
-            # Simuler la télémétrie
-            LATEST_DATA["telemetry"] = random.randint(10, 200)  # 10-200 cm
-            LATEST_DATA["distance"] += LATEST_DATA["motor_speed"] * 0.001  # mètres par seconde
-            
-            LATEST_DATA["timestamp"] = current_time
-    
-    return jsonify(LATEST_DATA)
+        return _simulated_stream(_session_simulator())
+    return _vehicle_stream(fleet.default.telemetry.broadcaster)
+
+@dashboard_bp.route("/vehicle/<vehicle_id>/stream")
+@login_required
+@permission_required("dashboard")
+def fleet_vehicle_stream(vehicle_id):
+    """Flux SSE de la télémétrie d'un véhicule de la flotte."""
+    vehicle = fleet.get(vehicle_id)
+    if vehicle is None:
+        return _unknown_vehicle(vehicle_id)
+    return _vehicle_stream(vehicle.telemetry.broadcaster)
+
+def _vehicle_stream(broadcaster):
+    keepalive = current_app.config.get("TELEMETRY_STREAM_KEEPALIVE", 15)
+    subscription = broadcaster.subscribe()
+
+    def generate():
+        try:
+            while True:
+                message = subscription.get(timeout=keepalive)
+                yield message if message is not None else ": keepalive\n\n"
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    return _event_stream(generate())
+
+def _simulated_stream(simulator):
+    """Flux SSE de la simulation de la session, calculé à cadence fixe sans état partagé."""
+    interval = current_app.config.get("SIMULATOR_STREAM_INTERVAL", 0.5)
+
+    def generate():
+        while True:
+            now = time.time()
+            frame = json.dumps(simulator.frame(now))
+            yield format_sse(frame, event=telemetry.broadcaster.event, event_id=int(now * 1000))
+            time.sleep(interval)
+
+    return _event_stream(generate())
+
+def _event_stream(messages):
+    return current_app.response_class(
+        messages,
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@dashboard_bp.route("/vehicle/track")
+@login_required
+@permission_required("dashboard")
+def vehicle_track():
+    """Points de trajectoire conservés après ``cursor`` (JSON, ou binaire varint)."""
+    return _track_response(fleet.default.telemetry.track)
+
+@dashboard_bp.route("/vehicle/<vehicle_id>/track")
+@login_required
+@permission_required("dashboard")
+def fleet_vehicle_track(vehicle_id):
+    """Trajectoire d'un véhicule de la flotte."""
+    vehicle = fleet.get(vehicle_id)
+    if vehicle is None:
+        return _unknown_vehicle(vehicle_id)
+    return _track_response(vehicle.telemetry.track)
+
+def _track_response(track):
+    cursor = request.args.get("cursor", 0, type=int)
+    points, cursor, reset, tail = track.read(cursor)
+    if _wants_binary():
+        return _binary_response(encode_points(cursor, points, track.resolution, reset=reset, tail=tail))
+    return jsonify({
+        "cursor": cursor,
+        "points": points.tolist(),
+        "reset": reset,
+        "tail": tail.tolist() if tail is not None else None,
+    })
+
+@dashboard_bp.route("/vehicle/alerts")
+@login_required
+@permission_required("dashboard")
+def vehicle_alerts():
+    """Règles d'alerte configurées et alertes actuellement levées."""
+    return _alerts_response(fleet.default.telemetry.alerts)
+
+@dashboard_bp.route("/vehicle/<vehicle_id>/alerts")
+@login_required
+@permission_required("dashboard")
+def fleet_vehicle_alerts(vehicle_id):
+    """Alertes d'un véhicule de la flotte."""
+    vehicle = fleet.get(vehicle_id)
+    if vehicle is None:
+        return _unknown_vehicle(vehicle_id)
+    return _alerts_response(vehicle.telemetry.alerts)
+
+def _alerts_response(alerts):
+    return jsonify({"rules": alerts.rules, "active": alerts.active()})
+
+@dashboard_bp.route("/vehicle/laps")
+@login_required
+@permission_required("dashboard")
+def vehicle_laps():
+    """Course en cours détectée côté serveur : tours, temps et cumuls."""
+    laps.tracker.close_idle(time.time())
+    return jsonify(laps.tracker.status())
+
+@dashboard_bp.route("/vehicle/history")
+@login_required
+@permission_required("dashboard")
+def vehicle_history():
+    """Historique de télémétrie en colonnes (une liste par champ).
+
+    ``max_points`` réduit la réponse (``method`` : ``lttb`` ou ``minmax``) ;
+    ``resolution`` force les échantillons bruts (``raw``) ou une résolution
+    d'agrégats en secondes, choisie sinon selon la fenêtre demandée.
+    """
+    return _vehicle_history(fleet.default, simulated=session.get("dashboard_mode") == "simu")
+
+@dashboard_bp.route("/vehicle/<vehicle_id>/history")
+@login_required
+@permission_required("dashboard")
+def fleet_vehicle_history(vehicle_id):
+    """Historique de télémétrie d'un véhicule de la flotte."""
+    vehicle = fleet.get(vehicle_id)
+    if vehicle is None:
+        return _unknown_vehicle(vehicle_id)
+    return _vehicle_history(vehicle)
+
+def _history_window():
+    """``(resolution, since, limit, max_points)`` de la requête ; lève ``ValueError`` s'ils sont invalides."""
+    resolution = request.args.get("resolution")
+    if resolution and resolution != "raw":
+        try:
+            resolution = int(resolution)
+        except ValueError:
+            resolution = 0
+        if resolution < 1:
+            raise ValueError(f"Résolution invalide : {request.args['resolution']}")
+    since = request.args.get("since", type=float)
+    # float() accepte « inf » et « nan » : refusés avant le calcul des indices d'agrégats
+    if since is not None and not math.isfinite(since):
+        raise ValueError("Paramètre 'since' numérique fini attendu")
+    limit = request.args.get("limit", type=int)
+    max_points = request.args.get("max_points", type=int)
+    if any(value is not None and value < 1 for value in (limit, max_points)):
+        raise ValueError("Paramètres 'limit' et 'max_points' : entiers positifs attendus")
+    return resolution or None, since, limit, max_points
+
+def _vehicle_history(vehicle, simulated=False):
+    fields = request.args.get("fields")
+    fields = [f for f in fields.split(",") if f] if fields else HISTORY_FIELDS
+    method = request.args.get("method", "lttb")
+    if method not in DOWNSAMPLE_METHODS:
+        return jsonify({"status": "error", "message": f"Méthode inconnue : {method}"}), 400
+    try:
+        resolution, since, limit, max_points = _history_window()
+    except ValueError as exc:
+        return jsonify({"status": "error", "message": str(exc)}), 400
+    try:
+        if simulated:
+            # Autant de points au plus que l'historique réel : la taille de la réponse reste bornée
+            points = min(max_points or limit or 120, current_app.config.get("TELEMETRY_HISTORY_SIZE", 36000))
+            history = _session_simulator().history(fields, until=time.time(), since=since, points=points)
+            return jsonify(history)
+        history = vehicle.telemetry.query_history(
+            fields,
+            since=since,
+            limit=limit,
+            max_points=max_points,
+            method=method,
+            by=request.args.get("by"),
+            resolution=resolution,
+        )
+    except KeyError as exc:
+        return jsonify({"status": "error", "message": f"Champ ou résolution inconnu : {exc.args[0]}"}), 400
+    return jsonify(history)
 
 @dashboard_bp.route("/vehicle/control", methods=["POST"])
 @login_required
 @permission_required("dashboard")
 def vehicle_control():
+    """Commande du véhicule par défaut (voir ``_vehicle_control``)."""
+    return _vehicle_control(fleet.default.control)
+
+@dashboard_bp.route("/vehicle/<vehicle_id>/control", methods=["POST"])
+@login_required
+@permission_required("dashboard")
+def fleet_vehicle_control(vehicle_id):
+    """Commande d'un véhicule de la flotte."""
+    vehicle = fleet.get(vehicle_id)
+    if vehicle is None:
+        return _unknown_vehicle(vehicle_id)
+    return _vehicle_control(vehicle.control)
+
+def _vehicle_control(channel):
     data = request.get_json() or {}
+    if any(key in data for key in CONTROL_FIELDS):
+        try:
+            command = clean_command(data)
+        except ValueError as exc:
+            channel.reject()
+            return jsonify({"status": "error", "message": str(exc)}), 400
+        return jsonify({"status": "success", "version": channel.submit(command)})
     commande = "démarrer" if data.get("start") else "arrêter"
     return jsonify({"status": "success", "commande": commande})
 
+@dashboard_bp.route("/vehicle/control/latest")
+@login_required
+@permission_required("dashboard")
+def vehicle_control_latest():
+    """Dernière commande à appliquer, lue par le consommateur côté véhicule."""
+    return jsonify(fleet.default.control.latest())
+
+@dashboard_bp.route("/vehicle/<vehicle_id>/control/latest")
+@login_required
+@permission_required("dashboard")
+def fleet_vehicle_control_latest(vehicle_id):
+    """Dernière commande d'un véhicule de la flotte."""
+    vehicle = fleet.get(vehicle_id)
+    if vehicle is None:
+        return _unknown_vehicle(vehicle_id)
+    return jsonify(vehicle.control.latest())
+
+@dashboard_bp.route("/vehicle/control/stats")
+@login_required
+@permission_required("dashboard")
+def vehicle_control_stats():
+    """Compteurs du canal de commande (reçues, fusionnées, ignorées, arrêts sûrs)."""
+    return jsonify(fleet.default.control.stats())
+
+@dashboard_bp.route("/vehicle/<vehicle_id>/control/stats")
+@login_required
+@permission_required("dashboard")
+def fleet_vehicle_control_stats(vehicle_id):
+    """Compteurs du canal de commande d'un véhicule de la flotte."""
+    vehicle = fleet.get(vehicle_id)
+    if vehicle is None:
+        return _unknown_vehicle(vehicle_id)
+    return jsonify(vehicle.control.stats())
+
+@dashboard_bp.route("/vehicle/telemetry/stats")
+@login_required
+@permission_required("dashboard")
+def vehicle_telemetry_stats():
+    """Métriques de l'écriture différée (lignes écrites, perdues, durée des vidages)."""
+    return jsonify(telemetry_writer.metrics())
+
+def _websocket_allowed(permission):
+    """Vérifie session, permission et origine avant d'accepter des messages WebSocket."""
+    origin = request.headers.get("Origin")
+    if origin and urlparse(origin).netloc != request.host:
+        return False
+    return current_user.is_authenticated and current_user.has_permission(permission)
+
+@sock.route("/vehicle/control/ws", bp=dashboard_bp)
+def vehicle_control_ws(ws):
+    """Canal persistant des commandes de pilotage.
+
+    Chaque message ``{"seq", "throttle", "brake", "steering"}`` est acquitté
+    par ``{"type": "ack", "seq"}``. Une commande dont ``seq`` n'est pas
+    strictement croissant est arrivée en retard : elle est ignorée. Une
+    commande sans ``seq`` est appliquée sans contrôle d'ordre.
+    """
+    if not _websocket_allowed("dashboard"):
+        ws.close(reason=1008, message="Accès refusé")
+        return
+    _control_ws(ws, fleet.default.control)
+
+@sock.route("/vehicle/<vehicle_id>/control/ws", bp=dashboard_bp)
+def fleet_vehicle_control_ws(ws, vehicle_id):
+    """Canal persistant des commandes de pilotage du véhicule ``vehicle_id``."""
+    if not _websocket_allowed("dashboard"):
+        ws.close(reason=1008, message="Accès refusé")
+        return
+    vehicle = fleet.get(vehicle_id)
+    if vehicle is None:
+        ws.close(reason=1008, message=f"Véhicule inconnu : {vehicle_id}")
+        return
+    _control_ws(ws, vehicle.control)
+
+def _control_ws(ws, channel):
+    last_seq = -1
+    while True:
+        message = ws.receive()
+        try:
+            command = clean_command(json.loads(message))
+        except (TypeError, ValueError) as exc:
+            channel.reject()
+            ws.send(json.dumps({"type": "error", "message": str(exc)}))
+            continue
+        ack = {"type": "ack", "seq": command.get("seq")}
+        if "seq" in command and command["seq"] <= last_seq:
+            channel.reject()
+            ack["dropped"] = True
+        else:
+            last_seq = command.get("seq", last_seq)
+            ack["version"] = channel.submit(command)
+        ws.send(json.dumps(ack))
+
 @dashboard_bp.route("/vehicle/ping")
 @login_required
 @permission_required("dashboard")
 def vehicle_ping():
-    ip = connection_info["ip"]
-    try:
-        result = ping(ip, timeout=1)
-        latency_ms = round(result * 1000, 2) if result is not None else None
-        return jsonify({"connected": latency_ms is not None, "ping": latency_ms, "ip": ip})
-    except Exception as exc:
-        return jsonify({"connected": False, "ping": None, "ip": ip, "error": str(exc)})
+    """Joignabilité du véhicule par défaut."""
+    return _ping_response(fleet.default.ip)
+
+@dashboard_bp.route("/vehicle/<vehicle_id>/ping")
+@login_required
+@permission_required("dashboard")
+def fleet_vehicle_ping(vehicle_id):
+    """Joignabilité d'un véhicule de la flotte."""
+    vehicle = fleet.get(vehicle_id)
+    if vehicle is None:
+        return _unknown_vehicle(vehicle_id)
+    return _ping_response(vehicle.ip)
+
+@dashboard_bp.route("/vehicle/link")
+@login_required
+@permission_required("dashboard")
+def vehicle_link():
+    """Qualité du lien avec le véhicule : percentiles de latence, gigue et pertes par fenêtre."""
+    return jsonify(probes.get(fleet.default.ip).link_stats())
+
+@dashboard_bp.route("/vehicle/<vehicle_id>/link")
+@login_required
+@permission_required("dashboard")
+def fleet_vehicle_link(vehicle_id):
+    """État de la liaison avec un véhicule de la flotte."""
+    vehicle = fleet.get(vehicle_id)
+    if vehicle is None:
+        return _unknown_vehicle(vehicle_id)
+    return jsonify(probes.get(vehicle.ip).link_stats())
+
+def _ping_response(ip):
+    """Dernier sondage publié par le sondeur de fond de l'hôte (aucun ping pendant la requête)."""
+    return jsonify(probes.get(ip).status())
+
+@dashboard_bp.route("/fleet")
+@login_required
+@permission_required("dashboard")
+def fleet_overview():
+    """Dernière trame de chaque véhicule de la flotte, en une seule réponse."""
+    return jsonify({"vehicles": fleet.overview()})
 
 @dashboard_bp.route("/log-disconnect", methods=["POST"])
 @login_required
 @permission_required("dashboard")
 def log_disconnect():
+    """Journalise la déconnexion du dashboard."""
     current_user.log_connection("dashboard", "déconnexion")
     return jsonify({"status": "logged"})
 
@@ -178,17 +594,57 @@ def log_disconnect():
 @login_required
 @permission_required("dashboard")
 def mode():
+    """Change le mode du dashboard (``simu``, ``real`` ou ``replay``)."""
     data = request.get_json(silent=True) or {}
     mode = data.get("mode")
-    if mode in ["simu", "real"]:
+    if mode in ["simu", "real", "replay"]:
         session["dashboard_mode"] = mode
         return jsonify({"status": "ok", "mode": mode})
     return jsonify({"status": "error", "message": "Mode invalide"}), 400
 
+def _recordings_dir():
+    return current_app.config.get("TELEMETRY_RECORDINGS_DIR")
+
+@dashboard_bp.route("/replay")
+@login_required
+@permission_required("dashboard")
+def replay_status():
+    """Enregistrements disponibles et état du rejeu en cours."""
+    return jsonify({"recordings": list_recordings(_recordings_dir()), "replay": replay_engine.status()})
+
+@dashboard_bp.route("/replay", methods=["POST"])
+@login_required
+@permission_required("dashboard")
+def replay_start():
+    """Rejoue un enregistrement dans la télémétrie (``speed`` : facteur, 0 = au plus vite)."""
+    data = request.get_json(silent=True) or {}
+    name = data.get("file") or ""
+    if not name.endswith(RECORDING_EXTENSION) or name not in list_recordings(_recordings_dir()):
+        return jsonify({"status": "error", "message": "Enregistrement introuvable"}), 400
+    speed = data.get("speed", 1)
+    if isinstance(speed, bool) or not isinstance(speed, (int, float)) or speed < 0:
+        return jsonify({"status": "error", "message": "Vitesse invalide"}), 400
+    publish = functools.partial(fleet.default.telemetry.publish_columns, replayed=True)
+    try:
+        replay_engine.start(os.path.join(_recordings_dir(), name), publish, speed=speed or None)
+    except RuntimeError as exc:
+        return jsonify({"status": "error", "message": str(exc)}), 409
+    session["dashboard_mode"] = "replay"
+    return jsonify({"status": "ok", "replay": replay_engine.status()})
+
+@dashboard_bp.route("/replay/stop", methods=["POST"])
+@login_required
+@permission_required("dashboard")
+def replay_stop():
+    """Arrête le rejeu en cours."""
+    replay_engine.stop()
+    return jsonify({"status": "ok", "replay": replay_engine.status()})
+
 @dashboard_bp.route("/disconnect", methods=["POST"])
 @login_required
 @permission_required("dashboard")
 def disconnect():
+    """Déconnecte le véhicule et journalise la déconnexion."""
     session.pop("dashboard_connected", None)
     session.pop("dashboard_mode", None)
     current_user.log_connection("dashboard", "déconnexion")
@@ -198,16 +654,33 @@ def disconnect():
 @login_required
 @permission_required("pilotage")
 def camera_stream():
-    """Endpoint pour le flux vidéo de la caméra"""
-    try:
-        # TODO: Implémenter la connexion à la caméra réelle
-        # Pour l'instant, on renvoie une image statique
-        return send_file(
-            "static/build/camera-placeholder.jpg",
-            mimetype="image/jpeg"
-        )
-    except Exception as e:
-        return jsonify({
-            "status": "error",
-            "message": f"Erreur de connexion à la caméra: {str(e)}"
-        }), 500 
\ No newline at end of file
+    """Flux MJPEG de la caméra par défaut."""
+    return _camera_stream(cameras.default)
+
+@dashboard_bp.route("/vehicle/camera/<name>/stream")
+@login_required
+@permission_required("pilotage")
+def named_camera_stream(name):
+    """Flux MJPEG d'une caméra nommée."""
+    camera = cameras.get(name)
+    if camera is None:
+        return jsonify({"status": "error", "message": f"Caméra inconnue : {name}"}), 404
+    return _camera_stream(camera)
+
+def _camera_stream(camera):
+    """Réponse ``multipart/x-mixed-replace`` : chaque nouvelle image remplace la précédente.
+
+    ``tier`` choisit le niveau de qualité (``auto`` par défaut : selon le
+    débit mesuré), ``fps`` la cadence maximale envoyée.
+    """
+    tier = request.args.get("tier", AUTO_TIER)
+    if tier != AUTO_TIER and tier not in camera.tier_names:
+        return jsonify({"status": "error", "message": f"Niveau inconnu : {tier}"}), 400
+    max_fps = request.args.get("fps", type=float)
+    if max_fps is not None and max_fps <= 0:
+        return jsonify({"status": "error", "message": "Paramètre 'fps' positif attendu"}), 400
+    return current_app.response_class(
+        camera.viewer(tier, max_fps),
+        mimetype=MJPEG_MIMETYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,9 +1,31 @@
 # -*- coding: utf-8 -*-
 """Historique views."""
+import base64
+import hashlib
+import json
+
+from flask import Response, stream_with_context
+from sqlalchemy import and_, func, or_
+
 from app.common.views import *
+
 # Import des modèles spécifiques
+from app.dashboard.history import (
+    EXPORT_FORMATS,
+    connexion_row,
+    connexions_query,
+    course_row,
+    courses_query,
+    export,
+    generation,
+)
 from app.dashboard.models import ConnectionLog, RaceLog
-import pytz
+from app.extensions import cache
+
+COUNT_MODES = ('exact', 'capped', 'none')
+# Paramètres sans effet sur le nombre de lignes, et filtres insensibles à la casse
+PAGING_ARGS = ('page', 'per_page', 'after', 'count')
+SEARCH_ARGS = ('q', 'type_course')
 
 historique_bp = Blueprint("historique", __name__, url_prefix="/dashboard/historique")
 
@@ -14,145 +36,144 @@ def home():
     """Page principale de l'historique des courses."""
     return render_template("dashboard/historique.html")
 
+def _encode_cursor(date, row_id):
+    """Curseur opaque désignant la dernière ligne d'une page (date de tri, id)."""
+    return base64.urlsafe_b64encode(f"{date.isoformat()}|{row_id}".encode()).decode()
+
+def _decode_cursor(cursor):
+    """``(date, id)`` d'un curseur ; lève ``ValueError`` s'il est invalide."""
+    try:
+        date, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(date), int(row_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as exc:
+        raise ValueError("Curseur invalide") from exc
+
+def _count_key(model):
+    """Clé de cache du nombre de lignes pour les filtres de la requête.
+
+    Les filtres sont normalisés (vides ignorés, recherche en minuscules) et la
+    clé inclut le plus grand id de la table et sa génération : toute
+    insertion, modification ou suppression, depuis n'importe quel worker,
+    change la clé.
+    """
+    filters = sorted(
+        (name, value.strip().lower() if name in SEARCH_ARGS else value.strip())
+        for name, value in request.args.items()
+        if name not in PAGING_ARGS and value.strip()
+    )
+    last_id = db.session.query(func.max(model.id)).scalar() or 0
+    digest = hashlib.sha1(json.dumps(filters).encode()).hexdigest()
+    return f"history-count:{model.__tablename__}:{last_id}:{generation(model.__tablename__)}:{digest}"
+
+def _count(query, model):
+    """``(total, mode)`` selon ``count=exact|capped|none``.
+
+    ``capped`` compte au plus ``HISTORY_COUNT_CAP`` lignes : au-delà, le total
+    renvoyé est le plafond lui-même, une borne inférieure et non une
+    estimation (mode ``capped``). Les totaux exacts sont mis en cache. Lève
+    ``ValueError`` pour un mode inconnu.
+    """
+    mode = request.args.get('count', 'exact')
+    if mode not in COUNT_MODES:
+        raise ValueError(f"count doit valoir {', '.join(COUNT_MODES)}")
+    if mode == 'none':
+        return None, 'none'
+    key = _count_key(model)
+    total = cache.get(key)
+    if total is not None:
+        return total, 'exact'
+    query = query.order_by(None)
+    if mode == 'capped':
+        cap = current_app.config.get('HISTORY_COUNT_CAP', 10000)
+        total = db.session.query(func.count()).select_from(query.limit(cap + 1).subquery()).scalar()
+        if total > cap:
+            return cap, 'capped'
+    else:
+        total = query.count()
+    cache.set(key, total, timeout=current_app.config.get('HISTORY_COUNT_CACHE_TIMEOUT', 300))
+    return total, 'exact'
+
+def _paginate(query, date_column, id_column):
+    """Page de ``query`` triée par date puis id décroissants.
+
+    Avec ``after=<curseur>``, la page commence juste après la ligne du curseur
+    (pagination par clé : un parcours de l'index, quelle que soit la
+    profondeur) ; sinon ``page`` donne un décalage classique. Retourne
+    ``(lignes, (total, mode de comptage), curseur suivant ou None)``.
+    """
+    page = request.args.get('page', 1, type=int)
+    per_page = max(request.args.get('per_page', 10, type=int), 1)
+    after = request.args.get('after')
+
+    count = _count(query, date_column.class_)
+    ordered = query.order_by(date_column.desc(), id_column.desc())
+    if after:
+        date, row_id = _decode_cursor(after)
+        ordered = ordered.filter(or_(date_column < date, and_(date_column == date, id_column < row_id)))
+    else:
+        ordered = ordered.offset(max(page - 1, 0) * per_page)
+    # Une ligne de plus pour savoir s'il existe une page suivante
+    rows = ordered.limit(per_page + 1).all()
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = _encode_cursor(getattr(rows[-1], date_column.key), getattr(rows[-1], id_column.key))
+    return rows, count, next_cursor
+
+def _page_response(key, items, count, next_cursor):
+    per_page = max(request.args.get('per_page', 10, type=int), 1)
+    total, mode = count
+    return jsonify({
+        key: items,
+        'total': total,
+        'pages': -(-total // per_page) if total is not None else None,
+        'count': mode,
+        'current_page': request.args.get('page', 1, type=int),
+        'next_cursor': next_cursor,
+    })
+
 @historique_bp.route("/api/courses")
 @login_required
 @permission_required("dashboard")
 def api_courses():
     """API pour récupérer l'historique des courses avec pagination et filtres."""
-    # Récupération des paramètres de pagination
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-    
-    # Récupération des filtres
-    q = request.args.get('q', '')
-    date_debut = request.args.get('date_debut')
-    date_fin = request.args.get('date_fin')
-    type_course = request.args.get('type_course')
-    statut = request.args.get('statut')
-    role_utilisateur = request.args.get('role_utilisateur')
-    
-    # Construction de la requête de base
-    query = RaceLog.query
-    
-    # Application des filtres
-    if q:
-        query = query.filter(
-            or_(
-                RaceLog.race_name.ilike(f'%{q}%'),
-                RaceLog.user_name.ilike(f'%{q}%')
-            )
-        )
-    
-    if date_debut:
-        try:
-            date_debut = datetime.strptime(date_debut, '%Y-%m-%d')
-            query = query.filter(RaceLog.start_time >= date_debut)
-        except ValueError:
-            pass
-    
-    if date_fin:
-        try:
-            date_fin = datetime.strptime(date_fin, '%Y-%m-%d')
-            query = query.filter(RaceLog.start_time <= date_fin)
-        except ValueError:
-            pass
-    
-    if type_course:
-        query = query.filter(RaceLog.race_name.ilike(f'%{type_course}%'))
-    
-    if statut:
-        if statut == 'termine':
-            query = query.filter(RaceLog.end_time.isnot(None))
-        elif statut == 'en_cours':
-            query = query.filter(RaceLog.end_time.is_(None))
-    
+    query = courses_query(request.args)
+
     # Pagination
-    pagination = query.order_by(RaceLog.start_time.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
-    )
-    
-    # Formatage des résultats
-    courses = []
-    for course in pagination.items:
-        courses.append({
-            'id': course.id,
-            'race_name': course.race_name,
-            'start_time': course.start_time.isoformat(),
-            'end_time': course.end_time.isoformat() if course.end_time else None,
-            'duration': str(course.duration) if course.duration else None,
-            'user_name': course.user_name,
-            'average_speed': course.average_speed,
-            'max_speed': course.max_speed,
-            'distance': course.distance,
-            'weather_conditions': course.weather_conditions,
-            'track_conditions': course.track_conditions
-        })
-    
-    return jsonify({
-        'courses': courses,
-        'total': pagination.total,
-        'pages': pagination.pages,
-        'current_page': page
-    })
+    try:
+        items, count, next_cursor = _paginate(query, RaceLog.start_time, RaceLog.id)
+    except ValueError as exc:
+        return jsonify({"status": "error", "message": str(exc)}), 400
+
+    return _page_response('courses', [course_row(course) for course in items], count, next_cursor)
 
 @historique_bp.route("/api/connexions")
 @login_required
 @permission_required("dashboard")
 def api_connexions():
     """API pour récupérer l'historique des connexions avec pagination et filtres."""
-    # Récupération des paramètres de pagination
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-    
-    # Récupération des filtres
-    q = request.args.get('q', '')
-    date_debut = request.args.get('date_debut')
-    date_fin = request.args.get('date_fin')
-    type_connexion = request.args.get('type_connexion')
-    
-    # Construction de la requête de base
-    query = ConnectionLog.query.filter(ConnectionLog.fonction == "site")
-    
-    # Application des filtres
-    if q:
-        query = query.filter(ConnectionLog.user_name.ilike(f'%{q}%'))
-    
-    if date_debut:
-        try:
-            date_debut = datetime.strptime(date_debut, '%Y-%m-%d')
-            query = query.filter(ConnectionLog.connection_date >= date_debut)
-        except ValueError:
-            pass
-    
-    if date_fin:
-        try:
-            date_fin = datetime.strptime(date_fin, '%Y-%m-%d')
-            query = query.filter(ConnectionLog.connection_date <= date_fin)
-        except ValueError:
-            pass
-    
-    if type_connexion:
-        query = query.filter(ConnectionLog.type == type_connexion)
-    
+    query = connexions_query(request.args)
+
     # Pagination
-    pagination = query.order_by(ConnectionLog.connection_date.desc()).paginate(
-        page=page, per_page=per_page, error_out=False
+    try:
+        items, count, next_cursor = _paginate(query, ConnectionLog.connection_date, ConnectionLog.id)
+    except ValueError as exc:
+        return jsonify({"status": "error", "message": str(exc)}), 400
+
+    return _page_response('connexions', [connexion_row(connexion) for connexion in items], count, next_cursor)
+
+@historique_bp.route("/api/<kind>/export")
+@login_required
+@permission_required("dashboard")
+def api_export(kind):
+    """Export complet (mêmes filtres que l'API paginée) en CSV ou NDJSON, envoyé au fil de la lecture."""
+    fmt = request.args.get('format', 'csv')
+    try:
+        chunks = export(kind, request.args, fmt)
+    except ValueError as exc:
+        return jsonify({"status": "error", "message": str(exc)}), 400
+    return Response(
+        stream_with_context(chunks),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename=historique_{kind}.{fmt}'},
     )
-    
-    # Formatage des résultats
-    connexions = []
-    for connexion in pagination.items:
-        paris = pytz.timezone("Europe/Paris")
-        local_dt = connexion.connection_date.replace(tzinfo=pytz.utc).astimezone(paris)
-        connexions.append({
-            'user_name': connexion.user_name,
-            'type': connexion.type,
-            'connection_date': local_dt.strftime('%Y-%m-%dT%H:%M:%S')
-        })
-    
-    return jsonify({
-        'connexions': connexions,
-        'total': pagination.total,
-        'pages': pagination.pages,
-        'current_page': page
-    }) 
\ No newline at end of file
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Sérialisation JSON des réponses avec orjson (optionnel).
+
+Mêmes sorties que le fournisseur par défaut de Flask pour les types qu'il
+gère (dates au format HTTP, ``Decimal`` en texte) ; orjson encode directement
+en octets, sans passer par une chaîne intermédiaire. Sans orjson, Flask garde
+son fournisseur par défaut.
+"""
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # dépendance optionnelle
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Fournisseur JSON Flask basé sur orjson."""
+
+    sort_keys = False  # ordre d'insertion : pas de tri à chaque réponse
+    # Dates et dataclasses confiées à ``default`` : même rendu que Flask ;
+    # scalaires NumPy (``float64`` hérite de ``float`` pour le module json)
+    options = 0
+    if orjson:
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        options |= orjson.OPT_SERIALIZE_NUMPY
+
+    def _encode(self, obj, indent=False):
+        option = self.options
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def dumps(self, obj, **kwargs):
+        """Sérialise ``obj`` en chaîne JSON."""
+        if kwargs:  # options propres au module json (indent, separators…)
+            return super().dumps(obj, **kwargs)
+        return self._encode(obj).decode()
+
+    def loads(self, s, **kwargs):
+        """Désérialise une chaîne ou des octets JSON."""
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            # NaN, Infinity… acceptés par le module json mais pas par orjson
+            return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        """Réponse JSON encodée directement en octets."""
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(self._encode(obj, indent) + b"\n", mimetype=self.mimetype)
+
+
+def init_app(app):
+    """Installe ``OrjsonProvider`` si orjson est disponible."""
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
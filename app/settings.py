@@ -6,6 +6,9 @@ Most configuration is set via environment variables.
 For local development, use a .env file to set
 environment variables.
 """
+import os
+import tempfile
+
 from environs import Env
 
 env = Env()
@@ -23,3 +26,128 @@ CACHE_TYPE = (
     "flask_caching.backends.SimpleCache"  # Can be "MemcachedCache", "RedisCache", etc.
 )
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Flotte : {"id": {"ip": ..., "mac": ...}} ; vide = un seul véhicule (ROBOT_IP / ROBOT_MAC)
+VEHICLES = env.json("VEHICLES", default=None)
+
+# Télémétrie partagée entre les workers gunicorn (fichier mmap)
+TELEMETRY_SHM_PATH = env.str(
+    "TELEMETRY_SHM_PATH",
+    default=os.path.join(tempfile.gettempdir(), "voiture_telemetry.shm"),
+)
+TELEMETRY_SHM_EXTRA_BYTES = env.int("TELEMETRY_SHM_EXTRA_BYTES", default=65536)
+TELEMETRY_HISTORY_PATH = env.str(
+    "TELEMETRY_HISTORY_PATH",
+    default=os.path.join(tempfile.gettempdir(), "voiture_telemetry_history.shm"),
+)
+TELEMETRY_HISTORY_SIZE = env.int("TELEMETRY_HISTORY_SIZE", default=36000)  # 10 min à 60 Hz
+# Agrégats multi-résolution (moyenne/min/max par seau) pour les vues longues
+TELEMETRY_ROLLUP_PATH = env.str(
+    "TELEMETRY_ROLLUP_PATH",
+    default=os.path.join(tempfile.gettempdir(), "voiture_telemetry_rollups.shm"),
+)
+TELEMETRY_ROLLUP_RESOLUTIONS = env.list("TELEMETRY_ROLLUP_RESOLUTIONS", default=[1, 10, 60], subcast=int)  # s
+TELEMETRY_ROLLUP_SIZE = env.int("TELEMETRY_ROLLUP_SIZE", default=4320)  # seaux par résolution
+# Trajectoire simplifiée (unités des coordonnées envoyées par le véhicule)
+TELEMETRY_TRACK_PATH = env.str(
+    "TELEMETRY_TRACK_PATH",
+    default=os.path.join(tempfile.gettempdir(), "voiture_track.shm"),
+)
+TELEMETRY_TRACK_SIZE = env.int("TELEMETRY_TRACK_SIZE", default=20000)  # points conservés
+TELEMETRY_TRACK_RESOLUTION = env.float("TELEMETRY_TRACK_RESOLUTION", default=0.01)  # quantification
+TELEMETRY_TRACK_TOLERANCE = env.float("TELEMETRY_TRACK_TOLERANCE", default=0.05)  # écart max de simplification
+TELEMETRY_RECORDINGS_DIR = env.str("TELEMETRY_RECORDINGS_DIR", default="recordings")  # fichiers .vrec
+# État du rejeu en cours, partagé entre les workers (un seul rejeu à la fois)
+REPLAY_SHM_PATH = env.str(
+    "REPLAY_SHM_PATH",
+    default=os.path.join(tempfile.gettempdir(), "voiture_replay.shm"),
+)
+TELEMETRY_STREAM_INTERVAL = env.float("TELEMETRY_STREAM_INTERVAL", default=0.05)  # secondes
+TELEMETRY_STREAM_KEEPALIVE = env.float("TELEMETRY_STREAM_KEEPALIVE", default=15)
+# Enregistrement différé des échantillons en base
+TELEMETRY_PERSIST_ENABLED = env.bool("TELEMETRY_PERSIST_ENABLED", default=True)
+TELEMETRY_PERSIST_BATCH_SIZE = env.int("TELEMETRY_PERSIST_BATCH_SIZE", default=500)
+TELEMETRY_PERSIST_INTERVAL = env.float("TELEMETRY_PERSIST_INTERVAL", default=0.5)  # secondes
+TELEMETRY_PERSIST_MAX_PENDING = env.int("TELEMETRY_PERSIST_MAX_PENDING", default=50000)
+# Règles d'alerte : seuil (above/below) ou variation par seconde (rate_above/rate_below),
+# retour sous "clear" (hystérésis), maintien "hold" en secondes avant de lever l'alerte
+ALERT_RULES = env.json("ALERT_RULES", default=[
+    {"id": "battery_temp_high", "field": "battery_temp", "above": 55, "clear": 50, "hold": 2,
+     "level": "danger", "message": "Température batterie élevée"},
+    {"id": "motor_temp_high", "field": "motor_temp", "above": 80, "clear": 70, "hold": 2,
+     "level": "warning", "message": "Température moteur élevée"},
+    {"id": "battery_voltage_low", "field": "battery_voltage", "below": 10.5, "clear": 11.0, "hold": 5,
+     "level": "warning", "message": "Tension batterie faible"},
+    {"id": "current_spike", "field": "current", "rate_above": 50, "clear": 10,
+     "level": "warning", "message": "Pic de courant"},
+])
+ALERT_SHM_PATH = env.str(
+    "ALERT_SHM_PATH",
+    default=os.path.join(tempfile.gettempdir(), "voiture_alerts.shm"),
+)
+
+# Historique : cache des totaux par filtres, plafond du comptage borné (count=capped)
+HISTORY_COUNT_CACHE_TIMEOUT = env.int("HISTORY_COUNT_CACHE_TIMEOUT", default=300)  # secondes
+HISTORY_COUNT_CAP = env.int("HISTORY_COUNT_CAP", default=10000)  # lignes
+# Générations des tables de l'historique (invalidation des totaux en cache entre workers)
+HISTORY_GENERATION_PATH = env.str(
+    "HISTORY_GENERATION_PATH",
+    default=os.path.join(tempfile.gettempdir(), "voiture_history_generation.shm"),
+)
+
+# Détection des tours : ligne de départ (x1, y1, x2, y2) dans les coordonnées de la trajectoire
+LAP_SHM_PATH = env.str(
+    "LAP_SHM_PATH",
+    default=os.path.join(tempfile.gettempdir(), "voiture_laps.shm"),
+)
+LAP_START_LINE = env.list("LAP_START_LINE", default=[500.0, 0.0, 500.0, 1000.0], subcast=float)
+LAP_MIN_DURATION = env.float("LAP_MIN_DURATION", default=5)  # secondes, anti-rebond
+LAP_RACE_TIMEOUT = env.float("LAP_RACE_TIMEOUT", default=30)  # secondes sans position : fin de course
+LAP_METERS_PER_UNIT = env.float("LAP_METERS_PER_UNIT", default=1.0)
+# Index spatial des tours (segment le plus proche, survol de la carte)
+LAP_INDEX_PATH = env.str(
+    "LAP_INDEX_PATH",
+    default=os.path.join(tempfile.gettempdir(), "voiture_lap_index.shm"),
+)
+LAP_INDEX_SIZE = env.int("LAP_INDEX_SIZE", default=65536)  # segments conservés
+LAP_INDEX_CELL = env.float("LAP_INDEX_CELL", default=10.0)  # côté d'une cellule de la grille
+
+# Simulation : un véhicule simulé par session, calculé à la demande
+SIMULATOR_POOL_SIZE = env.int("SIMULATOR_POOL_SIZE", default=256)
+SIMULATOR_IDLE_TIMEOUT = env.float("SIMULATOR_IDLE_TIMEOUT", default=600)  # secondes
+SIMULATOR_STREAM_INTERVAL = env.float("SIMULATOR_STREAM_INTERVAL", default=0.5)  # secondes
+
+# Caméras : nom → source (URL MJPEG du véhicule, dossier d'images ou fichier, relatif à app/)
+CAMERA_SOURCES = env.json("CAMERA_SOURCES", default=None)
+CAMERA_SHM_PATH = env.str(
+    "CAMERA_SHM_PATH",
+    default=os.path.join(tempfile.gettempdir(), "voiture_camera.shm"),
+)
+CAMERA_FPS = env.float("CAMERA_FPS", default=15)  # sources dossier et fichier
+CAMERA_MAX_FRAME_BYTES = env.int("CAMERA_MAX_FRAME_BYTES", default=1_000_000)
+CAMERA_IDLE_TIMEOUT = env.float("CAMERA_IDLE_TIMEOUT", default=30)  # secondes sans spectateur : arrêt de la capture
+# Niveaux réencodés (nécessitent Pillow) : nom → [largeur max, qualité JPEG], du meilleur au plus léger
+CAMERA_TIERS = env.json("CAMERA_TIERS", default={"medium": [640, 70], "low": [320, 50]})
+
+# Commandes de pilotage (case partagée entre les workers)
+CONTROL_SHM_PATH = env.str(
+    "CONTROL_SHM_PATH",
+    default=os.path.join(tempfile.gettempdir(), "voiture_control.shm"),
+)
+CONTROL_COMMAND_MAX_AGE = env.float("CONTROL_COMMAND_MAX_AGE", default=0.5)  # secondes
+CONTROL_SCHEDULER_ENABLED = env.bool("CONTROL_SCHEDULER_ENABLED", default=True)
+CONTROL_TICK_RATE = env.float("CONTROL_TICK_RATE", default=50)  # Hz
+CONTROL_LINK_HOST = env.str("CONTROL_LINK_HOST", default=None)  # ROBOT_IP par défaut
+CONTROL_LINK_PORT = env.int("CONTROL_LINK_PORT", default=0)  # 0 : pas d'envoi UDP
+
+# Joignabilité : un sondeur ICMP de fond par hôte, résultat partagé entre workers
+PING_SHM_PATH = env.str(
+    "PING_SHM_PATH",
+    default=os.path.join(tempfile.gettempdir(), "voiture_ping.shm"),
+)
+PING_PROBER_ENABLED = env.bool("PING_PROBER_ENABLED", default=True)
+PING_INTERVAL = env.float("PING_INTERVAL", default=1.0)  # secondes entre deux sondages
+PING_TIMEOUT = env.float("PING_TIMEOUT", default=1.0)
+PING_MAX_INTERVAL = env.float("PING_MAX_INTERVAL", default=30.0)  # intervalle max quand l'hôte ne répond pas
+PING_IDLE_TIMEOUT = env.float("PING_IDLE_TIMEOUT", default=60.0)  # secondes sans requête : arrêt du sondeur
+PING_STATS_WINDOWS = env.list("PING_STATS_WINDOWS", default=[60, 300, 3600], subcast=int)  # secondes
@@ -50,6 +50,44 @@ export function checkConnection() {
     .catch(err => console.error("Erreur de ping :", err));
 }
 
+/**
+ * Abonnement aux trames de télémétrie : flux SSE poussé par le serveur,
+ * ou polling de /dashboard/vehicle/data si EventSource n'est pas disponible.
+ * Retourne une fonction de désabonnement.
+ */
+export function subscribeTelemetry(onFrame, pollMs = 1000) {
+  if (window.EventSource) {
+    const source = new EventSource("/dashboard/vehicle/stream");
+    source.addEventListener("telemetry", e => onFrame(JSON.parse(e.data)));
+    return () => source.close();
+  }
+  const poll = () => fetch("/dashboard/vehicle/data")
+    .then(r => r.json())
+    .then(onFrame)
+    .catch(console.error);
+  poll();
+  const timer = setInterval(poll, pollMs);
+  return () => clearInterval(timer);
+}
+
+/**
+ * Alertes actives de la trame (règles serveur et alertes du véhicule),
+ * affichées dans #vehicle-alerts. Une alerte reste affichée tant qu'elle est
+ * active : le serveur gère maintien et hystérésis.
+ */
+export function renderAlerts(alerts, containerId = "vehicle-alerts") {
+  const container = document.getElementById(containerId);
+  if (!container) return;
+  container.replaceChildren(...(alerts || []).map(alert => {
+    const item = document.createElement("div");
+    const level = typeof alert === "object" ? alert.level || "warning" : "warning";
+    item.className = `alert alert-${level} py-1 px-2 mb-1 shadow-sm`;
+    item.textContent = typeof alert === "object" ? alert.message || alert.id : String(alert);
+    if (alert && alert.value != null) item.title = `${alert.field} : ${alert.value}`;
+    return item;
+  }));
+}
+
 export function startPingLoop() {
   checkConnection();
   return setInterval(checkConnection, 3000);
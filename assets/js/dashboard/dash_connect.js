@@ -1,11 +1,41 @@
 // dash_connect.js
 import { startPingLoop, checkConnection } from "./dash_common";
 
+const LINK_POLL_MS = 5000;
+
+function formatWindow(seconds) {
+  return seconds >= 3600 ? `${seconds / 3600} h` : seconds >= 60 ? `${seconds / 60} min` : `${seconds} s`;
+}
+
+function loadLinkQuality() {
+  const rows = document.getElementById("link-quality-rows");
+  if (!rows) return;
+  fetch("/dashboard/vehicle/link")
+    .then(r => r.json())
+    .then(({ windows }) => {
+      rows.innerHTML = "";
+      Object.entries(windows).forEach(([seconds, w]) => {
+        const tr = document.createElement("tr");
+        const loss = w.loss != null ? `${(w.loss * 100).toFixed(1)} %` : "--";
+        [formatWindow(Number(seconds)), w.p50, w.p95, w.p99, w.jitter, loss].forEach(value => {
+          const td = document.createElement("td");
+          td.textContent = value ?? "--";
+          tr.appendChild(td);
+        });
+        rows.appendChild(tr);
+      });
+    })
+    .catch(err => console.error("Erreur qualité du lien :", err));
+}
+
 document.addEventListener("DOMContentLoaded", () => {
   // 1️⃣ Mise à jour immédiate
   checkConnection();
   // 2️⃣ Boucle ping
   startPingLoop();
+  // 3️⃣ Qualité du lien (percentiles, gigue, pertes)
+  loadLinkQuality();
+  setInterval(loadLinkQuality, LINK_POLL_MS);
 
   // Redirections
   document.getElementById("connect-btn")?.addEventListener("click", () => window.location.href = "/dashboard/graphs");
@@ -3,6 +3,8 @@ document.addEventListener('DOMContentLoaded', function() {
     let currentPage = 1;
     const perPage = 10;
     let filters = {};
+    // Curseur de début de chaque page déjà atteinte (pagination par clé)
+    let cursors = {};
 
     // Fonction pour charger les données
     function loadData() {
@@ -13,12 +15,15 @@ document.addEventListener('DOMContentLoaded', function() {
         const params = new URLSearchParams({
             page: currentPage,
             per_page: perPage,
+            count: 'capped',
             ...filters
         });
+        if (cursors[currentPage]) params.set('after', cursors[currentPage]);
 
         fetch(`${url}?${params}`)
             .then(response => response.json())
             .then(data => {
+                if (data.next_cursor) cursors[currentPage + 1] = data.next_cursor;
                 updateTable(data);
                 updatePagination(data);
             });
@@ -65,7 +70,9 @@ document.addEventListener('DOMContentLoaded', function() {
         const pagination = document.getElementById(`${currentTab}Pagination`);
         pagination.innerHTML = '';
 
-        const totalPages = data.pages;
+        // Avec un total plafonné (count=capped), les pages suivantes restent accessibles par le curseur
+        const hasNext = data.next_cursor != null;
+        const totalPages = Math.max(data.pages || 0, data.current_page + (hasNext ? 1 : 0));
         let pageCourante = data.current_page;
 
         // Bouton précédent
@@ -90,7 +97,7 @@ document.addEventListener('DOMContentLoaded', function() {
 
         // Bouton suivant
         const nextLi = document.createElement('li');
-        nextLi.className = `page-item ${pageCourante === totalPages ? 'disabled' : ''}`;
+        nextLi.className = `page-item ${hasNext ? '' : 'disabled'}`;
         nextLi.innerHTML = `
             <a class="page-link" href="#" data-page="${pageCourante + 1}">
                 Suivant <i class="bi bi-chevron-right"></i>
@@ -116,6 +123,7 @@ document.addEventListener('DOMContentLoaded', function() {
         tab.addEventListener('shown.bs.tab', (e) => {
             currentTab = e.target.id.split('-')[0];
             currentPage = 1;
+            cursors = {};
             // Affiche le bon formulaire de filtres
             document.getElementById('filtersFormCourses').style.display = (currentTab === 'courses') ? '' : 'none';
             document.getElementById('filtersFormConnexions').style.display = (currentTab === 'connexions') ? '' : 'none';
@@ -136,10 +144,16 @@ document.addEventListener('DOMContentLoaded', function() {
             if (value) filters[key] = value;
         });
         currentPage = 1;
+        cursors = {};
         loadData();
         bootstrap.Modal.getInstance(document.getElementById('filtersModal')).hide();
     });
 
+    // Export CSV de l'onglet courant avec les filtres appliqués
+    document.getElementById('exportHistory').addEventListener('click', (e) => {
+        e.currentTarget.href = `/dashboard/historique/api/${currentTab}/export?${new URLSearchParams({ format: 'csv', ...filters })}`;
+    });
+
     // Chargement initial
     loadData();
 }); 
\ No newline at end of file
@@ -1,5 +1,6 @@
 // assets/js/dashboard/dash_maps.js
-import { setText } from "./dash_common.js";
+import { renderAlerts, setText, subscribeTelemetry } from "./dash_common.js";
+import { SegmentGrid } from "./spatial_grid.js";
 
 // ─── CONST ────────────────────────────────────────────────────────────────────
 const MAX_TAIL_POINTS   = 500;
@@ -13,6 +14,10 @@ const NUM_LAPS          = 5;
 const OUTLINE_STEPS     = 300;
 const CTRL_POINT_COUNT  = 8;
 const CTRL_JITTER       = 20;
+const TRACK_POLL_MS     = 500;
+const MAX_TRACK_POINTS  = 20000;
+const GRID_CELL         = 10;
+const NEAREST_POLL_MS   = 100;
 
 // ─── ÉTAT GLOBAL ──────────────────────────────────────────────────────────────
 let trackData      = [];
@@ -38,6 +43,9 @@ let speedFactor    = 0;
 let boundingBoxAll = { minX: WORLD_MAX, maxX: 0, minY: WORLD_MAX, maxY: 0 };
 // Tableau des temps de tours
 let lapTimes       = [];
+// Index spatial des tours terminés (survol)
+const lapGrid      = new SegmentGrid(GRID_CELL);
+let lastNearestTs  = 0;
 
 // ─── UTILITAIRES ──────────────────────────────────────────────────────────────
 function formatTime(ms) {
@@ -91,7 +99,42 @@ document.addEventListener("DOMContentLoaded", () => {
   window.isRunning = false;
   speedFactor = 0;
 
+  const replayControls = document.getElementById("replay-controls");
+  const replayFile     = document.getElementById("replay-file");
+  const replaySpeed    = document.getElementById("replay-speed");
+
+  // Rejeu : liste des enregistrements disponibles côté serveur
+  function loadRecordings() {
+    return fetch("/dashboard/replay")
+      .then(r => r.json())
+      .then(({ recordings, replay }) => {
+        replayFile.innerHTML = "";
+        recordings.forEach(name => replayFile.add(new Option(name, name)));
+        window.isRunning = replay.running;
+        updateStartBtn();
+      })
+      .catch(console.error);
+  }
+
+  function toggleReplay() {
+    const url = window.isRunning ? "/dashboard/replay/stop" : "/dashboard/replay";
+    const body = { file: replayFile.value, speed: Number(replaySpeed.value) };
+    fetch(url, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify(body)
+    })
+      .then(r => r.json())
+      .then(data => {
+        if (data.status !== "ok") throw new Error(data.message);
+        window.isRunning = data.replay.running;
+        updateStartBtn();
+      })
+      .catch(console.error);
+  }
+
   function updateStartBtn() {
+    replayControls?.classList.toggle("d-none", modeSelector.value !== "replay");
     if (modeSelector.value === "real") {
       startBtn.disabled = true;
       startBtn.innerHTML = `<i class="bi bi-play-fill"></i> Démarrer`;
@@ -103,8 +146,12 @@ document.addEventListener("DOMContentLoaded", () => {
         : `<i class="bi bi-play-fill"></i> Démarrer`;
     }
   }
-  modeSelector.addEventListener("change", updateStartBtn);
+  modeSelector.addEventListener("change", () => {
+    if (modeSelector.value === "replay") loadRecordings();
+    updateStartBtn();
+  });
   startBtn.addEventListener("click", () => {
+    if (modeSelector.value === "replay") return toggleReplay();
     if (modeSelector.value !== "simu") return;
     window.isRunning = !window.isRunning;
     updateStartBtn();
@@ -121,8 +168,48 @@ document.addEventListener("DOMContentLoaded", () => {
     }
   }, SIM_STEP_MS);
 
+  // Modes réel et rejeu : position et métriques poussées par le flux de télémétrie
+  subscribeTelemetry(d => {
+    renderAlerts(d.alerts);
+    if (modeSelector.value === "simu") return;
+    updateMetrics(d);
+    const last = d.track && d.track[d.track.length - 1];
+    if (!last) return;
+    const pos = Array.isArray(last) ? { x: last[0], y: last[1] } : last;
+    if (pos.x !== simPos.x || pos.y !== simPos.y) {
+      simPos = { ...pos };
+      incomingPoints.push(pos);
+    }
+  });
+
+  // Tracé : seuls les points ajoutés depuis le curseur sont demandés
+  let trackCursor = 0;
+  setInterval(() => {
+    if (modeSelector.value === "simu") return;
+    fetch(`/dashboard/vehicle/track?cursor=${trackCursor}`)
+      .then(r => r.json())
+      .then(t => {
+        if (t.reset) trackData = [];
+        t.points.forEach(([x, y]) => trackData.push({ x, y }));
+        if (trackData.length > MAX_TRACK_POINTS) trackData.splice(0, trackData.length - MAX_TRACK_POINTS);
+        trackCursor = t.cursor;
+      })
+      .catch(console.error);
+    // Tours détectés côté serveur (franchissement de la ligne de départ)
+    fetch("/dashboard/vehicle/laps")
+      .then(r => r.json())
+      .then(l => {
+        if (l.laps === lapCount) return;
+        lapCount = l.laps;
+        lapTimes = l.lap_times.map(t => t * 1000);
+        setText("lap-count", lapCount);
+        renderLapTimes();
+      })
+      .catch(console.error);
+  }, TRACK_POLL_MS);
+
   // Hover sur canvas
-  canvas.addEventListener("mousemove", e => handleHover(e, canvas));
+  canvas.addEventListener("mousemove", e => handleHover(e, canvas, modeSelector.value));
 
   // Rendu
   let lastTs = performance.now();
@@ -262,6 +349,7 @@ function simulateStep(dt) {
     setText("lap-count", lapCount);
     lapTimes.push(cfg.duration);
     renderLapTimes();
+    if (currentLap < NUM_LAPS - 1) lapGrid.insertPolyline(cfg.points, currentLap);
     lapProgress = 0;
     currentLap = Math.min(currentLap + 1, NUM_LAPS - 1);
     trackData = [];
@@ -269,20 +357,25 @@ function simulateStep(dt) {
   }
 }
 
-function handleHover(e, canvas) {
+function handleHover(e, canvas, mode) {
   const rect = canvas.getBoundingClientRect();
   const mx = (e.clientX - rect.left - zoom.offX) / zoom.scale;
   const my = (e.clientY - rect.top  - zoom.offY) / zoom.scale;
+  const radius = 5 / zoom.scale;
+  const lap = hoverInfo.lap;
   hoverInfo = { lap: null, x: e.offsetX, y: e.offsetY };
-  for (let i = 0; i < currentLap; i++) {
-    const pts = lapConfigs[i].points;
-    for (let j = 1; j < pts.length; j++) {
-      if (distanceToSegment(mx, my, pts[j-1], pts[j]) < 5 / zoom.scale) {
-        hoverInfo.lap = i;
-        return;
-      }
-    }
+  if (mode === "simu") {
+    hoverInfo.lap = lapGrid.nearest(mx, my, radius)?.label ?? null;
+    return;
   }
+  // Modes réel et rejeu : tours indexés côté serveur, requêtes espacées
+  hoverInfo.lap = lap;
+  if (e.timeStamp - lastNearestTs < NEAREST_POLL_MS) return;
+  lastNearestTs = e.timeStamp;
+  fetch(`/dashboard/maps/nearest?x=${mx}&y=${my}&radius=${radius}`)
+    .then(r => r.json())
+    .then(n => { hoverInfo.lap = n.found ? n.lap : null; })
+    .catch(console.error);
 }
 
 function drawAll(ctx, w, h) {
@@ -393,14 +486,6 @@ function clamp(v, min, max) {
   return v < min ? min : v > max ? max : v;
 }
 
-function distanceToSegment(x, y, a, b) {
-  const dx = b.x - a.x, dy = b.y - a.y;
-  const t  = ((x - a.x) * dx + (y - a.y) * dy) / (dx*dx + dy*dy);
-  const tt = Math.max(0, Math.min(1, t));
-  const px = a.x + dx * tt, py = a.y + dy * tt;
-  return Math.hypot(x - px, y - py);
-}
-
 function updateMetrics(d) {
   setText("current-speed", d.speed);
   setText("distance-traveled", d.distance);
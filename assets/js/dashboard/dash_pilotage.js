@@ -1,5 +1,5 @@
 // Pilotage bundle : gestion de la manette, clavier et simulation
-import { startPingLoop, setupStartStopControl } from "./dash_common.js";
+import { startPingLoop, setupStartStopControl, subscribeTelemetry } from "./dash_common.js";
 import * as THREE from 'three';
 import * as CANNON from 'cannon-es';
 
@@ -36,6 +36,37 @@ let targetCameraTilt = 0; // Inclinaison cible pour l'animation fluide
 let baseFOV = 60; // FOV de base
 let currentFOV = baseFOV; // FOV actuel pour l'animation fluide
 
+// --- CANAL DE COMMANDE (WebSocket) ---
+// Intervalle maximal entre deux envois quand les commandes ne changent pas
+const CONTROL_KEEPALIVE_MS = 100;
+let controlSocket = null;
+let controlSeq = 0;
+let lastSentControls = null;
+let lastSentAt = 0;
+
+function openControlChannel() {
+  if (controlSocket) return;
+  const proto = location.protocol === "https:" ? "wss" : "ws";
+  controlSocket = new WebSocket(`${proto}://${location.host}/dashboard/vehicle/control/ws`);
+  controlSocket.onopen = () => updateConnectionStatus(true);
+  controlSocket.onmessage = (e) => {
+    const msg = JSON.parse(e.data);
+    if (msg.type === "error") {
+      console.error("Erreur d'envoi des commandes:", msg.message);
+    } else {
+      updateConnectionStatus(true);
+    }
+  };
+  controlSocket.onclose = () => {
+    controlSocket = null;
+    updateConnectionStatus(false);
+  };
+}
+
+function closeControlChannel() {
+  if (controlSocket) controlSocket.close();
+}
+
 // Configuration de la caméra
 function setupCamera() {
   const cameraElement = document.getElementById("cameraStream");
@@ -166,27 +197,34 @@ function startSimulation() {
   
   simulationInterval = setInterval(() => {
     if (!isRunning || !isManualMode) return;
+    // Véhicule réel : l'affichage suit le flux de télémétrie
+    const selector = document.getElementById("mode-selector");
+    if (selector && selector.value !== "simu") return;
 
     // Simuler des données de télémétrie
     const telemetry = Math.floor(Math.random() * 200) + 10; // 10-210 cm
     const speed = Math.floor(Math.random() * 30); // 0-30 km/h
     const battery = Math.max(0, Math.random() * 100); // 0-100%
 
-    // Mise à jour de l'interface (avec vérification)
-    const simSpeed = document.getElementById("sim-speed");
-    if (simSpeed) simSpeed.textContent = `${speed} km/h`;
-    const simTelemetry = document.getElementById("sim-telemetry");
-    if (simTelemetry) simTelemetry.textContent = `${telemetry} cm`;
-    const simBattery = document.getElementById("sim-battery");
-    if (simBattery) simBattery.textContent = `${Math.floor(battery)}%`;
-    const batteryGauge = document.getElementById("battery-gauge");
-    if (batteryGauge) {
-      batteryGauge.style.width = `${battery}%`;
-      batteryGauge.className = `progress-bar ${battery < 20 ? 'bg-danger' : battery < 50 ? 'bg-warning' : 'bg-success'}`;
-    }
+    updateTelemetryDisplay(speed, telemetry, battery);
   }, 1000);
 }
 
+// Mise à jour de l'interface (avec vérification)
+function updateTelemetryDisplay(speed, telemetry, battery) {
+  const simSpeed = document.getElementById("sim-speed");
+  if (simSpeed) simSpeed.textContent = `${speed} km/h`;
+  const simTelemetry = document.getElementById("sim-telemetry");
+  if (simTelemetry) simTelemetry.textContent = `${telemetry} cm`;
+  const simBattery = document.getElementById("sim-battery");
+  if (simBattery) simBattery.textContent = `${Math.floor(battery)}%`;
+  const batteryGauge = document.getElementById("battery-gauge");
+  if (batteryGauge) {
+    batteryGauge.style.width = `${battery}%`;
+    batteryGauge.className = `progress-bar ${battery < 20 ? 'bg-danger' : battery < 50 ? 'bg-warning' : 'bg-success'}`;
+  }
+}
+
 // Envoi des commandes au serveur
 function sendControlCommand(controls) {
   if (simuAnimating && vehicle) {
@@ -229,7 +267,19 @@ function sendControlCommand(controls) {
     // On est en simulation, on ne fait rien côté backend
     return;
   }
-  // Sinon, on envoie la requête au backend
+  // N'envoie que les changements, plus un rappel périodique
+  const now = performance.now();
+  const changed = !lastSentControls
+    || ["throttle", "brake", "steering"].some(k => lastSentControls[k] !== controls[k]);
+  if (!changed && now - lastSentAt < CONTROL_KEEPALIVE_MS) return;
+  lastSentControls = { ...controls };
+  lastSentAt = now;
+  if (controlSocket && controlSocket.readyState === WebSocket.OPEN) {
+    controlSocket.send(JSON.stringify({ seq: ++controlSeq, ...controls }));
+    return;
+  }
+  openControlChannel();
+  // Repli HTTP tant que le canal n'est pas ouvert
   fetch("/dashboard/vehicle/control", {
     method: "POST",
     headers: { "Content-Type": "application/json" },
@@ -830,6 +880,13 @@ document.addEventListener("DOMContentLoaded", () => {
   setupStartStopControl();
   startSimulation();
 
+  // Mode manuel (véhicule réel) : télémétrie poussée par le serveur
+  subscribeTelemetry(d => {
+    const selector = document.getElementById("mode-selector");
+    if (!selector || selector.value === "simu") return;
+    updateTelemetryDisplay(Math.round(d.speed), Math.round(d.telemetry), d.battery);
+  });
+
   // Affichage dynamique simulation/vidéo
   const modeSelector = document.getElementById("mode-selector");
   const controlSelector = document.getElementById("control-selector");
@@ -853,6 +910,11 @@ document.addEventListener("DOMContentLoaded", () => {
       showSimu3D(modeSelector.value === "simu");
       document.getElementById("manual-controls").classList.remove("d-none");
       setupCamera(); // Appeler setupCamera à chaque changement de mode
+      if (modeSelector.value === "manuel") {
+        openControlChannel();
+      } else {
+        closeControlChannel();
+      }
       updateControlsDisplay();
     };
     modeSelector.addEventListener("change", updateMode);
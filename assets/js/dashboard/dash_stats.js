@@ -1,8 +1,14 @@
 // stats bundle : polling des données et affichage des stats
-import { setText } from "./dash_common.js";
+import { renderAlerts, setText, subscribeTelemetry } from "./dash_common.js";
 import Chart from 'chart.js/auto';
 import 'chartjs-adapter-date-fns';
 
+// Nombre de points affichés et profondeur de l'historique récupéré au chargement
+const MAX_HISTORY_POINTS = 120;
+const HISTORY_WINDOW_S = 120;
+// Le flux pousse plusieurs trames par seconde : un point d'historique par seconde
+const HISTORY_STEP_MS = 1000;
+
 // Historique des données
 const history = {
   battery: [],
@@ -14,6 +20,7 @@ let historyChart = null;
 let batteryGauge = null;
 let motorGauge = null;
 let currentMetric = 'battery';
+let lastHistoryPush = 0;
 
 // Fonction d'arrondi
 function roundValue(value, decimals = 1) {
@@ -40,9 +47,8 @@ document.addEventListener("DOMContentLoaded", () => {
     });
   });
 
-  // Interroger dès le chargement, puis toutes les secondes
-  fetchData();
-  setInterval(fetchData, 1000);
+  // Reprendre l'historique du serveur, puis suivre le flux de télémétrie
+  loadHistory().finally(() => subscribeTelemetry(renderFrame));
 });
 
 function initGauges() {
@@ -171,32 +177,50 @@ function initHistoryChart() {
   });
 }
 
-function fetchData() {
-  fetch("/dashboard/vehicle/data")
+// Récupère l'historique récent côté serveur (perdu sinon à chaque rechargement)
+function loadHistory() {
+  const since = Date.now() / 1000 - HISTORY_WINDOW_S;
+  const params = new URLSearchParams({
+    since,
+    max_points: MAX_HISTORY_POINTS,
+    fields: "battery,motor_speed,motor_power"
+  });
+  return fetch(`/dashboard/vehicle/history?${params}`)
     .then(r => r.json())
-    .then(d => {
-      // Mettre à jour les champs textuels avec arrondi
-      setText("battery-level", roundValue(d.battery));
-      setText("battery-voltage", roundValue(d.battery_voltage));
-      setText("motor-power", roundValue(d.motor_power));
-      setText("motor-speed", roundValue(d.motor_speed));
-      setText("energy-consumption", roundValue(d.energy));
-      setText("current", roundValue(d.current));
-      setText("telemetry", roundValue(d.telemetry));
-      setText("distance", roundValue(d.distance));
-      setText("motor-temp", roundValue(d.motor_temp));
-      setText("battery-temp", roundValue(d.battery_temp));
-
-      // Mettre à jour les jauges
-      updateGauge(batteryGauge, d.battery);
-      updateGauge(motorGauge, d.motor_power);
-
-      // Mettre à jour l'historique
-      updateHistory(d);
+    .then(h => {
+      history.timestamps = h.timestamp.map(ts => new Date(ts * 1000));
+      history.battery = h.fields.battery.map(v => roundValue(v));
+      history.speed = h.fields.motor_speed.map(v => roundValue(v));
+      history.power = h.fields.motor_power.map(v => roundValue(v));
     })
     .catch(console.error);
 }
 
+function renderFrame(d) {
+  // Mettre à jour les champs textuels avec arrondi
+  setText("battery-level", roundValue(d.battery));
+  setText("battery-voltage", roundValue(d.battery_voltage));
+  setText("motor-power", roundValue(d.motor_power));
+  setText("motor-speed", roundValue(d.motor_speed));
+  setText("energy-consumption", roundValue(d.energy));
+  setText("current", roundValue(d.current));
+  setText("telemetry", roundValue(d.telemetry));
+  setText("distance", roundValue(d.distance));
+  setText("motor-temp", roundValue(d.motor_temp));
+  setText("battery-temp", roundValue(d.battery_temp));
+  renderAlerts(d.alerts);
+
+  // Mettre à jour les jauges
+  updateGauge(batteryGauge, d.battery);
+  updateGauge(motorGauge, d.motor_power);
+
+  // Mettre à jour l'historique
+  if (Date.now() - lastHistoryPush >= HISTORY_STEP_MS) {
+    lastHistoryPush = Date.now();
+    updateHistory(d);
+  }
+}
+
 function updateGauge(gauge, value) {
   const roundedValue = roundValue(value);
   gauge.data.datasets[0].data = [roundedValue, 100 - roundedValue];
@@ -210,8 +234,8 @@ function updateHistory(data) {
   history.speed.push(roundValue(data.motor_speed));
   history.power.push(roundValue(data.motor_power));
 
-  // Garder les 30 dernières valeurs
-  if (history.timestamps.length > 30) {
+  // Garder les MAX_HISTORY_POINTS dernières valeurs
+  if (history.timestamps.length > MAX_HISTORY_POINTS) {
     history.timestamps.shift();
     history.battery.shift();
     history.speed.shift();
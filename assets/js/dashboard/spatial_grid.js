@@ -0,0 +1,71 @@
+// assets/js/dashboard/spatial_grid.js
+// Grille uniforme de segments : équivalent client de l'index des tours
+// (/dashboard/maps/nearest), pour le survol sans aller-retour serveur.
+
+export class SegmentGrid {
+  constructor(cellSize = 10) {
+    this.cellSize = cellSize;
+    this.cells    = new Map();   // "ix,iy" → indices de segments
+    this.segments = [];          // { a, b, label }
+  }
+
+  clear() {
+    this.cells.clear();
+    this.segments = [];
+  }
+
+  _key(ix, iy) {
+    return `${ix},${iy}`;
+  }
+
+  insert(a, b, label) {
+    const id = this.segments.length;
+    this.segments.push({ a, b, label });
+    const c = this.cellSize;
+    const x0 = Math.floor(Math.min(a.x, b.x) / c), x1 = Math.floor(Math.max(a.x, b.x) / c);
+    const y0 = Math.floor(Math.min(a.y, b.y) / c), y1 = Math.floor(Math.max(a.y, b.y) / c);
+    for (let ix = x0; ix <= x1; ix++) {
+      for (let iy = y0; iy <= y1; iy++) {
+        const key = this._key(ix, iy);
+        if (!this.cells.has(key)) this.cells.set(key, []);
+        this.cells.get(key).push(id);
+      }
+    }
+  }
+
+  // Polyligne d'un tour (fermée : le dernier point rejoint le premier)
+  insertPolyline(points, label, closed = true) {
+    for (let i = 1; i < points.length; i++) this.insert(points[i - 1], points[i], label);
+    if (closed && points.length > 2) this.insert(points[points.length - 1], points[0], label);
+  }
+
+  // Segment le plus proche de (x, y) à moins de radius : { label, distance, segment } ou null
+  nearest(x, y, radius) {
+    const c = this.cellSize;
+    const seen = new Set();
+    let best = null;
+    for (let ix = Math.floor((x - radius) / c); ix <= Math.floor((x + radius) / c); ix++) {
+      for (let iy = Math.floor((y - radius) / c); iy <= Math.floor((y + radius) / c); iy++) {
+        const ids = this.cells.get(this._key(ix, iy));
+        if (!ids) continue;
+        for (const id of ids) {
+          if (seen.has(id)) continue;
+          seen.add(id);
+          const { a, b, label } = this.segments[id];
+          const d = distanceToSegment(x, y, a, b);
+          if (d <= radius && (!best || d < best.distance)) best = { label, distance: d, segment: id };
+        }
+      }
+    }
+    return best;
+  }
+}
+
+export function distanceToSegment(x, y, a, b) {
+  const dx = b.x - a.x, dy = b.y - a.y;
+  const len = dx*dx + dy*dy;
+  const t  = len ? ((x - a.x) * dx + (y - a.y) * dy) / len : 0;
+  const tt = Math.max(0, Math.min(1, t));
+  const px = a.x + dx * tt, py = a.y + dy * tt;
+  return Math.hypot(x - px, y - py);
+}
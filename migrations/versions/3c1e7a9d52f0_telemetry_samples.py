@@ -0,0 +1,43 @@
+"""telemetry samples
+
+Revision ID: 3c1e7a9d52f0
+Revises: 8f3b40b024d6
+Create Date: 2026-10-18 09:12:04.183217
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1e7a9d52f0'
+down_revision = '8f3b40b024d6'
+branch_labels = None
+depends_on = None
+
+SAMPLE_FIELDS = (
+    'speed', 'distance', 'battery', 'battery_voltage', 'battery_temp', 'energy',
+    'current', 'motor_power', 'motor_speed', 'motor_temp', 'telemetry', 'encoders',
+)
+
+
+def upgrade():
+    op.create_table('telemetry_samples',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('race_id', sa.Integer(), nullable=True),
+    sa.Column('timestamp', sa.Float(), nullable=False),
+    *(sa.Column(name, sa.Float(), nullable=True) for name in SAMPLE_FIELDS),
+    sa.ForeignKeyConstraint(['race_id'], ['race_logs.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('telemetry_samples', schema=None) as batch_op:
+        batch_op.create_index('ix_telemetry_samples_race_timestamp', ['race_id', 'timestamp'], unique=False)
+        batch_op.create_index(batch_op.f('ix_telemetry_samples_timestamp'), ['timestamp'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('telemetry_samples', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_telemetry_samples_timestamp'))
+        batch_op.drop_index('ix_telemetry_samples_race_timestamp')
+
+    op.drop_table('telemetry_samples')
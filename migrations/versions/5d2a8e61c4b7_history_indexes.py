@@ -0,0 +1,32 @@
+"""history indexes
+
+Revision ID: 5d2a8e61c4b7
+Revises: 3c1e7a9d52f0
+Create Date: 2026-10-18 14:37:51.602318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d2a8e61c4b7'
+down_revision = '3c1e7a9d52f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('race_logs', schema=None) as batch_op:
+        batch_op.create_index('ix_race_logs_start_time', ['start_time', 'id'], unique=False)
+
+    with op.batch_alter_table('connection_logs', schema=None) as batch_op:
+        batch_op.create_index('ix_connection_logs_fonction_date', ['fonction', 'connection_date', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('connection_logs', schema=None) as batch_op:
+        batch_op.drop_index('ix_connection_logs_fonction_date')
+
+    with op.batch_alter_table('race_logs', schema=None) as batch_op:
+        batch_op.drop_index('ix_race_logs_start_time')
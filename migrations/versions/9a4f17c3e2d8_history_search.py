@@ -0,0 +1,61 @@
+"""history search
+
+Revision ID: 9a4f17c3e2d8
+Revises: 5d2a8e61c4b7
+Create Date: 2026-10-18 16:05:22.418930
+
+"""
+import sqlite3
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4f17c3e2d8'
+down_revision = '5d2a8e61c4b7'
+branch_labels = None
+depends_on = None
+
+SEARCH_COLUMNS = {
+    'race_logs': ('race_name', 'user_name'),
+    'connection_logs': ('user_name',),
+}
+
+
+def sqlite_upgrade(table, columns):
+    fts = f'{table}_fts'
+    names = ', '.join(columns)
+    new = ', '.join(f'new.{name}' for name in columns)
+    old = ', '.join(f'old.{name}' for name in columns)
+    delete = f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old});"
+    insert = f"INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new});"
+    op.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({names}, content='{table}', "
+               f"content_rowid='id', tokenize='trigram')")
+    op.execute(f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN {insert} END")
+    op.execute(f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN {delete} END")
+    op.execute(f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {names} ON {table} BEGIN {delete} {insert} END")
+    op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    for table, columns in SEARCH_COLUMNS.items():
+        if dialect == 'sqlite' and sqlite3.sqlite_version_info >= (3, 34, 0):
+            sqlite_upgrade(table, columns)
+        elif dialect == 'postgresql':
+            op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            for name in columns:
+                op.execute(f'CREATE INDEX IF NOT EXISTS ix_{table}_{name}_trgm ON {table} USING gin ({name} gin_trgm_ops)')
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    for table, columns in SEARCH_COLUMNS.items():
+        if dialect == 'sqlite':
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute(f'DROP TRIGGER IF EXISTS {table}_fts_{suffix}')
+            op.execute(f'DROP TABLE IF EXISTS {table}_fts')
+        elif dialect == 'postgresql':
+            for name in columns:
+                op.execute(f'DROP INDEX IF EXISTS ix_{table}_{name}_trgm')
@@ -0,0 +1,28 @@
+"""telemetry sample vehicle
+
+Revision ID: b7e2c94d1a3f
+Revises: 9a4f17c3e2d8
+Create Date: 2026-10-18 15:02:11.408392
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2c94d1a3f'
+down_revision = '9a4f17c3e2d8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('telemetry_samples', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('vehicle_id', sa.String(length=64), nullable=True))
+        batch_op.create_index('ix_telemetry_samples_vehicle_timestamp', ['vehicle_id', 'timestamp'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('telemetry_samples', schema=None) as batch_op:
+        batch_op.drop_index('ix_telemetry_samples_vehicle_timestamp')
+        batch_op.drop_column('vehicle_id')
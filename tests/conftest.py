@@ -8,6 +8,7 @@ from webtest import TestApp
 
 from app.app import create_app
 from app.database import db as _db
+from app.user.models import Permission
 
 from .factories import UserFactory
 
@@ -51,3 +52,20 @@ def user(db):
     user = UserFactory(password="myprecious")
     db.session.commit()
     return user
+
+
+@pytest.fixture
+def dashboard_client(app, user):
+    """Client de test connecté avec les permissions dashboard et pilotage."""
+    for name in ("dashboard", "pilotage"):
+        permission = Permission(name=name)
+        _db.session.add(permission)
+        user.permissions.append(permission)
+    _db.session.commit()
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["_user_id"] = str(user.id)
+        sess["_fresh"] = True
+        sess["dashboard_connected"] = True
+        sess["dashboard_mode"] = "real"
+    return client
@@ -11,3 +11,26 @@ DEBUG_TB_ENABLED = False
 CACHE_TYPE = "flask_caching.backends.SimpleCache"  # Can be "memcached", "redis", etc.
 SQLALCHEMY_TRACK_MODIFICATIONS = False
 WTF_CSRF_ENABLED = False  # Allows form testing
+TELEMETRY_SHM_PATH = None  # Mémoire anonyme, isolée par processus de test
+TELEMETRY_HISTORY_PATH = None
+TELEMETRY_HISTORY_SIZE = 64
+TELEMETRY_ROLLUP_PATH = None
+TELEMETRY_ROLLUP_SIZE = 64
+TELEMETRY_TRACK_PATH = None
+TELEMETRY_TRACK_SIZE = 64
+TELEMETRY_PERSIST_ENABLED = False  # Les tests vident le tampon explicitement
+CONTROL_SHM_PATH = None
+LAP_SHM_PATH = None
+LAP_INDEX_PATH = None
+LAP_INDEX_SIZE = 1024
+CAMERA_SHM_PATH = None
+CAMERA_MAX_FRAME_BYTES = 4096
+PING_SHM_PATH = None
+PING_PROBER_ENABLED = False
+ALERT_SHM_PATH = None
+REPLAY_SHM_PATH = None
+ALERT_RULES = [
+    {"id": "battery_temp_high", "field": "battery_temp", "above": 55, "clear": 50, "hold": 2, "level": "danger"},
+]
+HISTORY_GENERATION_PATH = None
+HISTORY_COUNT_CAP = 20
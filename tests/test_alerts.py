@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""Telemetry alert rule tests."""
+import numpy as np
+import pytest
+
+from app.dashboard.alerts import AlertEngine
+from app.dashboard.telemetry import NUMERIC_FIELDS, telemetry
+
+HOT = {"id": "hot", "field": "battery_temp", "above": 50, "clear": 45, "hold": 2, "level": "danger"}
+SPIKE = {"id": "spike", "field": "current", "rate_above": 10, "clear": 2}
+
+
+def columns(timestamps, **values):
+    """Block ``(NUMERIC_FIELDS, n)`` with the given fields, zeros elsewhere."""
+    block = np.zeros((len(NUMERIC_FIELDS), len(timestamps)))
+    block[NUMERIC_FIELDS.index("timestamp")] = timestamps
+    for name, column in values.items():
+        block[NUMERIC_FIELDS.index(name)] = column
+    return block
+
+
+class TestAlertEngine:
+    """Thresholds, rates, hold time and hysteresis."""
+
+    def test_hold_time(self):
+        """A condition must hold for ``hold`` seconds before raising."""
+        engine = AlertEngine(rules=[HOT], fields=NUMERIC_FIELDS)
+        assert engine.evaluate(columns([0, 1], battery_temp=[51, 52])) == []
+        # Condition tenue depuis t=0 : levée à t=2, même à travers deux lots
+        alert, = engine.evaluate(columns([2, 3], battery_temp=[52, 53]))
+        assert alert["id"] == "hot" and alert["level"] == "danger"
+        assert alert["since"] == 2
+        assert alert["value"] == 53
+
+    def test_interrupted_condition_restarts_hold(self):
+        """An interrupted condition starts its hold time again."""
+        engine = AlertEngine(rules=[HOT], fields=NUMERIC_FIELDS)
+        assert engine.evaluate(columns([0, 1, 2, 3], battery_temp=[51, 49, 51, 51])) == []
+        assert engine.evaluate(columns([4], battery_temp=[51]))[0]["since"] == 4
+
+    def test_hysteresis(self):
+        """An alert clears only past its ``clear`` threshold."""
+        engine = AlertEngine(rules=[dict(HOT, hold=0)], fields=NUMERIC_FIELDS)
+        assert engine.evaluate(columns([0], battery_temp=[51]))
+        # Entre clear et le seuil : l'alerte reste levée, sans nouvelle levée
+        alert, = engine.evaluate(columns([1, 2, 3], battery_temp=[48, 51, 47]))
+        assert alert["since"] == 0
+        assert engine.evaluate(columns([4], battery_temp=[45])) == []
+
+    def test_rate_of_change(self):
+        """Rate rules compare the change per second."""
+        engine = AlertEngine(rules=[SPIKE], fields=NUMERIC_FIELDS)
+        assert engine.evaluate(columns([0.0, 0.1], current=[1, 1.5])) == []
+        alert, = engine.evaluate(columns([0.2], current=[4]))
+        assert alert["value"] == 25
+        assert engine.evaluate(columns([0.3, 0.4], current=[4.1, 4.2])) == []
+
+    def test_batch_matches_sample_by_sample(self):
+        """Evaluating a batch gives the same state as evaluating each sample."""
+        rng = np.random.default_rng(1)
+        timestamps = np.arange(500) * 0.05
+        block = columns(timestamps, battery_temp=45 + np.cumsum(rng.normal(0, 1, 500)),
+                        current=rng.normal(0, 1, 500))
+        batch = AlertEngine(rules=[HOT, SPIKE], fields=NUMERIC_FIELDS)
+        single = AlertEngine(rules=[HOT, SPIKE], fields=NUMERIC_FIELDS)
+        for start in range(0, 500, 100):
+            batch.evaluate(block[:, start:start + 100])
+            for index in range(start, start + 100):
+                single.evaluate(block[:, index:index + 1])
+            assert batch.active() == single.active()
+
+    def test_shared_between_mappings(self, tmp_path):
+        """Alerts raised through one mapping are visible through another."""
+        path = str(tmp_path / "alerts.shm")
+        writer = AlertEngine(path, rules=[dict(HOT, hold=0)], fields=NUMERIC_FIELDS)
+        reader = AlertEngine(path, rules=[dict(HOT, hold=0)], fields=NUMERIC_FIELDS)
+        writer.evaluate(columns([0], battery_temp=[60]))
+        assert [alert["id"] for alert in reader.active()] == ["hot"]
+
+    @pytest.mark.parametrize("rule", [
+        {"id": "x", "field": "battery_temp"},
+        {"id": "x", "field": "nope", "above": 1},
+        {"id": "x", "field": "battery_temp", "above": 1, "below": 0},
+        {"id": "x", "field": "battery_temp", "above": 50, "clear": 55},
+    ])
+    def test_invalid_rules(self, rule):
+        """Incomplete or contradictory rules are rejected."""
+        with pytest.raises(ValueError):
+            AlertEngine(rules=[rule], fields=NUMERIC_FIELDS)
+
+
+class TestAlertsInFrames:
+    """Alerts attached to the published frames."""
+
+    def test_frame_carries_rule_alerts(self, app):
+        """The latest frame lists the alerts raised by the rules."""
+        frame = {"timestamp": 10.0, "battery_temp": 90.0, "alerts": ["Obstacle"]}
+        telemetry.publish(dict(frame, timestamp=0.0))
+        telemetry.publish(frame)
+        alerts = telemetry.latest()["alerts"]
+        assert alerts[0] == "Obstacle"
+        assert [alert["id"] for alert in alerts[1:]] == ["battery_temp_high"]
+
+    def test_alerts_endpoint(self, app, db, dashboard_client):
+        """The endpoint lists the rules and the active alerts."""
+        dashboard_client.post("/dashboard/vehicle/data/batch", json=[
+            {"timestamp": 1.0, "battery_temp": 60.0}, {"timestamp": 4.0, "battery_temp": 61.0},
+        ])
+        response = dashboard_client.get("/dashboard/vehicle/alerts").json
+        assert [rule["id"] for rule in response["rules"]] == ["battery_temp_high"]
+        alert, = response["active"]
+        assert alert["since"] == 4.0
+        assert alert["value"] == 61.0
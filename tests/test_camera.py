@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""MJPEG camera streaming tests."""
+import time
+
+import pytest
+
+from app.dashboard.camera import (
+    MJPEG_MIMETYPE,
+    Camera,
+    DirectorySource,
+    FrameBuffer,
+    Tier,
+    TierSelector,
+    cameras,
+    encode_tiers,
+    format_part,
+)
+
+
+@pytest.fixture
+def frames_dir(tmp_path):
+    """Directory of fake JPEG frames."""
+    for i in range(3):
+        (tmp_path / f"{i:03d}.jpg").write_bytes(b"\xff\xd8frame%d\xff\xd9" % i)
+    (tmp_path / "notes.txt").write_text("ignored")
+    return tmp_path
+
+
+class TestFrameBuffer:
+    """Shared latest frame and capture lifecycle."""
+
+    def test_latest_frame(self):
+        """The buffer returns the last published frame."""
+        buffer = FrameBuffer(capacity=64)
+        assert buffer.read() is None
+        assert buffer.write(b"abc", timestamp=1.0)
+        assert buffer.write(b"de", timestamp=2.0)
+        assert buffer.read() == (2, 2.0, b"de")
+        assert not buffer.write(b"x" * 65)
+        buffer.close()
+
+
+class TestCamera:
+    """One capture shared by every viewer."""
+
+    def test_viewers_share_one_capture(self, frames_dir):
+        """Concurrent viewers share a single capture thread."""
+        camera = Camera("test", DirectorySource(str(frames_dir), fps=50), FrameBuffer(capacity=64))
+        first, second = camera.subscribe(), camera.subscribe()
+        # Aucune image avant le démarrage de la capture : chaque ``get`` attend la première
+        parts = [first.get(timeout=2), second.get(timeout=2)]
+        assert all(part is not None and part.startswith(b"--frame\r\nContent-Type: image/jpeg") for part in parts)
+        # Un spectateur qui ne lit pas ne garde que la dernière image
+        time.sleep(0.2)
+        assert first.coalesced > 0
+        camera.unsubscribe(first)
+        camera.unsubscribe(second)
+        assert camera.stats["errors"] == 0
+        assert camera.stats["frames"] >= 3
+        camera.close()
+
+    def test_idle_camera_stops_capturing(self, frames_dir):
+        """A camera nobody watches stops capturing."""
+        camera = Camera("test", DirectorySource(str(frames_dir), fps=50), FrameBuffer(capacity=64), idle_timeout=0.1)
+        camera.unsubscribe(camera.subscribe())
+        time.sleep(0.5)
+        assert camera._thread is None
+        camera.close()
+
+
+class TestTiers:
+    """Per-viewer quality and frame rate."""
+
+    def test_selector_steps_down_then_up(self):
+        """The selector steps down on slow links and back up after a while."""
+        selector = TierSelector(["full", "medium", "low"], fps=10, upgrade_frames=3)
+        # 50 ko par image à 10 i/s sur un lien à 100 ko/s : trop lourd
+        assert selector.record(50_000, 0.5) == "medium"
+        assert selector.record(20_000, 0.2) == "low"
+        # Lien rétabli : on remonte après quelques images confortables
+        for _ in range(20):
+            tier = selector.record(5_000, 0.001)
+        assert tier == "full"
+
+    def test_viewer_caps_frame_rate(self, frames_dir):
+        """A viewer never receives more frames than the configured rate."""
+        camera = Camera("test", DirectorySource(str(frames_dir), fps=50), FrameBuffer(capacity=64))
+        now, sleeps = [0.0], []
+        viewer = camera.viewer(max_fps=5, clock=lambda: now[0], sleep=sleeps.append)
+        next(viewer)
+        now[0] += 0.05
+        next(viewer)
+        assert sleeps == [pytest.approx(0.15)]
+        viewer.close()
+        assert camera.broadcasters["full"].subscriber_count == 0
+        camera.close()
+
+    def test_encode_tiers(self):
+        """Each tier is re-encoded at its own resolution."""
+        image = pytest.importorskip("PIL.Image")
+        import io
+
+        output = io.BytesIO()
+        image.new("RGB", (1280, 720), "red").save(output, "JPEG")
+        encoded = encode_tiers(output.getvalue(), [Tier("medium", 640, 70), Tier("low", 320, 50)])
+        assert image.open(io.BytesIO(encoded["low"])).size == (320, 180)
+        assert len(encoded["low"]) < len(encoded["medium"]) < len(output.getvalue())
+
+
+class TestCameraStream:
+    """MJPEG stream endpoint."""
+
+    def test_multipart_response(self, app, db, dashboard_client, frames_dir):
+        """The stream is a multipart response of JPEG parts."""
+        app.config["CAMERA_SOURCES"] = {"default": str(frames_dir)}
+        cameras.init_app(app)
+        response = dashboard_client.get("/dashboard/vehicle/camera/stream", buffered=False)
+        assert response.status_code == 200
+        assert response.mimetype == MJPEG_MIMETYPE.split(";")[0]
+        part = next(iter(response.response))
+        assert part in {format_part(b"\xff\xd8frame%d\xff\xd9" % i) for i in range(3)}
+        response.close()
+        assert dashboard_client.get("/dashboard/vehicle/camera/unknown/stream").status_code == 404
+        assert dashboard_client.get("/dashboard/vehicle/camera/stream?tier=huge").status_code == 400
+        assert dashboard_client.get("/dashboard/vehicle/camera/stream?fps=0").status_code == 400
+        cameras.default.close()
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+"""Pilotage control channel tests."""
+import json
+
+import pytest
+
+from app.dashboard.control import (
+    SAFE_STOP,
+    ControlScheduler,
+    ControlSlot,
+    VehicleControl,
+    clean_command,
+)
+
+
+class TestCleanCommand:
+    """Command validation."""
+
+    def test_clamps_values(self):
+        """Out-of-range inputs are clamped."""
+        command = clean_command({"seq": 3, "throttle": 2, "brake": -1, "steering": -0.5})
+        assert command == {"seq": 3, "throttle": 1.0, "brake": 0.0, "steering": -0.5}
+
+    @pytest.mark.parametrize("raw", [[], {"throttle": "1"}, {"seq": -1}, {"brake": True}])
+    def test_rejects_invalid(self, raw):
+        """Non-numeric fields and bad sequence numbers are rejected."""
+        with pytest.raises(ValueError):
+            clean_command(raw)
+
+    def test_seq_is_optional(self):
+        """A command without ``seq`` carries no sequence number."""
+        assert "seq" not in clean_command({"throttle": 0.5})
+
+
+class TestControlWebSocket:
+    """Ordering on the persistent command channel."""
+
+    class FakeSocket:
+        """In-memory WebSocket replaying scripted messages."""
+
+        def __init__(self, messages):
+            """Create instance."""
+            self.messages = list(messages)
+            self.sent = []
+
+        def receive(self):
+            """Next scripted message; the connection closes once they run out."""
+            if not self.messages:
+                raise ConnectionError
+            return json.dumps(self.messages.pop(0))
+
+        def send(self, message):
+            """Record a message sent to the client."""
+            self.sent.append(json.loads(message))
+
+    def test_commands_without_seq_are_applied(self, app):
+        """Late commands are dropped; commands without ``seq`` skip the check."""
+        from app.dashboard.views.dashboard import _control_ws
+
+        control = VehicleControl(app)
+        ws = self.FakeSocket([{"seq": 2, "throttle": 0.1}, {"seq": 1}, {"throttle": 0.3}, {"throttle": 0.4}])
+        with pytest.raises(ConnectionError):
+            _control_ws(ws, control)
+        assert [ack.get("dropped", False) for ack in ws.sent] == [False, True, False, False]
+        assert control.slot.read()["throttle"] == 0.4
+
+
+class TestControlSlot:
+    """Latest-wins shared command slot."""
+
+    def test_latest_wins(self, tmp_path):
+        """Only the newest command is visible, from any mapping of the slot."""
+        path = str(tmp_path / "control.shm")
+        writer, reader = ControlSlot(path), ControlSlot(path)
+        writer.write(clean_command({"seq": 1, "throttle": 0.2}), timestamp=10.0)
+        version = writer.write(clean_command({"seq": 2, "throttle": 0.8}), timestamp=11.0)
+        command = reader.read()
+        assert command["version"] == version
+        assert command["seq"] == 2
+        assert command["throttle"] == 0.8
+        assert command["timestamp"] == 11.0
+
+    def test_stale_command_is_replaced_by_safe_stop(self, app):
+        """A command older than the max age is not replayed."""
+        control = VehicleControl(app)
+        control.slot.write(clean_command({"seq": 1, "throttle": 1}), timestamp=100.0)
+        assert control.latest(now=100.1)["throttle"] == 1.0
+        late = control.latest(now=100.0 + control.max_age + 1)
+        assert late["stale"] is True
+        assert {k: late[k] for k in SAFE_STOP} == SAFE_STOP
+
+
+class TestControlEndpoints:
+    """HTTP fallback and vehicle-side read endpoints."""
+
+    def test_post_command_then_read_latest(self, dashboard_client):
+        """A command posted over HTTP is served to the vehicle-side consumer."""
+        res = dashboard_client.post("/dashboard/vehicle/control", json={"seq": 1, "steering": 0.4})
+        assert res.get_json()["status"] == "success"
+        latest = dashboard_client.get("/dashboard/vehicle/control/latest").get_json()
+        assert latest["steering"] == 0.4
+        assert latest["stale"] is False
+
+    def test_start_stop_still_echoes(self, dashboard_client):
+        """Start/stop requests keep their previous response."""
+        res = dashboard_client.post("/dashboard/vehicle/control", json={"start": True})
+        assert res.get_json() == {"status": "success", "commande": "démarrer"}
+
+
+class _RecordingLink:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, tick, timestamp, command):
+        self.sent.append((tick, command))
+
+
+class TestControlScheduler:
+    """Fixed-rate output with dead-man watchdog."""
+
+    def test_coalesces_between_ticks(self):
+        """Commands received between two ticks are merged into the latest."""
+        slot, link = ControlSlot(), _RecordingLink()
+        scheduler = ControlScheduler(slot, link=link, deadline=0.5)
+        scheduler.tick(now=1.0)
+        for seq, throttle in enumerate((0.1, 0.2, 0.3), start=1):
+            slot.write(clean_command({"seq": seq, "throttle": throttle}), timestamp=1.01)
+        assert scheduler.tick(now=1.02)["throttle"] == 0.3
+        counters = slot.counters()
+        assert counters["received"] == 3
+        assert counters["coalesced"] == 2
+        assert counters["ticks"] == 2
+        assert [tick for tick, _ in link.sent] == [1, 2]
+
+    def test_safe_stop_after_deadline(self):
+        """Without fresh input the safe stop is emitted, counted once per outage."""
+        slot = ControlSlot()
+        scheduler = ControlScheduler(slot, deadline=0.5)
+        slot.write(clean_command({"seq": 1, "throttle": 1}), timestamp=10.0)
+        assert scheduler.tick(now=10.2)["throttle"] == 1.0
+        assert scheduler.tick(now=10.6) == SAFE_STOP
+        assert scheduler.tick(now=10.7) == SAFE_STOP
+        assert slot.counters()["safe_stops"] == 1
+
+    def test_single_leader(self, tmp_path):
+        """Only one scheduler sharing a lock file may emit."""
+        path = str(tmp_path / "control.lock")
+        first, second = ControlScheduler(ControlSlot(), lock_path=path), ControlScheduler(ControlSlot(), lock_path=path)
+        assert first.leader.acquire()
+        assert not second.leader.acquire()
+        first.leader.release()
+        assert second.leader.acquire()
+        second.leader.release()
+
+    def test_stats_endpoint(self, dashboard_client):
+        """Invalid commands are counted as dropped."""
+        dashboard_client.post("/dashboard/vehicle/control", json={"throttle": "full"})
+        stats = dashboard_client.get("/dashboard/vehicle/control/stats").get_json()
+        assert stats["counters"]["dropped"] == 1
+        assert stats["tick_rate"] == 50
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""History downsampling and rollup tests."""
+import numpy as np
+import pytest
+
+from app.dashboard.downsample import TelemetryRollups, lttb_indices, minmax_indices
+from app.dashboard.telemetry import NUMERIC_FIELDS, Telemetry
+
+
+def make_columns(timestamps, speed):
+    """Telemetry columns at ``timestamps`` with a given speed."""
+    columns = np.zeros((len(NUMERIC_FIELDS), len(timestamps)))
+    columns[0] = timestamps
+    columns[NUMERIC_FIELDS.index("speed")] = speed
+    return columns
+
+
+class TestDownsample:
+    """LTTB and min/max selection."""
+
+    def test_lttb_keeps_endpoints_and_peak(self):
+        """The first, last and an isolated spike survive LTTB."""
+        x = np.arange(1000, dtype=float)
+        y = np.zeros(1000)
+        y[417] = 50
+        indices = lttb_indices(x, y, 20)
+        assert len(indices) == 20
+        assert indices[0] == 0 and indices[-1] == 999
+        assert 417 in indices
+        assert (np.diff(indices) > 0).all()
+
+    def test_minmax_keeps_bucket_extremes(self):
+        """Each bucket contributes its minimum and maximum."""
+        y = np.sin(np.linspace(0, 20, 2000))
+        indices = minmax_indices(y, 40)
+        assert len(indices) <= 40
+        assert y[indices].max() == y.max()
+        assert y[indices].min() == y.min()
+
+    def test_short_series_is_untouched(self):
+        """Series shorter than the budget are returned whole."""
+        assert lttb_indices(np.arange(5.0), np.arange(5.0), 10).tolist() == [0, 1, 2, 3, 4]
+
+
+class TestTelemetryRollups:
+    """Incremental multi-resolution aggregates."""
+
+    def test_incremental_merge_matches_full_aggregate(self):
+        """Feeding samples in chunks gives the same buckets as one block."""
+        timestamps = np.arange(0, 100, 0.25) + 1000
+        speed = np.random.default_rng(1).random(len(timestamps))
+        rollups = TelemetryRollups(resolutions=(1, 10), capacity=64, fields=NUMERIC_FIELDS)
+        for chunk in np.array_split(np.arange(len(timestamps)), 7):
+            rollups.extend(make_columns(timestamps[chunk], speed[chunk]))
+
+        starts, means, lows, highs = rollups.read(10, ["speed"])
+        assert starts.tolist() == [1000.0 + 10 * i for i in range(10)]
+        expected = speed.reshape(10, 40)
+        assert np.allclose(means["speed"], expected.mean(axis=1))
+        assert np.allclose(lows["speed"], expected.min(axis=1))
+        assert np.allclose(highs["speed"], expected.max(axis=1))
+
+    def test_ring_keeps_only_recent_buckets(self):
+        """Memory is fixed: only the last ``capacity`` buckets are kept."""
+        rollups = TelemetryRollups(resolutions=(1,), capacity=8, fields=NUMERIC_FIELDS)
+        rollups.extend(make_columns(np.arange(100.0), np.ones(100)))
+        starts, means, _lows, _highs = rollups.read(1, ["speed"], since=0)
+        assert starts.tolist() == [float(t) for t in range(92, 100)]
+        assert rollups.oldest(1) == 92.0
+
+    def test_unknown_resolution(self):
+        """Reading an unconfigured resolution raises ``KeyError``."""
+        rollups = TelemetryRollups(resolutions=(1,), capacity=8, fields=NUMERIC_FIELDS)
+        with pytest.raises(KeyError):
+            rollups.read(5, ["speed"])
+
+
+class TestQueryHistory:
+    """Source selection in the history endpoint."""
+
+    def test_long_window_uses_rollups(self, app):
+        """A window older than the raw ring is served from aggregates, within max_points."""
+        telemetry = Telemetry(app)
+        timestamps = np.arange(0, 600, 0.5) + 5000
+        telemetry.publish_columns(make_columns(timestamps, np.ones(len(timestamps))))
+        history = telemetry.query_history(["speed"], since=5000, max_points=50)
+        assert history["resolution"] == 10
+        assert len(history["timestamp"]) == 50
+        assert history["min"]["speed"] == [1.0] * 50
+
+    def test_endpoint_downsamples(self, dashboard_client):
+        """``max_points`` bounds the response size."""
+        from app.dashboard.telemetry import telemetry
+
+        timestamps = np.arange(40.0) + 100
+        telemetry.publish_columns(make_columns(timestamps, np.sin(timestamps)))
+        response = dashboard_client.get("/dashboard/vehicle/history?fields=speed&max_points=10&resolution=raw")
+        assert response.status_code == 200
+        assert len(response.json["timestamp"]) == 10
+        assert response.json["resolution"] == "raw"
+        response = dashboard_client.get("/dashboard/vehicle/history?max_points=10&method=median")
+        assert response.status_code == 400
+
+    @pytest.mark.parametrize("query", [
+        "since=nan&resolution=1", "since=-inf&resolution=1", "since=inf&resolution=10", "max_points=10&since=nan",
+        "limit=-3", "limit=0", "max_points=0", "resolution=0", "resolution=-10",
+    ])
+    def test_rejects_invalid_window(self, dashboard_client, query):
+        """Non-finite ``since``, non-positive sizes or resolutions are a client error."""
+        response = dashboard_client.get(f"/dashboard/vehicle/history?{query}")
+        assert response.status_code == 400
+        assert response.json["status"] == "error"
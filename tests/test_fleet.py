@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""Multi-vehicle fleet tests."""
+import pytest
+
+from app.dashboard.fleet import Fleet, fleet
+
+
+@pytest.fixture
+def two_cars(app):
+    """A fleet of two vehicles registered on the app."""
+    app.config["VEHICLES"] = {
+        "alpha": {"ip": "10.0.0.1", "mac": "aa:aa:aa:aa:aa:aa"},
+        "beta": {"ip": "10.0.0.2", "mac": "bb:bb:bb:bb:bb:bb"},
+    }
+    fleet.init_app(app)
+    yield fleet
+    app.config["VEHICLES"] = None
+    fleet.init_app(app)
+
+
+class TestFleet:
+    """Vehicle registry."""
+
+    def test_single_vehicle_by_default(self, app):
+        """Without ``VEHICLES``, the fleet holds the default vehicle only."""
+        registry = Fleet(app)
+        assert list(registry.vehicles) == ["default"]
+
+    def test_vehicles_have_separate_stores(self, two_cars):
+        """Each vehicle gets its own telemetry and control stores."""
+        alpha, beta = two_cars.get("alpha"), two_cars.get("beta")
+        assert alpha is two_cars.default
+        assert alpha.telemetry is not beta.telemetry
+        assert alpha.control.slot is not beta.control.slot
+        beta.telemetry.publish({"timestamp": 1.0, "speed": 4.0})
+        assert beta.telemetry.latest()["speed"] == 4.0
+        assert alpha.telemetry.latest()["speed"] == 0
+
+
+class TestFleetEndpoints:
+    """Vehicle-keyed routes and fleet overview."""
+
+    def test_data_and_control_are_routed_per_vehicle(self, dashboard_client, two_cars):
+        """Frames and commands only reach the addressed vehicle."""
+        response = dashboard_client.post("/dashboard/vehicle/beta/data", json={"speed": 12})
+        assert response.status_code == 200
+        assert dashboard_client.get("/dashboard/vehicle/beta/data").json["speed"] == 12
+        assert dashboard_client.get("/dashboard/vehicle/data").json["speed"] == 0
+
+        response = dashboard_client.post("/dashboard/vehicle/beta/control", json={"throttle": 0.5, "seq": 1})
+        assert response.status_code == 200
+        assert two_cars.get("beta").control.latest()["throttle"] == 0.5
+        assert two_cars.get("alpha").control.slot.counters()["received"] == 0
+
+    def test_unknown_vehicle(self, dashboard_client, two_cars):
+        """An unknown vehicle id answers 404."""
+        assert dashboard_client.get("/dashboard/vehicle/gamma/data").status_code == 404
+        assert dashboard_client.get("/dashboard/vehicle/gamma/ping").status_code == 404
+
+    def test_overview(self, dashboard_client, two_cars):
+        """The overview lists every vehicle."""
+        two_cars.get("beta").telemetry.publish({"timestamp": 2.0, "battery": 42})
+        vehicles = dashboard_client.get("/dashboard/fleet").json["vehicles"]
+        assert [v["id"] for v in vehicles] == ["alpha", "beta"]
+        assert vehicles[1]["ip"] == "10.0.0.2"
+        assert vehicles[1]["frame"]["battery"] == 42
+
+    def test_batch_history_and_control_per_vehicle(self, dashboard_client, two_cars):
+        """Batch ingest, history and control read-outs are keyed by vehicle."""
+        frames = [{"timestamp": 1.0 + i, "speed": 3.0} for i in range(3)]
+        response = dashboard_client.post("/dashboard/vehicle/beta/data/batch", json=frames)
+        assert response.json["accepted"] == 3
+        history = dashboard_client.get("/dashboard/vehicle/beta/history", query_string={"fields": "speed"}).json
+        assert history["fields"]["speed"] == [3.0, 3.0, 3.0]
+        assert dashboard_client.get("/dashboard/vehicle/history", query_string={"fields": "speed"}).json["count"] == 0
+
+        dashboard_client.post("/dashboard/vehicle/beta/control", json={"steering": -0.25, "seq": 1})
+        assert dashboard_client.get("/dashboard/vehicle/beta/control/latest").json["steering"] == -0.25
+        assert dashboard_client.get("/dashboard/vehicle/beta/control/stats").json["counters"]["received"] == 1
+        assert dashboard_client.get("/dashboard/vehicle/control/stats").json["counters"]["received"] == 0
+        assert dashboard_client.get("/dashboard/vehicle/gamma/control/latest").status_code == 404
+
+    def test_stream_per_vehicle(self, dashboard_client, two_cars):
+        """The keyed stream sends the vehicle's own frame."""
+        two_cars.get("beta").telemetry.publish({"timestamp": 3.0, "battery": 21})
+        response = dashboard_client.get("/dashboard/vehicle/beta/stream")
+        chunk = next(response.response)
+        chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+        assert '"battery": 21' in chunk
+        response.close()
+
+
+class TestFleetPersistence:
+    """Samples of every vehicle are persisted with their vehicle id."""
+
+    def test_samples_carry_vehicle_id(self, app, db, two_cars):
+        """Each vehicle's frames are buffered under its own id."""
+        from app.dashboard.models import TelemetrySample
+        from app.dashboard.persistence import TelemetryWriter
+
+        app.config["TELEMETRY_PERSIST_ENABLED"] = True
+        writer = TelemetryWriter()
+        writer.init_app(app)
+        writer.autostart = False  # pas de tâche de fond pendant le test
+        two_cars.get("alpha").telemetry.publish({"timestamp": 1.0, "speed": 1.0})
+        two_cars.get("beta").telemetry.publish_batch([{"timestamp": 2.0, "speed": 2.0}, {"timestamp": 3.0}])
+        assert writer.flush() == 3
+        samples = TelemetrySample.query.order_by(TelemetrySample.timestamp).all()
+        assert [s.vehicle_id for s in samples] == ["alpha", "beta", "beta"]
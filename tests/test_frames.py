@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Binary telemetry frame tests."""
+import json
+import time
+
+import numpy as np
+import pytest
+
+from app.dashboard import frames
+from app.dashboard.telemetry import (
+    NUMERIC_FIELDS,
+    TelemetryRing,
+    clean_frame,
+    default_payload,
+)
+
+
+def _sample_frames(n):
+    return [dict(default_payload(), timestamp=1000 + i, battery=100 - i % 100, motor_speed=i) for i in range(n)]
+
+
+class TestBinaryFrames:
+    """Binary frame codec."""
+
+    def test_round_trip(self):
+        """Encoded frames decode to the same columns."""
+        body = frames.encode_frames(_sample_frames(3))
+        assert len(body) == frames.HEADER.size + 3 * frames.FRAME_SIZE
+        columns = frames.decode_frames(body)
+        assert columns.shape == (len(NUMERIC_FIELDS), 3)
+        assert columns[NUMERIC_FIELDS.index("motor_speed")].tolist() == [0, 1, 2]
+
+    def test_missing_timestamp_is_filled(self):
+        """Frames without a device timestamp get the reception time."""
+        body = frames.encode_frames([{"battery": 10}])
+        columns = frames.decode_frames(body, default_timestamp=42.0)
+        assert columns[0].tolist() == [42.0]
+
+    @pytest.mark.parametrize(
+        "body",
+        [b"VT", b"XX\x01\x0d\x00\x00\x00\x00", frames.encode_frames(_sample_frames(2))[:-1]],
+    )
+    def test_invalid_payload(self, body):
+        """Truncated or foreign payloads are rejected."""
+        with pytest.raises(frames.FrameFormatError):
+            frames.decode_frames(body)
+
+    @pytest.mark.parametrize("value", [float("nan"), float("inf"), "-inf", "NaN"])
+    def test_json_rejects_non_finite(self, value):
+        """JSON frames refuse the same non-finite values as the binary codec."""
+        with pytest.raises(ValueError):
+            clean_frame({"battery": value})
+
+    def test_ingest_and_binary_response(self, dashboard_client):
+        """Binary frames are ingested and the latest frame can be fetched in binary."""
+        body = frames.encode_frames(_sample_frames(4))
+        res = dashboard_client.post(
+            "/dashboard/vehicle/data/batch", data=body, content_type=frames.MIMETYPE
+        )
+        assert res.get_json()["accepted"] == 4
+        res = dashboard_client.get("/dashboard/vehicle/data", headers={"Accept": frames.MIMETYPE})
+        assert res.mimetype == frames.MIMETYPE
+        latest = frames.decode_frames(res.data)
+        assert latest[NUMERIC_FIELDS.index("motor_speed")].tolist() == [3]
+        assert dashboard_client.get("/dashboard/vehicle/data").json["mode"] == "real"
+
+
+class TestIngestBenchmark:
+    """Compare JSON and binary ingest cost per sample."""
+
+    def test_binary_ingest_matches_json(self, record_property):
+        """Both encodings fill the ring identically; the binary body is fixed-width and smaller.
+
+        Timings are only recorded (``record_property``), never asserted.
+        """
+        samples = _sample_frames(2000)
+        json_body = json.dumps(samples).encode()
+        binary_body = frames.encode_frames(samples)
+        ring = TelemetryRing(capacity=4096)
+
+        start = time.perf_counter()
+        ring.extend_frames([clean_frame(raw) for raw in json.loads(json_body)])
+        json_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        ring.extend(frames.decode_frames(binary_body))
+        binary_elapsed = time.perf_counter() - start
+
+        timestamps, _, _ = ring.read([])
+        assert np.array_equal(timestamps[:2000], timestamps[2000:])
+        record_property("json_us_per_frame", round(json_elapsed / len(samples) * 1e6, 2))
+        record_property("binary_us_per_frame", round(binary_elapsed / len(samples) * 1e6, 2))
+        record_property("json_bytes", len(json_body))
+        record_property("binary_bytes", len(binary_body))
+        assert len(binary_body) == frames.HEADER.size + len(samples) * frames.FRAME_SIZE
+        assert len(binary_body) < len(json_body)
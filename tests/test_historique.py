@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""History API tests."""
+import csv
+import datetime as dt
+import io
+import json
+import time
+
+import pytest
+
+from app.commands import export_history
+from app.dashboard.history import GenerationCounters, generations
+from app.dashboard.models import ConnectionLog, RaceLog
+from app.dashboard.search import contains
+from app.extensions import cache
+
+
+@pytest.fixture
+def history(db, user):
+    """25 races (two sharing each start time) and 25 site connections."""
+    start = dt.datetime(2026, 3, 1, 12)
+    for index in range(25):
+        db.session.add(RaceLog(
+            race_name=f"Course {index}", start_time=start + dt.timedelta(minutes=index // 2),
+            user_id=user.id, user_name=user.username,
+        ))
+        db.session.add(ConnectionLog(
+            fonction="site", type="connexion", connection_date=start + dt.timedelta(minutes=index // 2),
+            user_id=user.id, user_name=user.username,
+        ))
+    db.session.commit()
+
+
+class TestKeysetPagination:
+    """``after=`` cursors walk the same rows as page numbers."""
+
+    @pytest.mark.parametrize("endpoint, key, field", [
+        ("courses", "courses", "id"),
+        ("connexions", "connexions", "connection_date"),
+    ])
+    def test_cursor_walk_matches_pages(self, dashboard_client, history, endpoint, key, field):
+        """Walking cursors returns the same rows as page numbers."""
+        url = f"/dashboard/historique/api/{endpoint}"
+        by_page = [
+            dashboard_client.get(url, query_string={"page": page, "per_page": 10}).json[key]
+            for page in (1, 2, 3)
+        ]
+        walked, cursor = [], None
+        while True:
+            params = {"per_page": 10}
+            if cursor:
+                params["after"] = cursor
+            response = dashboard_client.get(url, query_string=params).json
+            walked.append(response[key])
+            cursor = response["next_cursor"]
+            if cursor is None:
+                break
+        assert [[row[field] for row in page] for page in walked] == [[row[field] for row in page] for page in by_page]
+        assert [len(page) for page in walked] == [10, 10, 5]
+        assert response["total"] == 25 and response["pages"] == 3
+
+    def test_ties_are_ordered_by_id(self, dashboard_client, history):
+        """Rows sharing a start time are ordered by id."""
+        response = dashboard_client.get("/dashboard/historique/api/courses", query_string={"per_page": 25})
+        courses = response.json["courses"]
+        keys = [(row["start_time"], row["id"]) for row in courses]
+        assert keys == sorted(keys, reverse=True)
+
+    def test_invalid_cursor(self, dashboard_client, history):
+        """A malformed cursor answers 400."""
+        response = dashboard_client.get("/dashboard/historique/api/courses", query_string={"after": "nope"})
+        assert response.status_code == 400
+        assert response.json["status"] == "error"
+
+
+class TestSearch:
+    """Substring search goes through the trigram index and stays in sync."""
+
+    def search(self, client, **params):
+        """Sorted race names returned by the API for ``params``."""
+        courses = client.get("/dashboard/historique/api/courses", query_string=params).json["courses"]
+        return sorted(course["race_name"] for course in courses)
+
+    def test_substring_in_any_column(self, dashboard_client, history, user):
+        """A substring matches inside any indexed column."""
+        expected = [f"Course {i}" for i in [1] + list(range(10, 20))]
+        assert self.search(dashboard_client, q="urse 1", per_page=50) == expected
+        assert len(self.search(dashboard_client, q=user.username[1:5], per_page=50)) == 25
+
+    def test_uses_fts_index(self, db):
+        """Queries of three characters or more use the FTS index."""
+        assert "MATCH" in str(contains(RaceLog, "Course"))
+        assert "MATCH" not in str(contains(RaceLog, "Co"))
+
+    def test_short_query_falls_back(self, dashboard_client, history):
+        """Shorter queries fall back to ``ilike``."""
+        assert self.search(dashboard_client, q="22") == ["Course 22"]
+
+    def test_type_filter_only_searches_race_name(self, dashboard_client, history, user):
+        """``type_course`` only searches the race name."""
+        assert self.search(dashboard_client, type_course=user.username[1:5]) == []
+
+    def test_index_follows_updates_and_deletes(self, db, dashboard_client, history):
+        """The index follows updates and deletes."""
+        race = RaceLog.query.filter_by(race_name="Course 3").one()
+        race.race_name = "Grand Prix"
+        db.session.delete(RaceLog.query.filter_by(race_name="Course 4").one())
+        db.session.commit()
+        assert self.search(dashboard_client, q="grand prix") == ["Grand Prix"]
+        assert self.search(dashboard_client, q="Course 3") == []
+        assert self.search(dashboard_client, q="Course 4") == []
+
+    def test_connexions_search(self, dashboard_client, history, user):
+        """Connection search is case-insensitive."""
+        response = dashboard_client.get(
+            "/dashboard/historique/api/connexions", query_string={"q": user.username.upper()}
+        ).json
+        assert response["total"] == 25
+
+
+class TestCount:
+    """``count=`` modes and the filtered count cache."""
+
+    url = "/dashboard/historique/api/courses"
+
+    def test_modes(self, dashboard_client, history):
+        """``exact`` counts rows, ``none`` skips the count."""
+        exact = dashboard_client.get(self.url, query_string={"count": "exact"}).json
+        assert (exact["total"], exact["pages"], exact["count"]) == (25, 3, "exact")
+        none = dashboard_client.get(self.url, query_string={"count": "none"}).json
+        assert (none["total"], none["pages"], none["count"]) == (None, None, "none")
+        assert none["next_cursor"] is not None
+
+    def test_capped(self, dashboard_client, history):
+        """``capped`` stops counting at the cap and says so."""
+        capped = dashboard_client.get(self.url, query_string={"count": "capped", "statut": "en_cours"}).json
+        assert (capped["total"], capped["count"]) == (20, "capped")
+        small = dashboard_client.get(self.url, query_string={"count": "capped", "q": "Course 1"}).json
+        assert (small["total"], small["count"]) == (11, "exact")
+
+    def test_cached_until_insert(self, db, dashboard_client, history, user, monkeypatch):
+        """Totals are cached per normalised filters until a row is inserted."""
+        params = {"q": " COURSE 2 ", "page": 1}
+        assert dashboard_client.get(self.url, query_string=params).json["total"] == 6
+        # Même filtres normalisés : le total vient du cache, sans COUNT
+        monkeypatch.setattr("sqlalchemy.orm.Query.count", lambda query: pytest.fail("COUNT exécuté"))
+        assert dashboard_client.get(self.url, query_string={"q": "course 2", "page": 2}).json["total"] == 6
+        monkeypatch.undo()
+        db.session.add(RaceLog(race_name="Course 2 bis", start_time=dt.datetime(2026, 3, 2),
+                               user_id=user.id, user_name=user.username))
+        db.session.commit()
+        assert dashboard_client.get(self.url, query_string=params).json["total"] == 7
+
+    def test_update_and_delete_invalidate(self, db, dashboard_client, history):
+        """Finishing or deleting a race changes the cached totals."""
+        params = {"statut": "termine"}
+        assert dashboard_client.get(self.url, query_string=params).json["total"] == 0
+        race = RaceLog.query.filter_by(race_name="Course 3").one()
+        race.end_time = race.start_time + dt.timedelta(minutes=2)
+        db.session.commit()
+        assert dashboard_client.get(self.url, query_string=params).json["total"] == 1
+        assert dashboard_client.get(self.url).json["total"] == 25
+        db.session.delete(RaceLog.query.filter_by(race_name="Course 4").one())
+        db.session.commit()
+        assert dashboard_client.get(self.url).json["total"] == 24
+
+    def test_generation_bumped_by_another_worker(self, dashboard_client, history, tmp_path):
+        """Workers mapping the same file see each other's generation bumps."""
+        path = str(tmp_path / "generation.shm")
+        worker, other = GenerationCounters(path), GenerationCounters(path)
+        try:
+            assert worker.get("race_logs") == other.get("race_logs") == 0
+            other.bump("race_logs")
+            assert worker.get("race_logs") == 1
+            assert worker.get("connection_logs") == 0
+        finally:
+            worker.close()
+            other.close()
+
+    def test_update_bumps_shared_generation(self, db, dashboard_client, history):
+        """A committed update moves the shared counter, not only the local cache."""
+        params = {"q": "grand prix"}
+        assert dashboard_client.get(self.url, query_string=params).json["total"] == 0
+        before = generations.get("race_logs")
+        race = RaceLog.query.filter_by(race_name="Course 3").one()
+        race.race_name = "Grand Prix"
+        db.session.commit()
+        assert generations.get("race_logs") == before + 1
+        # Worker dont le cache local n'a pas vu la modification : le total change quand même
+        cache.delete("history-generation:race_logs")
+        assert dashboard_client.get(self.url, query_string=params).json["total"] == 1
+
+    def test_invalid_mode(self, dashboard_client, history):
+        """An unknown count mode answers 400."""
+        assert dashboard_client.get(self.url, query_string={"count": "maybe"}).status_code == 400
+
+
+class TestExport:
+    """Streaming exports use the same filters as the paginated API."""
+
+    def test_csv(self, dashboard_client, history):
+        """The CSV export streams the filtered rows, most recent first."""
+        response = dashboard_client.get("/dashboard/historique/api/courses/export", query_string={"q": "Course 1"})
+        assert response.mimetype == "text/csv"
+        assert response.is_streamed
+        rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+        assert sorted(row["race_name"] for row in rows) == sorted(f"Course {i}" for i in [1] + list(range(10, 20)))
+        assert rows[0]["start_time"] >= rows[-1]["start_time"]
+
+    def test_ndjson_matches_api(self, dashboard_client, history):
+        """The NDJSON export matches the paginated API."""
+        params = {"per_page": 100, "type_connexion": "connexion"}
+        page = dashboard_client.get("/dashboard/historique/api/connexions", query_string=params).json["connexions"]
+        response = dashboard_client.get(
+            "/dashboard/historique/api/connexions/export", query_string=dict(params, format="ndjson")
+        )
+        assert [json.loads(line) for line in response.get_data(as_text=True).splitlines()] == page
+
+    def test_invalid_format(self, dashboard_client, history):
+        """An unknown export format answers 400."""
+        response = dashboard_client.get("/dashboard/historique/api/courses/export", query_string={"format": "xls"})
+        assert response.status_code == 400
+
+    def test_cli(self, app, history):
+        """``flask export-history`` applies the same filters."""
+        result = app.test_cli_runner().invoke(
+            export_history, ["courses", "--format", "ndjson", "--filter", "q=Course 2"]
+        )
+        assert result.exit_code == 0, result.output
+        names = sorted(json.loads(line)["race_name"] for line in result.output.splitlines())
+        assert names == ["Course 2", "Course 20", "Course 21", "Course 22", "Course 23", "Course 24"]
+
+
+class TestPageBenchmark:
+    """Per-row cost of a 1,000-row page, reported with ``record_property`` (no timing assertion)."""
+
+    ROWS = 1000
+
+    @pytest.fixture
+    def large_history(self, db, user):
+        """2,000 races and 2,000 connections."""
+        start = dt.datetime(2026, 1, 1)
+        db.session.execute(RaceLog.__table__.insert(), [
+            {"race_name": f"Course {i}", "start_time": start + dt.timedelta(minutes=i),
+             "end_time": start + dt.timedelta(minutes=i, seconds=95), "user_id": user.id,
+             "user_name": user.username, "average_speed": 12.5, "max_speed": 20.0, "distance": 0.3,
+             "created_at": start}
+            for i in range(2 * self.ROWS)
+        ])
+        db.session.execute(ConnectionLog.__table__.insert(), [
+            {"fonction": "site", "type": "connexion", "connection_date": start + dt.timedelta(minutes=i),
+             "user_id": user.id, "user_name": user.username}
+            for i in range(2 * self.ROWS)
+        ])
+        db.session.commit()
+
+    @pytest.mark.parametrize("endpoint", ["courses", "connexions"])
+    def test_per_row_cost(self, dashboard_client, large_history, endpoint, record_property):
+        """Time a page of ``ROWS`` rows."""
+        url = f"/dashboard/historique/api/{endpoint}"
+        params = {"per_page": self.ROWS, "page": 2, "count": "none"}
+        dashboard_client.get(url, query_string=params)  # échauffement
+        rounds = 5
+        started = time.perf_counter()
+        for _ in range(rounds):
+            response = dashboard_client.get(url, query_string=params)
+        per_row = (time.perf_counter() - started) / rounds / self.ROWS
+        assert len(response.json[endpoint]) == self.ROWS
+        record_property(f"{endpoint}_per_row_us", round(per_row * 1e6, 2))
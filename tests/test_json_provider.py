@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""JSON provider tests."""
+import datetime as dt
+
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+
+from app.json_provider import OrjsonProvider
+
+
+class TestOrjsonProvider:
+    """Same output as Flask's default provider for the types the app returns."""
+
+    def test_installed(self, app):
+        """The orjson provider is installed when orjson is available."""
+        assert isinstance(app.json, OrjsonProvider)
+
+    def test_matches_default_provider(self, app):
+        """Output matches Flask's default provider."""
+        payload = {"date": dt.datetime(2026, 3, 1, 12, 30), "value": np.float64(1.5), "windows": {60: None}}
+        assert app.json.loads(app.json.dumps(payload)) == DefaultJSONProvider(app).loads(
+            DefaultJSONProvider(app).dumps(payload)
+        )
+
+    def test_loads_non_standard_numbers(self, app):
+        """Non-standard numbers (NaN, Infinity) are still accepted on input."""
+        assert np.isnan(app.json.loads('{"x": NaN}')["x"])
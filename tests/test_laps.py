@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""Streaming lap detection tests."""
+import math
+
+import pytest
+
+from app.dashboard.laps import LapTracker, crossing
+from app.dashboard.models import RaceLog
+
+LINE = (0.0, 0.0, 0.0, 20.0)  # ligne de départ : rayon vertical du cercle
+
+
+def circle_positions(laps, period=10.0, rate=10, radius=10.0, start=1000.0):
+    """Positions on a circle centred on the origin: the start line is crossed once per lap."""
+    for i in range(int(laps * period * rate) + 1):
+        t = i / rate
+        angle = 2 * math.pi * t / period - 1.0
+        yield start + t, radius * math.cos(angle), radius * math.sin(angle)
+
+
+class TestCrossing:
+    """Start-line crossing test."""
+
+    def test_segment_through_line(self):
+        """A segment crossing the line is detected."""
+        t, direction = crossing((-1, 0), (1, 0), LINE)
+        assert t == pytest.approx(0.5)
+        assert crossing((1, 0), (-1, 0), LINE)[1] == -direction
+
+    def test_segment_beside_line(self):
+        """A segment beside the line is not a crossing."""
+        assert crossing((-1, 25), (1, 25), LINE) is None
+
+
+class TestLapTracker:
+    """Incremental race statistics."""
+
+    def test_counts_laps_and_distance(self):
+        """Laps and distance accumulate from the positions."""
+        tracker = LapTracker(line=LINE, min_lap=2.0)
+        for timestamp, x, y in circle_positions(3.5):
+            tracker.update(timestamp, x, y)
+        status = tracker.status()
+        assert status["racing"]
+        assert status["laps"] == 3
+        assert status["lap_times"] == pytest.approx([10.0] * 3, abs=0.01)
+        # Distance mesurée depuis le premier passage (angle π/2, départ à -1 rad)
+        assert status["distance"] == pytest.approx(10 * (2 * math.pi * 3.5 - math.pi / 2 - 1), rel=0.01)
+        assert status["average_speed"] == pytest.approx(2 * math.pi * 10 / 10 * 3.6, rel=0.02)
+
+    @pytest.mark.parametrize("dx, dy", [(float("nan"), 0.0), (0.0, float("inf")), (float("-inf"), float("nan"))])
+    def test_non_finite_position_is_skipped(self, dx, dy):
+        """One non-finite position between good ones leaves the race totals finite and unchanged."""
+        clean, tracker = LapTracker(line=LINE, min_lap=2.0), LapTracker(line=LINE, min_lap=2.0)
+        positions = list(circle_positions(1.5))
+        for index, (timestamp, x, y) in enumerate(positions):
+            clean.update(timestamp, x, y)
+            tracker.update(timestamp, x, y)
+            if index == len(positions) // 2:
+                assert tracker.update(timestamp + 0.05, x + dx, y + dy) is None
+        status = tracker.status()
+        assert status["racing"]
+        assert all(math.isfinite(status[key]) for key in ("distance", "max_speed", "average_speed"))
+        assert status == clean.status()
+
+    @pytest.mark.parametrize("speed", [float("nan"), float("inf")])
+    def test_non_finite_speed_is_ignored(self, speed):
+        """A non-finite reported speed falls back to the speed measured from the positions."""
+        tracker = LapTracker(line=LINE, min_lap=2.0)
+        positions = list(circle_positions(1.5))
+        for index, (timestamp, x, y) in enumerate(positions):
+            tracker.update(timestamp, x, y, speed if index == len(positions) // 2 else 0.0)
+        status = tracker.status()
+        assert math.isfinite(status["max_speed"]) and math.isfinite(status["distance"])
+
+    def test_index_skips_non_finite_position(self, app):
+        """The segment index never sees a non-finite position."""
+        from app.dashboard.laps import laps
+
+        laps.tracker.line = LINE
+        laps.tracker.min_lap = 2.0
+        for timestamp, x, y in circle_positions(1.5):
+            laps.update(timestamp, x, y)
+        assert laps.update(2000.0, float("inf"), 0.0) is None
+        assert math.isfinite(laps.tracker.status()["distance"])
+        assert laps.nearest(10.0, 0.0, 5.0) is not None
+
+    def test_idle_closes_race(self):
+        """A vehicle idle past the timeout closes the race."""
+        tracker = LapTracker(line=LINE, min_lap=2.0, timeout=5.0)
+        for timestamp, x, y in circle_positions(1.5):
+            tracker.update(timestamp, x, y)
+        assert tracker.close_idle(now=2000.0)
+        assert not tracker.status()["racing"]
+
+    def test_late_frame_is_ignored(self):
+        """A frame older than the previous position neither moves the vehicle nor crosses the line."""
+        tracker = LapTracker(line=LINE, min_lap=2.0)
+        tracker.update(1000.0, -1.0, 5.0)
+        tracker.update(1001.0, -2.0, 5.0)
+        assert tracker.update(1000.5, 1.0, 5.0) is None
+        assert tracker.update(1002.0, -3.0, 5.0) is None
+        assert not tracker.status()["racing"]
+
+    def test_clock_jump_back_closes_race(self):
+        """Timestamps going back by more than the timeout start a new session."""
+        tracker = LapTracker(line=LINE, min_lap=2.0, timeout=5.0)
+        for timestamp, x, y in circle_positions(1.5):
+            tracker.update(timestamp, x, y)
+        assert tracker.update(10.0, 5.0, 5.0) == "end"
+        assert not tracker.status()["racing"]
+        assert tracker.update(11.0, -5.0, 5.0) == "start"
+
+    def test_database_is_written_outside_the_lock(self, monkeypatch):
+        """Race rows are written once the seqlock is even and the writer lock released."""
+        tracker = LapTracker(line=LINE, min_lap=2.0)
+        seen = []
+
+        def open_race(started_at):
+            seen.append((tracker.seq % 2, tracker._lock.locked()))
+            return 42
+
+        monkeypatch.setattr(tracker, "_open_race", open_race)
+        for timestamp, x, y in circle_positions(0.5):
+            tracker.update(timestamp, x, y)
+        assert seen == [(0, False)]
+        assert tracker.race_id == 42
+
+
+class TestRaceLogCreation:
+    """Race logs written by the lap tracker."""
+
+    def test_race_log_is_created_and_updated(self, app, db, user, dashboard_client):
+        """Ingested frames create the race log, then update it."""
+        from app.dashboard.laps import laps
+
+        laps.tracker.line = LINE
+        laps.tracker.min_lap = 2.0
+        for timestamp, x, y in circle_positions(2.5):
+            dashboard_client.post("/dashboard/vehicle/data/batch", json=[{"timestamp": timestamp, "track": [[x, y]]}])
+        race = RaceLog.query.one()
+        assert race.user_id == user.id
+        assert race.end_time is None
+        assert race.distance == pytest.approx(2 * math.pi * 10 * 2 / 1000, rel=0.02)
+        assert race.race_duration.total_seconds() == pytest.approx(20.0, abs=0.01)
+        assert dashboard_client.get("/dashboard/vehicle/laps").json["laps"] == 2
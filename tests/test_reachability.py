@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""Background reachability prober tests."""
+import pytest
+
+from app.dashboard import reachability
+from app.dashboard.reachability import HostProber, PingSlot, probes
+
+
+@pytest.fixture
+def replies(monkeypatch):
+    """Scripted ICMP answers in place of real pings: seconds, None or False."""
+    script = []
+
+    def fake_ping(host, timeout):
+        return script.pop(0)
+
+    monkeypatch.setattr(reachability, "ping", fake_ping)
+    return script
+
+
+class TestHostProber:
+    """Probing, backoff and cached status."""
+
+    def test_status_before_first_probe(self):
+        """Status is empty until the first probe."""
+        prober = HostProber("10.0.0.1", PingSlot(), autostart=False)
+        assert prober.status() == {
+            "connected": False, "ping": None, "ip": "10.0.0.1", "checked_at": None, "failures": 0,
+        }
+
+    def test_backoff_while_unreachable(self, replies):
+        """The probe interval backs off while the host is unreachable."""
+        prober = HostProber("10.0.0.1", PingSlot(), interval=1.0, max_interval=5.0, autostart=False)
+        replies.extend([None, None, False, None, 0.0123])
+        assert [prober.probe() for _ in range(5)] == [2.0, 4.0, 5.0, 5.0, 1.0]
+        status = prober.status()
+        assert status["connected"] and status["ping"] == 12.3
+        assert status["failures"] == 0
+
+    def test_long_outage_keeps_max_interval(self, replies):
+        """Thousands of failed probes keep the delay at ``max_interval``."""
+        prober = HostProber("10.0.0.1", PingSlot(), interval=1.0, max_interval=30.0, autostart=False)
+        replies.extend([None] * 2000)
+        delays = [prober.probe() for _ in range(2000)]
+        assert delays[-1] == 30.0
+        assert prober.status()["failures"] == 2000
+
+    def test_error_is_reported(self, replies):
+        """A failed probe reports its error."""
+        prober = HostProber("nowhere", PingSlot(), autostart=False)
+        replies.append(False)
+        prober.probe()
+        assert prober.status()["error"] == "Hôte injoignable"
+
+    def test_shared_between_mappings(self, tmp_path):
+        """A probe published by one worker is read by another."""
+        path = str(tmp_path / "ping.shm")
+        writer, reader = PingSlot(path), PingSlot(path)
+        writer.record(100.0, 0.02)
+        assert reader.read() == (100.0, 0.02, 0, 1, None)
+
+
+class TestPingEndpoint:
+    """Ping endpoint."""
+
+    def test_answers_from_cache(self, app, db, dashboard_client, replies):
+        """The endpoint answers from the cached status."""
+        replies.append(0.005)
+        probes.get("192.168.1.100").probe()
+        assert replies == []
+        # Aucun ping pendant la requête : la liste vide ferait échouer fake_ping
+        response = dashboard_client.get("/dashboard/vehicle/ping").json
+        assert response["ip"] == "192.168.1.100"
+        assert response["ping"] == 5.0
+
+
+class TestLinkStats:
+    """Rolling latency histograms, jitter and loss."""
+
+    def test_windows(self):
+        """Latency, jitter and loss per window."""
+        slot = PingSlot(windows=(60, 600))
+        # 10 minutes à 1 Hz : latence alternant 10 et 30 ms, un sondage perdu sur 10
+        for i in range(600):
+            slot.record(6000.0 + i, None if i % 10 == 9 else (0.010 if i % 2 else 0.030))
+        # Au dernier tour : 50 ms pendant la dernière minute
+        for i in range(600, 660):
+            slot.record(6000.0 + i, 0.050)
+        stats = slot.link_stats(6659.5)
+        recent, long = stats[60], stats[600]
+        assert recent["sent"] == 60 and recent["lost"] == 0
+        assert recent["p50"] == pytest.approx(50, rel=0.2)
+        assert recent["jitter"] < 1  # un seul saut (30 → 50 ms) en une minute
+        assert long["loss"] == pytest.approx(54 / 600, abs=0.01)
+        assert long["p50"] == pytest.approx(30, rel=0.2)
+        assert long["p99"] == pytest.approx(50, rel=0.2)
+        assert long["jitter"] > 10
+
+    def test_old_slots_expire(self):
+        """Slots older than the window stop counting."""
+        slot = PingSlot(windows=(60,))
+        slot.record(100.0, 0.02)
+        assert slot.link_stats(110.0)[60]["sent"] == 1
+        assert slot.link_stats(1000.0)[60] == {
+            "sent": 0, "lost": 0, "loss": None, "mean": None, "jitter": None, "p50": None, "p95": None, "p99": None,
+        }
+
+    def test_endpoint(self, app, db, dashboard_client, replies):
+        """The link endpoint returns the window statistics."""
+        replies.extend([0.01, None])
+        prober = probes.get("192.168.1.100")
+        prober.probe()
+        prober.probe()
+        windows = dashboard_client.get("/dashboard/vehicle/link").json["windows"]
+        assert windows["60"]["sent"] == 2 and windows["60"]["loss"] == 0.5
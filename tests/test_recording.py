@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""Telemetry recording and replay tests."""
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from app.commands import replay_telemetry
+from app.dashboard.frames import FrameFormatError
+from app.dashboard.persistence import TelemetryWriter
+from app.dashboard.recording import (
+    ReplayEngine,
+    TelemetryRecorder,
+    read_blocks,
+    read_recording,
+    replay,
+)
+from app.dashboard.telemetry import NUMERIC_FIELDS
+
+
+def make_columns(timestamps):
+    """Telemetry columns at ``timestamps``."""
+    columns = np.zeros((len(NUMERIC_FIELDS), len(timestamps)))
+    columns[0] = timestamps
+    columns[1] = np.arange(len(timestamps))
+    return columns
+
+
+@pytest.fixture
+def recording(tmp_path):
+    """A recording of 10 samples at 10 Hz written in two blocks."""
+    path = str(tmp_path / "run.vrec")
+    recorder = TelemetryRecorder(path)
+    recorder.write(make_columns(100 + np.arange(6) / 10))
+    recorder.write(make_columns(100 + np.arange(6, 10) / 10))
+    recorder.close()
+    return path
+
+
+class TestRecording:
+    """Append-only recording file."""
+
+    def test_round_trip(self, recording):
+        """Blocks are read back in order."""
+        blocks = list(read_recording(recording))
+        assert [b.shape[1] for b in blocks] == [6, 4]
+        assert np.allclose(np.hstack(blocks)[0], 100 + np.arange(10) / 10)
+
+    def test_truncated_tail_is_ignored(self, recording):
+        """An interrupted last write does not break replay."""
+        with open(recording, "ab") as f:
+            f.write(b"VT\x01")
+        assert sum(b.shape[1] for b in read_recording(recording)) == 10
+
+    def test_track_round_trip(self, tmp_path):
+        """Trajectory points are stored with their block."""
+        path = str(tmp_path / "track.vrec")
+        recorder = TelemetryRecorder(path)
+        recorder.write(make_columns([1.0, 2.0]), [[0.5, 1.5], [2.5, 3.5]])
+        recorder.write(make_columns([3.0]))
+        recorder.close()
+        (first, points), (second, none) = read_blocks(path)
+        assert points.tolist() == [[0.5, 1.5], [2.5, 3.5]]
+        assert none.shape == (0, 2)
+
+    def test_rejects_other_files(self, tmp_path):
+        """Files without the recording header are rejected."""
+        path = tmp_path / "other.vrec"
+        path.write_bytes(b"not a recording")
+        with pytest.raises(FrameFormatError):
+            list(read_recording(str(path)))
+
+
+class TestReplay:
+    """Paced and unpaced replay."""
+
+    def test_fastest_publishes_each_block(self, recording):
+        """Replaying as fast as possible publishes one call per block."""
+        published = []
+        result = replay(recording, published.append, speed=None, rebase=False)
+        assert result["samples"] == 10
+        assert [c.shape[1] for c in published] == [6, 4]
+        assert published[0][0, 0] == 100.0
+
+    def test_speed_paces_samples(self, recording):
+        """At 2x, the 0.9 s recording is spread over 0.45 s of (fake) clock time."""
+        now = [0.0]
+        published = []
+        replay(
+            recording,
+            published.append,
+            speed=2,
+            clock=lambda: now[0],
+            sleep=lambda seconds: now.__setitem__(0, now[0] + seconds),
+        )
+        assert sum(c.shape[1] for c in published) == 10
+        assert now[0] == pytest.approx(0.45)
+        timestamps = np.hstack(published)[0]
+        assert np.allclose(np.diff(timestamps), 0.05)
+
+    def test_positions_follow_samples(self, tmp_path):
+        """Block points are published with the timestamp and speed of their sample."""
+        path = str(tmp_path / "track.vrec")
+        recorder = TelemetryRecorder(path)
+        recorder.write(make_columns([10.0, 11.0, 12.0, 13.0]), [[1.0, 1.0], [2.0, 2.0]])
+        recorder.close()
+        published = []
+        replay(path, lambda columns, positions: published.append(positions), speed=None, rebase=False)
+        assert published[0].tolist() == [[11.0, 1.0, 1.0, 1.0], [13.0, 2.0, 2.0, 3.0]]
+
+    def test_replay_feeds_track_and_skips_persistence(self, app, db, tmp_path):
+        """Replayed positions reach the track but not the position sinks; the writer ignores replayed samples."""
+        from app.dashboard.telemetry import telemetry
+
+        app.config["TELEMETRY_PERSIST_ENABLED"] = True
+        telemetry.init_app(app)
+        writer = TelemetryWriter()
+        writer.init_app(app)
+        writer.autostart = False  # pas de tâche de fond pendant le test
+        positions = []
+        telemetry.add_position_sink(lambda *position: positions.append(position))
+        path = str(tmp_path / "track.vrec")
+        recorder = TelemetryRecorder(path)
+        recorder.write(make_columns([10.0, 11.0]), [[1.0, 2.0], [3.0, 4.0]])
+        recorder.close()
+
+        result = app.test_cli_runner().invoke(replay_telemetry, [path, "--fastest", "--keep-timestamps"])
+        assert result.exit_code == 0, result.output
+        assert positions == []  # pas de tours comptés pendant un rejeu
+        assert telemetry.track.read()[3].tolist() == [3.0, 4.0]  # position courante
+        assert telemetry.latest()["mode"] == "replay"
+        assert writer.pending == 0
+
+    def test_cli_replay(self, app, recording):
+        """``flask telemetry replay`` feeds the shared history."""
+        from app.dashboard.telemetry import telemetry
+
+        runner = app.test_cli_runner()
+        result = runner.invoke(replay_telemetry, [recording, "--fastest", "--keep-timestamps"])
+        assert result.exit_code == 0, result.output
+        assert "10 samples" in result.output
+        assert telemetry.history.bounds() == (100.0, 100.9)
+
+    def test_replay_endpoint_rejects_unknown_file(self, app, dashboard_client, tmp_path):
+        """Replaying an unknown file answers 400."""
+        app.config["TELEMETRY_RECORDINGS_DIR"] = str(tmp_path)
+        response = dashboard_client.post("/dashboard/replay", json={"file": "../secret.vrec"})
+        assert response.status_code == 400
+
+
+class TestReplayEngine:
+    """Replay state shared between workers."""
+
+    @pytest.fixture
+    def engines(self, app, tmp_path):
+        """Two engines mapping the same state file, as two workers would."""
+        app.config["REPLAY_SHM_PATH"] = str(tmp_path / "replay.shm")
+        first, second = ReplayEngine(app), ReplayEngine(app)
+        yield first, second
+        first.stop()
+        app.config["REPLAY_SHM_PATH"] = None
+
+    def test_status_and_stop_from_another_worker(self, engines, recording):
+        """A replay started by one worker is seen and stopped by another."""
+        first, second = engines
+        first.start(recording, lambda columns: None, speed=0.01)
+        status = second.status()
+        assert status["running"] and status["file"] == "run.vrec" and status["speed"] == 0.01
+        second.stop()
+        assert not first.running
+        assert first.status()["samples"] < 10
+
+    def test_start_replaces_running_replay(self, engines, recording):
+        """Starting from another worker stops the replay in progress first."""
+        first, second = engines
+        first.start(recording, lambda columns: None, speed=0.01)
+        published = []
+        second.start(recording, published.append, speed=None)
+        deadline = time.monotonic() + 2
+        while second.running and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert second.status()["samples"] == 10
+        assert sum(c.shape[1] for c in published) == 10
+
+    def test_restart_waits_for_previous_thread(self, engines, recording):
+        """Restarting in the same worker never overlaps the previous replay nor drops the leader lock."""
+        first, second = engines
+        entered, release = threading.Event(), threading.Event()
+        first.start(recording, lambda *args, **kwargs: entered.set() or release.wait(2), speed=None)
+        assert entered.wait(2)
+        with pytest.raises(RuntimeError):
+            first.start(recording, lambda *args, **kwargs: None, speed=None, timeout=0.05)
+        release.set()
+        first.start(recording, lambda *args, **kwargs: None, speed=0.01)
+        assert first.running
+        assert not second.leader.acquire()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""Deterministic vehicle simulator tests."""
+import numpy as np
+import pytest
+
+from app.dashboard.simulator import SimulatorPool, VehicleSimulator
+from app.dashboard.telemetry import NUMERIC_FIELDS
+
+
+class TestVehicleSimulator:
+    """Closed-form simulated telemetry."""
+
+    def test_same_seed_same_state(self):
+        """State depends only on seed, start and time, not on call order."""
+        a, b = VehicleSimulator(7, 1000.0), VehicleSimulator(7, 1000.0)
+        a.frame(1200.0)
+        assert a.frame(1050.0) == b.frame(1050.0)
+        assert VehicleSimulator(8, 1000.0).frame(1050.0) != a.frame(1050.0)
+
+    def test_vectorised_matches_single_queries(self):
+        """Vectorised queries match one query per timestamp."""
+        simulator = VehicleSimulator(3, 0.0)
+        timestamps = np.linspace(0, 300, 31)
+        columns = simulator.columns(timestamps)
+        assert columns.shape == (len(NUMERIC_FIELDS), 31)
+        assert np.allclose(columns[:, 17], simulator.columns([timestamps[17]])[:, 0])
+
+    def test_physical_ranges(self):
+        """Power stays in 0-100 W, battery drains monotonically, distance grows."""
+        columns = dict(zip(NUMERIC_FIELDS, VehicleSimulator(11, 0.0).columns(np.arange(0, 3600, 5.0))))
+        assert columns["motor_power"].min() >= 0 and columns["motor_power"].max() <= 100
+        assert (np.diff(columns["battery"]) <= 0).all()
+        assert (np.diff(columns["distance"]) >= 0).all()
+        assert columns["telemetry"].min() >= 10 and columns["telemetry"].max() <= 200
+
+    def test_history_rejects_unknown_field(self):
+        """History of an unknown field raises ``KeyError``."""
+        with pytest.raises(KeyError):
+            VehicleSimulator(1, 0.0).history(["nope"], until=10.0)
+
+
+class TestSimulatorPool:
+    """Bounded pool of per-session simulators."""
+
+    def test_reuses_instances(self):
+        """The same session key gets the same simulator."""
+        pool = SimulatorPool()
+        assert pool.get(1, 0.0, now=0) is pool.get(1, 0.0, now=1)
+
+    def test_evicts_idle_and_least_recent(self):
+        """Idle simulators go first, then the least recently used."""
+        pool = SimulatorPool()
+        pool.max_size, pool.idle_timeout = 2, 10
+        pool.get(1, 0.0, now=0)
+        pool.get(2, 0.0, now=5)
+        pool.get(3, 0.0, now=6)  # au-delà de max_size : la session 1 est évincée
+        assert len(pool) == 2
+        pool.get(4, 0.0, now=16)  # la session 2 est inactive depuis 11 s
+        assert len(pool) == 2
+
+
+class TestSimulatedEndpoints:
+    """Simulation mode no longer touches the shared store."""
+
+    def test_sessions_are_isolated(self, dashboard_client):
+        """Two sessions see different simulations."""
+        from app.dashboard.telemetry import telemetry
+
+        with dashboard_client.session_transaction() as sess:
+            sess["dashboard_mode"] = "simu"
+        seq = telemetry.store.seq
+        data = dashboard_client.get("/dashboard/vehicle/data").json
+        assert data["battery"] <= 100
+        assert telemetry.store.seq == seq
+        history = dashboard_client.get("/dashboard/vehicle/history?fields=battery&max_points=5").json
+        assert history["resolution"] == "simu"
+        assert len(history["fields"]["battery"]) == 5
+
+    def test_history_size_is_capped(self, app, dashboard_client):
+        """A huge ``max_points`` is clamped to the configured history size."""
+        with dashboard_client.session_transaction() as sess:
+            sess["dashboard_mode"] = "simu"
+        history = dashboard_client.get("/dashboard/vehicle/history?fields=speed&max_points=100000000").json
+        assert len(history["timestamp"]) == app.config["TELEMETRY_HISTORY_SIZE"]
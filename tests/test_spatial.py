@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""Spatial segment index tests."""
+import numpy as np
+import pytest
+
+from app.dashboard.spatial import SegmentGrid
+
+
+def brute_force(points, labels, x, y):
+    """Reference nearest segment over a polyline, as the map hover used to compute it."""
+    best = None
+    for i in range(1, len(points)):
+        if labels[i] is None:
+            continue
+        a, b = points[i - 1], points[i]
+        d = b - a
+        t = np.clip(np.dot((x, y) - a, d) / max(np.dot(d, d), 1e-12), 0, 1)
+        distance = np.hypot(*((x, y) - (a + t * d)))
+        if best is None or distance < best[0]:
+            best = (distance, labels[i])
+    return best
+
+
+class TestSegmentGrid:
+    """Nearest-segment queries."""
+
+    def test_matches_brute_force(self):
+        """Grid answers match a brute-force search."""
+        rng = np.random.default_rng(1)
+        points = np.cumsum(rng.normal(0, 3, size=(2000, 2)), axis=0)
+        labels = [None] + [i // 500 for i in range(1, len(points))]
+        grid = SegmentGrid(capacity=4096, cell=10.0, buckets=256)
+        for (x, y), label in zip(points, labels):
+            grid.add_point(x, y, label)
+        for x, y in points[rng.integers(0, len(points), 50)] + rng.normal(0, 5, size=(50, 2)):
+            expected = brute_force(points, labels, x, y)
+            found = grid.nearest(x, y, 40.0)
+            if expected[0] > 40.0:
+                assert found is None
+                continue
+            assert found["distance"] == pytest.approx(expected[0])
+            assert found["label"] == expected[1]
+
+    def test_unlabelled_points_only_move(self):
+        """Points without a label move the pen without adding a segment."""
+        grid = SegmentGrid(capacity=16)
+        grid.add_point(0, 0)
+        grid.add_point(10, 0, label=0)
+        grid.add_point(20, 0)
+        assert len(grid) == 1
+        assert grid.nearest(15, 1, 5.0) is None
+        assert grid.nearest(5, 1, 5.0)["points"] == [[0.0, 0.0], [10.0, 0.0]]
+
+    def test_old_segments_leave_the_ring(self):
+        """Segments past the capacity leave the ring."""
+        grid = SegmentGrid(capacity=8, cell=5.0, buckets=16)
+        for i in range(20):
+            grid.add_point(float(i), 0.0, label=i)
+        assert grid.nearest(0.5, 0.0, 1.0) is None
+        assert grid.nearest(18.5, 0.0, 1.0)["label"] == 19
+
+    def test_clear_and_radius_bounds(self):
+        """``clear`` empties the grid and ``radius`` bounds the search."""
+        grid = SegmentGrid(capacity=8, cell=1.0)
+        grid.add_point(0, 0)
+        grid.add_point(1, 1, label=0)
+        grid.clear()
+        assert grid.nearest(0.5, 0.5, 1.0) is None
+        with pytest.raises(ValueError):
+            grid.nearest(0, 0, grid.max_radius * 2)
+
+
+class TestNearestEndpoint:
+    """``/maps/nearest`` endpoint."""
+
+    def test_lap_of_nearest_segment(self, app, db, dashboard_client):
+        """The endpoint returns the lap of the nearest segment."""
+        from app.dashboard.laps import laps
+
+        laps.tracker.line = (0.0, 0.0, 0.0, 20.0)
+        laps.tracker.min_lap = 2.0
+        frames = []
+        for i in range(300):
+            # Un tour toutes les 100 positions, rayon croissant : chaque tour a sa propre trace
+            angle, radius = 2 * np.pi * i / 100 - 1.0, 10 + i // 100 * 2
+            frames.append({"timestamp": 1000.0 + i / 10, "track": [[radius * np.cos(angle), radius * np.sin(angle)]]})
+        dashboard_client.post("/dashboard/vehicle/data/batch", json=frames)
+        found = dashboard_client.get("/dashboard/maps/nearest?x=14.2&y=0&radius=1").json
+        assert found["found"] and found["lap"] == 1
+        assert not dashboard_client.get("/dashboard/maps/nearest?x=100&y=100&radius=2").json["found"]
+        assert dashboard_client.get("/dashboard/maps/nearest?x=a&y=0").status_code == 400
+
+    @pytest.mark.parametrize("query", ["x=inf&y=0", "x=0&y=-inf", "x=nan&y=0", "x=0&y=0&radius=nan", "x=1e309&y=0"])
+    def test_rejects_non_finite(self, dashboard_client, query):
+        """Infinite or NaN coordinates are a client error, not a server error."""
+        response = dashboard_client.get(f"/dashboard/maps/nearest?{query}")
+        assert response.status_code == 400
+        assert response.json["status"] == "error"
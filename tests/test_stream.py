@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Telemetry streaming tests."""
+from app.dashboard.stream import Broadcaster, Subscription, format_sse
+
+
+class TestSubscription:
+    """Latest-wins subscriber slot."""
+
+    def test_coalesces_unread_messages(self):
+        """A slow reader only gets the newest message."""
+        subscription = Subscription()
+        for i in range(3):
+            subscription.push(i)
+        assert subscription.get(timeout=0) == 2
+        assert subscription.coalesced == 2
+        assert subscription.get(timeout=0) is None
+
+
+class TestBroadcaster:
+    """Single fan-out broadcaster."""
+
+    def test_fan_out_once_per_sequence(self):
+        """Each new sequence is serialised once and pushed to every subscriber."""
+        state = {"seq": 2, "frame": {"battery": 90}}
+        reads = []
+
+        def read():
+            reads.append(state["seq"])
+            return state["frame"]
+
+        broadcaster = Broadcaster(lambda: state["seq"], read, interval=60)
+        first, second = broadcaster.subscribe(), broadcaster.subscribe()
+        assert first.get(timeout=0) == format_sse('{"battery": 90}', event="telemetry", event_id=2)
+        second.get(timeout=0)
+        assert broadcaster.poll() is False
+
+        state.update(seq=4, frame={"battery": 80})
+        assert broadcaster.poll() is True
+        assert '"battery": 80' in first.get(timeout=0)
+        assert '"battery": 80' in second.get(timeout=0)
+        assert reads == [2, 4]
+
+        broadcaster.unsubscribe(first)
+        broadcaster.unsubscribe(second)
+        assert broadcaster.subscriber_count == 0
+
+    def test_new_subscriber_does_not_hide_frames(self):
+        """A frame read by ``subscribe`` is still pushed to the existing subscribers."""
+        state = {"seq": 2}
+        broadcaster = Broadcaster(lambda: state["seq"], lambda: {"seq": state["seq"]}, interval=60)
+        first = broadcaster.subscribe()
+        first.get(timeout=0)
+        state["seq"] = 4
+        second = broadcaster.subscribe()
+        broadcaster.poll()  # ou déjà diffusée par la tâche de fond
+        assert '"seq": 4' in first.get(timeout=0)
+        assert '"seq": 4' in second.get(timeout=0)
+        broadcaster.unsubscribe(first)
+        broadcaster.unsubscribe(second)
+
+    def test_format_sse(self):
+        """Multi-line data is split over several data fields."""
+        assert format_sse("a\nb", event="x", event_id=1) == "id: 1\nevent: x\ndata: a\ndata: b\n\n"
+
+
+class TestVehicleStream:
+    """SSE endpoint."""
+
+    def test_stream_sends_current_frame(self, dashboard_client):
+        """The first event carries the current frame."""
+        dashboard_client.post("/dashboard/vehicle/data", json={"battery": 33})
+        res = dashboard_client.get("/dashboard/vehicle/stream")
+        assert res.mimetype == "text/event-stream"
+        chunk = next(res.response)
+        chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+        assert chunk.startswith("id: ")
+        assert '"battery": 33' in chunk
+        res.close()
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""Telemetry store tests."""
+import json
+
+import numpy as np
+import pytest
+
+from app.dashboard.telemetry import (
+    EXTRA_FIELDS,
+    SharedTelemetryStore,
+    TelemetryRing,
+    clean_frame,
+    default_payload,
+)
+
+
+class TestSharedTelemetryStore:
+    """Shared memory-mapped telemetry store."""
+
+    def test_starts_with_default_payload(self):
+        """A fresh store serves the default frame."""
+        store = SharedTelemetryStore()
+        assert store.read() == default_payload()
+        assert store.seq % 2 == 0
+
+    def test_write_then_read(self):
+        """A written frame is read back and bumps the sequence."""
+        store = SharedTelemetryStore()
+        seq = store.seq
+        frame = dict(default_payload(), battery=42.5, mode="real", track=[[1, 2]])
+        assert store.write(frame) == seq + 2
+        data = store.read()
+        assert data["battery"] == 42.5
+        assert data["mode"] == "real"
+        assert data["track"] == [[1, 2]]
+
+    def test_shared_between_mappings(self, tmp_path):
+        """Two mappings of the same file (two workers) see the same frame."""
+        path = str(tmp_path / "telemetry.shm")
+        writer = SharedTelemetryStore(path)
+        reader = SharedTelemetryStore(path)
+        writer.write(dict(default_payload(), motor_speed=750))
+        assert reader.read()["motor_speed"] == 750
+        assert reader.seq == writer.seq
+
+    def test_oversized_track_is_truncated(self):
+        """A track larger than the extra area keeps its most recent points."""
+        store = SharedTelemetryStore(extra_capacity=256)
+        track = [[i, i] for i in range(200)]
+        store.write(dict(default_payload(), track=track))
+        kept = store.read()["track"]
+        assert kept and kept[-1] == [199, 199]
+
+    def test_oversized_mode_keeps_store_readable(self):
+        """A frame that cannot fit is rejected before the copy; the sequence stays even."""
+        with pytest.raises(ValueError):
+            clean_frame({"mode": "x" * 1000})
+        store = SharedTelemetryStore(extra_capacity=4096)
+        store.write(dict(default_payload(), mode="x" * 1000))
+        assert store.read()["mode"] == "x" * 32
+        # Juste la place de la trame par défaut : un mode plus long ne tient plus
+        defaults = {key: default_payload()[key] for key in EXTRA_FIELDS}
+        capacity = len(json.dumps(defaults, separators=(",", ":")))
+        tight = SharedTelemetryStore(extra_capacity=capacity)
+        with pytest.raises(ValueError):
+            tight.write(dict(default_payload(), mode="x" * 32))
+        assert tight.seq % 2 == 0
+        assert tight.read() == default_payload()
+
+    def test_failed_copy_leaves_even_sequence(self):
+        """An exception inside the copy still closes the seqlock."""
+        store = SharedTelemetryStore()
+
+        def broken():
+            raise IndexError
+
+        with pytest.raises(IndexError):
+            store._publish(broken)
+        assert store.seq % 2 == 0
+        assert store.read() == default_payload()
+
+    def test_odd_sequence_in_file_is_repaired(self, tmp_path):
+        """A sequence left odd by a crashed writer is fixed when the file is reopened."""
+        path = str(tmp_path / "telemetry.shm")
+        store = SharedTelemetryStore(path)
+        store._SEQ.pack_into(store._buf, 0, store.seq + 1)
+        assert SharedTelemetryStore(path).seq % 2 == 0
+
+
+class TestTelemetryRing:
+    """Fixed-capacity telemetry history."""
+
+    def test_read_since(self):
+        """Only samples newer than ``since`` are returned, as columns."""
+        ring = TelemetryRing(capacity=8)
+        for i in range(5):
+            ring.append(dict(default_payload(), timestamp=100 + i, battery=90 - i))
+        timestamps, columns, count = ring.read(["battery"], since=102)
+        assert timestamps.tolist() == [103, 104]
+        assert columns["battery"].tolist() == [87, 86]
+        assert count == 5
+
+    def test_wraps_around(self):
+        """Old samples are overwritten once capacity is reached."""
+        ring = TelemetryRing(capacity=4)
+        for i in range(10):
+            ring.append(dict(default_payload(), timestamp=i))
+        timestamps, _, count = ring.read([])
+        assert timestamps.tolist() == [6, 7, 8, 9]
+        assert count == 10
+
+    def test_extend_larger_than_capacity(self):
+        """A block larger than the ring keeps its newest samples."""
+        ring = TelemetryRing(capacity=4, fields=("timestamp", "battery"))
+        ring.extend(np.array([np.arange(6.0), np.arange(6.0) * 10]))
+        timestamps, columns, count = ring.read(["battery"], limit=3)
+        assert timestamps.tolist() == [3, 4, 5]
+        assert columns["battery"].tolist() == [30, 40, 50]
+        assert count == 6
+
+    def test_unknown_field(self):
+        """Unknown fields are rejected."""
+        with pytest.raises(KeyError):
+            TelemetryRing(capacity=4).read(["nope"])
+
+
+class TestVehicleData:
+    """Vehicle data endpoint."""
+
+    def test_post_then_get(self, dashboard_client):
+        """A posted frame is served by the next GET."""
+        res = dashboard_client.post("/dashboard/vehicle/data", json={"battery": 55})
+        assert res.get_json() == {"status": "ok"}
+        data = dashboard_client.get("/dashboard/vehicle/data").get_json()
+        assert data["battery"] == 55
+        assert data["timestamp"] > 0
+
+    def test_history_endpoint(self, dashboard_client):
+        """Posted frames are returned as column slices."""
+        for battery in (80, 70):
+            dashboard_client.post("/dashboard/vehicle/data", json={"battery": battery})
+        res = dashboard_client.get("/dashboard/vehicle/history?fields=battery,current")
+        data = res.get_json()
+        assert data["fields"]["battery"][-2:] == [80, 70]
+        assert len(data["timestamp"]) == len(data["fields"]["current"])
+        res = dashboard_client.get("/dashboard/vehicle/history?fields=nope")
+        assert res.status_code == 400
+
+    def test_post_invalid_frame(self, dashboard_client):
+        """A frame with a non-numeric field is rejected."""
+        res = dashboard_client.post("/dashboard/vehicle/data", json={"battery": [1]})
+        assert res.status_code == 400
+
+    def test_batch_json_array(self, dashboard_client):
+        """A JSON array is ingested in one request, keeping device timestamps."""
+        frames = [{"timestamp": 1000 + i, "battery": 90 - i} for i in range(3)]
+        frames.append({"battery": "oops"})
+        res = dashboard_client.post("/dashboard/vehicle/data/batch", json=frames)
+        assert res.get_json() == {"status": "ok", "accepted": 3, "rejected": [3]}
+        data = dashboard_client.get("/dashboard/vehicle/history?fields=battery&since=999").get_json()
+        assert data["timestamp"] == [1000, 1001, 1002]
+        assert data["fields"]["battery"] == [90, 89, 88]
+        assert dashboard_client.get("/dashboard/vehicle/data").get_json()["battery"] == 88
+
+    def test_batch_ndjson(self, dashboard_client):
+        """Newline-delimited frames are ingested, unreadable lines rejected."""
+        body = '{"battery": 50}\n\nnot json\n{"battery": 40}\n'
+        res = dashboard_client.post(
+            "/dashboard/vehicle/data/batch", data=body, content_type="application/x-ndjson"
+        )
+        assert res.get_json() == {"status": "ok", "accepted": 2, "rejected": [1]}
+
+    def test_batch_requires_array(self, dashboard_client):
+        """A single JSON object is not a batch."""
+        res = dashboard_client.post("/dashboard/vehicle/data/batch", json={"battery": 1})
+        assert res.status_code == 400
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""Compressed trajectory tests."""
+import numpy as np
+import pytest
+
+from app.dashboard.track import (
+    TrackStore,
+    decode_points,
+    decode_varints,
+    encode_points,
+    encode_varints,
+    parse_points,
+)
+
+
+class TestVarints:
+    """Zigzag varint transport encoding."""
+
+    def test_round_trip(self):
+        """Values survive an encode/decode round trip."""
+        values = np.array([0, 1, -1, 63, -64, 64, 300, -70000, 2**31 - 1, -(2**31)])
+        assert decode_varints(encode_varints(values)).tolist() == values.tolist()
+
+    def test_small_deltas_take_one_byte(self):
+        """Small deltas fit in one byte."""
+        assert len(encode_varints([3, -2, 0, 10])) == 4
+
+    def test_points_round_trip(self):
+        """Points survive an encode/decode round trip."""
+        points = np.array([[1.25, 2.5], [1.3, 2.51], [10.0, -4.0]])
+        body = encode_points(7, points, 0.01, reset=True, tail=[11.0, -4.5])
+        cursor, decoded, reset, tail = decode_points(body)
+        assert (cursor, reset) == (7, True)
+        assert np.allclose(decoded, points, atol=0.006)
+        assert np.allclose(tail, [11.0, -4.5], atol=0.006)
+
+
+class TestTrackStore:
+    """Bounded, simplified, cursor-addressed trajectory."""
+
+    def test_straight_line_is_simplified(self):
+        """Collinear points collapse into the segment endpoints."""
+        track = TrackStore(capacity=32, resolution=0.01, tolerance=0.05)
+        track.ingest([[float(x), 0.0] for x in range(50)] + [[49.0, float(y)] for y in range(1, 50)])
+        points, cursor, reset, tail = track.read()
+        assert points.tolist() == [[0.0, 0.0], [49.0, 0.0]]
+        assert tail.tolist() == [49.0, 49.0]
+        assert cursor == 2
+
+    def test_cumulative_resend_only_adds_new_points(self):
+        """A vehicle re-sending its whole path does not duplicate points."""
+        track = TrackStore(capacity=32, tolerance=0.0)
+        path = [[0, 0], [1, 1], [2, 0]]
+        track.ingest(path)
+        track.ingest(path + [[3, 1]])
+        points, cursor, _reset, tail = track.read()
+        assert points.tolist() == [[0, 0], [1, 1], [2, 0]]
+        assert tail.tolist() == [3, 1]
+
+    def test_cursor_reads_are_incremental_and_bounded(self):
+        """Cursor reads return only new points, within the limit."""
+        track = TrackStore(capacity=8, tolerance=0.0)
+        track.ingest([[i, i % 2] for i in range(5)])
+        _points, cursor, _reset, _tail = track.read()
+        track.ingest([[i, i % 2] for i in range(5, 8)])
+        points, new_cursor, reset, _tail = track.read(cursor)
+        assert not reset
+        assert len(points) == new_cursor - cursor == 3
+        track.ingest([[i, i % 2] for i in range(8, 40)])
+        points, _cursor, reset, _tail = track.read(cursor)
+        assert reset and len(points) == 8
+
+    def test_invalid_points(self):
+        """Malformed point payloads are rejected."""
+        with pytest.raises(ValueError):
+            TrackStore().ingest([[1, "a"]])
+
+    @pytest.mark.parametrize("point", [[float("inf"), 0], [0, float("-inf")], [float("nan"), 0], [1e12, 0]])
+    def test_unquantizable_points(self, point):
+        """Non-finite points and points beyond the int32 range are rejected, never wrapped."""
+        with pytest.raises(ValueError):
+            parse_points([point])
+        track = TrackStore()
+        with pytest.raises(ValueError):
+            track.ingest(np.array([point], dtype=float))
+        assert track.count == 0
+
+    def test_range_follows_resolution(self):
+        """The accepted range scales with the quantisation step."""
+        assert parse_points([[1e9, 0]], resolution=1.0).tolist() == [[1e9, 0.0]]
+        with pytest.raises(ValueError):
+            parse_points([[1e9, 0]])
+
+
+class TestTrackEndpoint:
+    """Track endpoint."""
+
+    def test_frames_keep_only_current_position(self, dashboard_client):
+        """Frames carry the current position only, the track is read separately."""
+        from app.dashboard.telemetry import telemetry
+
+        path = [[0, 0], [1, 1], [2, 0], [3, 1]]
+        dashboard_client.post("/dashboard/vehicle/data", json={"track": path})
+        assert telemetry.latest()["track"] == [[3, 1]]
+        response = dashboard_client.get("/dashboard/vehicle/track?cursor=0").json
+        assert response["points"] + [response["tail"]] == [[0, 0], [1, 1], [2, 0], [3, 1]]
+        assert dashboard_client.get(f"/dashboard/vehicle/track?cursor={response['cursor']}").json["points"] == []
+        bad = dashboard_client.post("/dashboard/vehicle/data", json={"track": [["x", 1]]})
+        assert bad.status_code == 400
+
+    @pytest.mark.parametrize("body", [
+        '{"track": [[Infinity, 0]]}', '{"track": [[NaN, 0]]}', '{"track": [[1e12, 0]]}',
+    ])
+    @pytest.mark.parametrize("in_race", [False, True])
+    def test_unquantizable_points_are_a_client_error(self, dashboard_client, body, in_race):
+        """Infinite, NaN or out-of-range points answer 400, during a race or not."""
+        from app.dashboard.telemetry import telemetry
+
+        if in_race:
+            for i in range(5):
+                dashboard_client.post("/dashboard/vehicle/data", json={"track": [[i, i % 2]], "speed": 1.0})
+        count = telemetry.track.count
+        response = dashboard_client.post("/dashboard/vehicle/data", data=body, content_type="application/json")
+        assert response.status_code == 400
+        assert response.json["status"] == "error"
+        assert telemetry.track.count == count
+        assert dashboard_client.get("/dashboard/vehicle/laps").status_code == 200